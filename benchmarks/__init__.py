@@ -0,0 +1,3 @@
+"""
+Benchmarks for ikman_scraper
+"""
@@ -0,0 +1,55 @@
+"""
+Compare the fuzzy dedup scoring backends against the original loop.
+
+    python -m benchmarks.bench_dedup --rows 5000 --threshold 95 --workers -1
+"""
+import argparse
+import time
+from thefuzz import fuzz
+from ikman_scraper.services.dedup_service import SCORING_BACKENDS
+from .datagen import make_titles
+
+
+def legacy_dedup(titles, threshold, workers=1):
+    """The original fuzzy_drop_duplicates loop: every title vs every kept title."""
+    seen_titles = []
+    keep = []
+    for t_norm in titles:
+        is_duplicate = False
+        for existing_t in seen_titles:
+            if fuzz.ratio(t_norm, existing_t) >= threshold:
+                is_duplicate = True
+                break
+        keep.append(not is_duplicate)
+        if not is_duplicate:
+            seen_titles.append(t_norm)
+    return keep, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--threshold", type=int, default=95)
+    parser.add_argument("--workers", type=int, default=-1)
+    parser.add_argument("--skip-legacy", action="store_true", help="don't run the O(n^2) loop")
+    args = parser.parse_args()
+
+    titles = make_titles(args.rows)
+    backends = dict(SCORING_BACKENDS)
+    if not args.skip_legacy:
+        backends = {"legacy": legacy_dedup, **backends}
+
+    print(f"{args.rows} titles, threshold {args.threshold}, workers {args.workers}")
+    reference = None
+    for name, dedup in backends.items():
+        started = time.perf_counter()
+        keep, _ = dedup(titles, args.threshold, workers=args.workers)
+        elapsed = time.perf_counter() - started
+        if reference is None:
+            reference = keep
+        same = "same" if keep == reference else "DIFFERENT"
+        print(f"{name:>8}: {elapsed:8.2f}s  {args.rows / elapsed:10.0f} rows/s  kept {sum(keep)} ({same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare title normalization and skip keyword filtering against the original code.
+
+    python -m benchmarks.bench_text --rows 100000 --days 10
+"""
+import argparse
+import time
+import unicodedata
+import pandas as pd
+import regex
+from ikman_scraper.services.cleanup_service import normalize_titles
+from ikman_scraper.services.scrape_service import SKIP_KEYWORDS, compile_skip_matcher
+from .datagen import make_titles
+
+
+def legacy_normalize_title(title):
+    """The original normalize_title: patterns compiled on every call, applied row by row."""
+    if not isinstance(title, str):
+        return ""
+    title = unicodedata.normalize("NFKC", title)
+    title = regex.sub(r"[^\p{L}\p{N}\s]+", " ", title)
+    title = regex.sub(r"\s+", " ", title)
+    return title.strip().lower()
+
+
+def legacy_is_skipped(title, skip_keywords):
+    """The original skip check: every keyword lower-cased for every ad."""
+    t_lower = title.lower()
+    return any(k.lower() in t_lower for k in skip_keywords)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000, help="rows per cleanup")
+    parser.add_argument("--days", type=int, default=10, help="distinct titles = rows / days")
+    args = parser.parse_args()
+
+    # The same listings show up on many scrape days, so titles repeat
+    distinct = make_titles(max(1, args.rows // args.days))
+    titles = pd.Series((distinct * args.days)[:args.rows], dtype=object)
+    titles.iloc[::7] = titles.iloc[::7] + " Single Story"
+
+    print(f"{len(titles)} titles, {len(distinct)} distinct")
+    legacy, t_legacy = timed(lambda: titles.apply(legacy_normalize_title).tolist())
+    cold, t_cold = timed(lambda: normalize_titles(titles))
+    warm, t_warm = timed(lambda: normalize_titles(titles))
+    same = "same" if legacy == cold == warm else "DIFFERENT"
+    print(f"normalize legacy: {t_legacy:8.3f}s  {len(titles) / t_legacy:10.0f} rows/s")
+    print(f"normalize cold  : {t_cold:8.3f}s  {len(titles) / t_cold:10.0f} rows/s ({same})")
+    print(f"normalize warm  : {t_warm:8.3f}s  {len(titles) / t_warm:10.0f} rows/s (memo reused)")
+
+    title_list = titles.tolist()
+    legacy, t_legacy = timed(lambda: [legacy_is_skipped(t, SKIP_KEYWORDS) for t in title_list])
+
+    def compiled():
+        matcher = compile_skip_matcher(SKIP_KEYWORDS)
+        return [matcher.search(t.lower()) is not None for t in title_list]
+
+    skipped, t_compiled = timed(compiled)
+    same = "same" if legacy == skipped else "DIFFERENT"
+    print(f"skip legacy     : {t_legacy:8.3f}s  {len(titles) / t_legacy:10.0f} ads/s")
+    print(f"skip compiled   : {t_compiled:8.3f}s  {len(titles) / t_compiled:10.0f} ads/s ({same})")
+
+
+if __name__ == "__main__":
+    main()
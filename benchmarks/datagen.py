@@ -0,0 +1,78 @@
+"""
+Synthetic listings shaped like ikman.lk houses-for-sale ads, with English
+and Sinhala titles. Nothing here imports ikman_scraper, so the generators
+can be used before the environment for a benchmark run is set up.
+"""
+import random
+
+WORDS = (
+    "house for sale in kottawa piliyandala athurugiriya negombo ragama two story storey "
+    "3 4 5 bedroom brand new luxury modern upstair road near town perches land with "
+    "නිවස විකිණීමට දෙමහල් නිවසක් ඉඩම"
+).split()
+
+RAW_HEADERS = [
+    "Area Slug", "Location", "Title", "Description", "Details",
+    "Price (numeric)", "Shop Name", "Slug", "URL", "Date"
+]
+
+
+def make_titles(rows, seed=42):
+    """Synthetic titles: a pool of listings, each re-posted with small edits."""
+    rnd = random.Random(seed)
+    pool = [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 12))) for _ in range(max(1, rows // 3))]
+    titles = []
+    for _ in range(rows):
+        chars = list(rnd.choice(pool))
+        for _ in range(rnd.randint(0, 3)):
+            if chars and rnd.random() < 0.5:
+                del chars[rnd.randrange(len(chars))]
+            else:
+                chars.insert(rnd.randrange(len(chars) + 1), rnd.choice("abcde නි"))
+        titles.append("".join(chars))
+    return titles
+
+
+def make_ad(rnd, location_slug, n, title=None):
+    """One serp 'ads' entry with the fields the scraper reads plus the usual extras."""
+    price = rnd.randrange(8_000_000, 25_000_000, 50_000)
+    return {
+        "id": f"{location_slug}-{n}",
+        "title": title or " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 12))),
+        "slug": f"{location_slug}-house-for-sale-{n}",
+        "description": "Two storied house with " + " ".join(rnd.choice(WORDS) for _ in range(20)),
+        "details": f"Bedrooms: {rnd.choice([3, 4, 5])}, Bathrooms: 2",
+        "price": f"Rs {price:,}",
+        "location": location_slug.title(),
+        "shopName": rnd.choice(["", "", "Lanka Homes", "ලංකා නිවාස"]),
+        "imgUrl": f"https://i.ikman-st.com/{location_slug}/{n}/thumb.jpg",
+        "timeStamp": "2025-01-01T10:00:00Z",
+        "isMember": rnd.random() < 0.3,
+        "category": "Houses For Sale"
+    }
+
+
+def make_raw_rows(rows, date_str, seed=0):
+    """Rows matching the raw Excel columns for one scrape day."""
+    rnd = random.Random(seed)
+    out = []
+    for n, title in enumerate(make_titles(rows, seed=seed)):
+        ad = make_ad(rnd, rnd.choice(["kottawa", "negombo", "ragama"]), n, title=title)
+        out.append([
+            ad["location"].lower(), ad["location"], ad["title"], ad["description"], ad["details"],
+            int(ad["price"][3:].replace(",", "")), ad["shopName"], ad["slug"],
+            "https://ikman.lk/en/ad/" + ad["slug"], date_str
+        ])
+    return out
+
+
+def write_raw_file(path, rows):
+    """Write raw rows to an Excel file shaped like raw_scrape/ikman_scrape_*.xlsx."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet("ScrapeData")
+    sheet.append(RAW_HEADERS)
+    for row in rows:
+        sheet.append(row)
+    wb.save(path)
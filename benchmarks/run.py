@@ -0,0 +1,326 @@
+"""
+Offline benchmark suite for scrape, storage, cleanup and output writer throughput,
+and for the cold import time and rerun latency of the UI.
+
+    python -m benchmarks.run                      # run and compare with the baseline
+    python -m benchmarks.run --save-baseline      # run and store the result as the baseline
+    python -m benchmarks.run --sizes 1k,10k,100k --suites cleanup
+    python -m benchmarks.run --suites writers --writer-rows 100000
+    python -m benchmarks.run --suites startup --reruns 20
+
+Everything runs against a local fake serp API (benchmarks/serp_server.py)
+and a scratch data directory, so the live site and the real data are never
+touched. Exit code 1 means a metric regressed beyond --tolerance.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from .datagen import make_raw_rows, write_raw_file
+from .serp_server import SerpServer
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def dir_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    return int(float(text[:-1]) * 1000) if text.endswith("k") else int(text)
+
+
+def bench_scrape(args, root, server):
+    """scrape_locations against the fake API: pages/sec, ads/sec, bytes written."""
+    from ikman_scraper.services.orchestrator_service import scrape_locations
+
+    locations = [{"name": f"Bench {i}", "slug": f"bench-{i}", "id": 9000 + i} for i in range(args.locations)]
+    before = dir_size(root)
+    started = time.perf_counter()
+    summaries = scrape_locations(locations)
+    elapsed = time.perf_counter() - started
+
+    pages = sum(s["pages_scraped"] for s in summaries)
+    ads = sum(s["ads_scraped"] for s in summaries)
+    return {
+        "scrape_failed_pages": sum(len(s["failed_pages"]) for s in summaries),
+        "scrape_seconds": elapsed,
+        "scrape_pages_per_sec": pages / elapsed,
+        "scrape_ads_per_sec": ads / elapsed,
+        "scrape_bytes_written": dir_size(root) - before,
+        "scrape_requests": server.requests
+    }
+
+
+def bench_storage(args, root):
+    """append_raw_records page by page, then the end-of-run Excel export."""
+    from ikman_scraper.data.data_access import append_raw_records, export_pending_raw_excel
+
+    rows = make_raw_rows(args.storage_rows, "2000-01-01", seed=1)
+    before = dir_size(root)
+    started = time.perf_counter()
+    for start in range(0, len(rows), 25):
+        append_raw_records(rows[start:start + 25])
+    appended = time.perf_counter()
+    export_pending_raw_excel()
+    exported = time.perf_counter()
+    return {
+        "storage_append_rows_per_sec": len(rows) / (appended - started),
+        "storage_export_rows_per_sec": len(rows) / (exported - appended),
+        "storage_bytes_written": dir_size(root) - before
+    }
+
+
+def bench_cleanup(args, root, size, year):
+    """
+    cleanup_duplicates over ten raw day files totalling `size` rows, cold then
+    warm, then once more in streaming mode (warm).
+    """
+    from ikman_scraper.const.const import DEDUPLICATION_THRESHOLD
+    from ikman_scraper.data.data_access import add_history_record
+    from ikman_scraper.services.cleanup_service import cleanup_duplicates
+
+    folder = os.path.join(root, "bench_raw", str(size))
+    os.makedirs(folder, exist_ok=True)
+    days = [date(year, 1, 1) + timedelta(days=i) for i in range(10)]
+    for i, day in enumerate(days):
+        path = os.path.join(folder, f"ikman_scrape_{day}.xlsx")
+        write_raw_file(path, make_raw_rows(size // 10, str(day), seed=year * 100 + i))
+        add_history_record({
+            "date": str(day), "excel_file": path,
+            "total_ads_scraped": size // 10, "total_pages_scraped": 0
+        })
+
+    label = f"{size // 1000}k" if size >= 1000 else str(size)
+    metrics = {}
+    for run in ("cold", "warm"):
+        started = time.perf_counter()
+        result = cleanup_duplicates(days[0], days[-1], DEDUPLICATION_THRESHOLD, incremental=False)
+        elapsed = time.perf_counter() - started
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+        metrics[f"cleanup_{label}_{run}_rows_per_sec"] = size / elapsed
+
+    started = time.perf_counter()
+    result = cleanup_duplicates(days[0], days[-1], DEDUPLICATION_THRESHOLD, streaming=True)
+    elapsed = time.perf_counter() - started
+    if not result["success"]:
+        raise RuntimeError(result["message"])
+    metrics[f"cleanup_{label}_stream_rows_per_sec"] = size / elapsed
+    return metrics
+
+
+def bench_writers(args, root):
+    """Write the same cleaned rows once in every output format; time and bytes per format."""
+    from ikman_scraper.data.data_access import write_cleaned_file
+    from ikman_scraper.data.output_writers import OUTPUT_FORMATS
+    from ikman_scraper.services.cleanup_service import FINAL_COLUMNS
+
+    raw = make_raw_rows(args.writer_rows, "2000-01-01", seed=7)
+    day = datetime(2000, 1, 1)
+    rows = [(r[1], day, r[2], float(r[5]), r[8]) for r in raw]
+    metrics = {}
+    for fmt in OUTPUT_FORMATS:
+        if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            print("pyarrow not installed, skipping parquet")
+            continue
+        path = os.path.join(root, "bench_writers", "cleaned" + OUTPUT_FORMATS[fmt])
+        report = write_cleaned_file(iter(rows), FINAL_COLUMNS, path, fmt)
+        name = fmt.replace(".", "_")
+        metrics[f"writer_{name}_rows_per_sec"] = report["rows"] / report["seconds"]
+        metrics[f"writer_{name}_bytes_written"] = report["bytes"]
+    return metrics
+
+
+# Imports the UI module in a fresh interpreter with streamlit already loaded,
+# so only the app's own import chain is timed
+IMPORT_PROBE = """
+import sys, time
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "thefuzz", "rapidfuzz", "regex", "requests")
+import streamlit
+started = time.perf_counter()
+import ikman_scraper.presentation.ui
+print(time.perf_counter() - started)
+print(sum(m in sys.modules for m in HEAVY_MODULES))
+"""
+
+
+def bench_startup(args, root):
+    """
+    Cold import time of the UI module (median of fresh interpreters), the
+    data loads a UI rerun makes (locations, history, history dates), cold
+    (caches cleared) and warm, and the
+    latency of a whole rerun (Streamlit AppTest) over `--history-runs`
+    history records.
+    """
+    from ikman_scraper.data.data_access import (
+        add_history_record, clear_cached_loaders, load_history, load_history_dates, load_locations
+    )
+
+    if importlib.util.find_spec("streamlit") is None:
+        print("streamlit not installed, skipping startup")
+        return {}
+
+    for i in range(args.history_runs):
+        day = date(2002, 1, 1) + timedelta(days=i)
+        add_history_record({
+            "date": str(day), "excel_file": os.path.join(root, f"ikman_scrape_{day}.xlsx"),
+            "total_ads_scraped": 0, "total_pages_scraped": 0
+        })
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])))
+    imports = []
+    heavy_imports = 0
+    for _ in range(5):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        imports.append(float(out[0]))
+        heavy_imports = int(out[1])
+
+    def load_all():
+        started = time.perf_counter()
+        load_locations()
+        load_history()
+        load_history_dates()
+        return time.perf_counter() - started
+
+    cold_loads = []
+    for _ in range(args.reruns):
+        clear_cached_loaders()
+        cold_loads.append(load_all())
+    loads = [load_all() for _ in range(args.reruns)]
+
+    from streamlit.testing.v1 import AppTest
+
+    ui_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "ikman_scraper", "presentation", "ui.py")
+    app = AppTest.from_file(ui_path, default_timeout=120)
+    started = time.perf_counter()
+    app.run()
+    first_run = time.perf_counter() - started
+    reruns = []
+    for _ in range(args.reruns):
+        started = time.perf_counter()
+        app.run()
+        reruns.append(time.perf_counter() - started)
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    return {
+        "startup_ui_import_seconds": statistics.median(imports),
+        "startup_ui_heavy_imports": heavy_imports,
+        "startup_ui_cold_loaders_ms": statistics.median(cold_loads) * 1000,
+        "startup_ui_loaders_ms": statistics.median(loads) * 1000,
+        "startup_ui_first_run_seconds": first_run,
+        "startup_ui_rerun_seconds": statistics.median(reruns)
+    }
+
+
+def compare(metrics, baseline, tolerance):
+    """Print every metric next to the baseline; return the names that regressed."""
+    regressions = []
+    old = baseline.get("metrics", {}) if baseline else {}
+    for name, value in metrics.items():
+        line = f"{name:>40}: {value:14.2f}"
+        if name.endswith("_failed_pages"):
+            # Any lost page is a regression, whatever the baseline
+            if value > 0:
+                regressions.append(name)
+                line += "  REGRESSION"
+        elif name in old and old[name]:
+            change = (value - old[name]) / old[name]
+            line += f"   baseline {old[name]:14.2f}  ({change:+.1%})"
+            higher_is_better = name.endswith("_per_sec")
+            lower_is_better = name.endswith(("_bytes_written", "_seconds", "_ms"))
+            if (higher_is_better and change < -tolerance) or (lower_is_better and change > tolerance):
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default="scrape,storage,cleanup,writers,startup")
+    parser.add_argument("--locations", type=int, default=4, help="locations scraped at once")
+    parser.add_argument("--ads", type=int, default=1000, help="ads per location")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake API latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake API requests that fail")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="fake API answers 429 above this")
+    parser.add_argument("--storage-rows", type=int, default=10000)
+    parser.add_argument("--sizes", default="1k,10k", help="cleanup sizes, e.g. 1k,10k,100k")
+    parser.add_argument("--writer-rows", type=int, default=50000, help="rows written per output format")
+    parser.add_argument("--history-runs", type=int, default=200, help="history records shown by the UI benchmark")
+    parser.add_argument("--reruns", type=int, default=10, help="UI reruns timed by the startup suite")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    if "ikman_scraper.const.const" in sys.modules:
+        raise SystemExit("ikman_scraper was imported before the benchmark environment was set up")
+
+    suites = {s.strip() for s in args.suites.split(",")}
+    root = tempfile.mkdtemp(prefix="ikman-bench-")
+    server = SerpServer(
+        ads_per_location=args.ads, latency=args.latency, error_rate=args.error_rate,
+        max_concurrent=args.max_concurrent
+    ).start()
+    # Must be set before ikman_scraper is imported: paths and the API URL are read at import time
+    os.environ["IKMAN_DATA_ROOT"] = root
+    os.environ["IKMAN_BASE_URL"] = server.base_url
+    print(f"Scratch data in {root}, fake API on {server.base_url}")
+
+    metrics = {}
+    try:
+        if "scrape" in suites:
+            metrics.update(bench_scrape(args, root, server))
+        if "storage" in suites:
+            metrics.update(bench_storage(args, root))
+        if "cleanup" in suites:
+            for i, size in enumerate(parse_size(s) for s in args.sizes.split(",")):
+                metrics.update(bench_cleanup(args, root, size, 2001 + i))
+        if "writers" in suites:
+            metrics.update(bench_writers(args, root))
+        if "startup" in suites:
+            metrics.update(bench_startup(args, root))
+    finally:
+        server.stop()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare(metrics, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "params": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "baseline")},
+                "metrics": metrics
+            }, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
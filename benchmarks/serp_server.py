@@ -0,0 +1,185 @@
+"""
+Local stand-in for the ikman.lk serp API.
+
+Serves GET /data/serp with the same query parameters the scraper sends and
+answers with synthetic `ads` and `paginationData`. Latency and error rate are
+configurable so scrape throughput can be measured without the live site.
+
+    python -m benchmarks.serp_server --port 8765 --latency 0.05
+    IKMAN_BASE_URL=http://127.0.0.1:8765 python -m ikman_scraper scrape
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from .datagen import make_ad
+
+
+class SerpServer:
+    """
+    ThreadingHTTPServer on 127.0.0.1 serving fake serp pages.
+      - `ads_per_location`: paginationData.total for every location
+      - `page_size`: ads per page
+      - `latency`: seconds slept before every answer
+      - `error_rate`: share of requests answered with 503
+      - `max_concurrent`: requests beyond this many at once get 429 with
+        Retry-After: 1, like a throttling front end (None = never)
+    Every location holds the same `ads_per_location` deterministic ads, so
+    re-runs see the same slugs. The money filter of `filter_json` is honoured
+    (other filters are ignored), so price-band sharding can be exercised.
+    """
+
+    def __init__(self, port=0, ads_per_location=1000, page_size=25, latency=0.05, error_rate=0.0, seed=0,
+                 max_concurrent=None):
+        self.ads_per_location = ads_per_location
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_concurrent = max_concurrent
+        self.seed = seed
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._rnd = random.Random(seed)
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def listing(self, location_slug):
+        """Every ad of a location, newest first, as (price, ad)."""
+        return self._listing(location_slug)
+
+    @lru_cache(maxsize=64)
+    def _listing(self, location_slug):
+        ads = []
+        for n in range(self.ads_per_location):
+            ad = make_ad(random.Random(f"{self.seed}:{location_slug}:{n}"), location_slug, n)
+            ads.append((int(ad["price"][3:].replace(",", "")), ad))
+        return ads
+
+    def page(self, location_slug, page, price_min=None, price_max=None):
+        """The serp JSON for one location page, within the optional price bounds."""
+        ads = [
+            ad for price, ad in self.listing(location_slug)
+            if (price_min is None or price >= price_min) and (price_max is None or price <= price_max)
+        ]
+        start = (page - 1) * self.page_size
+        return {
+            "ads": ads[start:start + self.page_size],
+            "paginationData": {
+                "activePage": page,
+                "pageSize": self.page_size,
+                "total": len(ads)
+            }
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/data/serp":
+                    self.send_error(404)
+                    return
+                query = parse_qs(url.query)
+                with server._lock:
+                    server.requests += 1
+                    throttled = server.max_concurrent is not None and server.in_flight >= server.max_concurrent
+                    if throttled:
+                        server.throttled += 1
+                    else:
+                        server.in_flight += 1
+                if throttled:
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                try:
+                    self._answer(query)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _answer(self, query):
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    failed = server._rnd.random() < server.error_rate
+                if failed:
+                    self.send_error(503)
+                    return
+
+                price_min = price_max = None
+                for item in json.loads(query.get("filter_json", ["[]"])[0]):
+                    if item.get("type") == "money" and item.get("key") == "price":
+                        price_min = item.get("minimum")
+                        price_max = item.get("maximum")
+                body = json.dumps(
+                    server.page(
+                        query.get("locationSlug", ["unknown"])[0], int(query.get("page", ["1"])[0]),
+                        price_min, price_max
+                    ),
+                    ensure_ascii=False
+                ).encode("utf-8")
+                with server._lock:
+                    server.bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ads", type=int, default=1000, help="ads per location")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent", type=int, default=None, help="answer 429 above this concurrency")
+    args = parser.parse_args()
+
+    server = SerpServer(
+        args.port, args.ads, latency=args.latency, error_rate=args.error_rate, max_concurrent=args.max_concurrent
+    )
+    print(f"Serving fake serp API on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+
+from ikman_scraper.presentation.cli import main
+
+sys.exit(main())
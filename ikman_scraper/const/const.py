@@ -1 +1,93 @@
+import os
+
 DEDUPLICATION_THRESHOLD = 95
+
+# How cleanup scores title pairs: "index" (pair by pair) or "matrix" (batched)
+DEDUPLICATION_BACKEND = "matrix"
+
+# CPU cores used by the "matrix" backend (-1 = all cores)
+DEDUPLICATION_WORKERS = -1
+
+# Default cleanup mode: False loads the whole range in memory (and reuses the
+# incremental dedup state), True streams it with memory bounded by the dedup index
+CLEANUP_STREAMING = False
+
+# Lowest score kept in the similarity graph used to preview thresholds; any
+# threshold from here to 100 can be re-applied without new comparisons
+SIMILARITY_GRAPH_FLOOR = 80
+
+# Format of the cleaned file: "xlsx", "csv", "parquet" (needs pyarrow) or "jsonl.gz"
+CLEANUP_OUTPUT_FORMAT = "xlsx"
+
+# Where the serp API is served from; IKMAN_BASE_URL points the scraper at a
+# local stand-in (see benchmarks/serp_server.py)
+IKMAN_BASE_URL = os.environ.get("IKMAN_BASE_URL", "https://ikman.lk")
+
+# Search filters sent to ikman.lk as filter_json. Prices are in rupees
+# (None = no bound); bedrooms/bathrooms list the accepted values (empty = any).
+SCRAPE_FILTERS = {
+    "price_min": None,
+    "price_max": 25_000_000,
+    "bedrooms": ["3", "4", "5"],
+    "bathrooms": ["2"]
+}
+
+# Query sharding: a location whose search has more pages than this is split
+# into price bands that are paged in parallel (0 = never split). Bands are
+# not split below SCRAPE_BAND_MIN_WIDTH rupees, and need a price_max to split.
+SCRAPE_BAND_MAX_PAGES = 10
+SCRAPE_BAND_MIN_WIDTH = 250_000
+
+# How many serp pages of a single location are fetched at the same time
+SCRAPE_MAX_WORKERS = 8
+
+# How many locations are scraped at the same time
+SCRAPE_MAX_LOCATIONS = 4
+
+# Stop paging a location after this many pages in a row held only ads
+# scraped before (results are sorted newest first). 0 = always walk every page.
+SCRAPE_STOP_AFTER_KNOWN_PAGES = 2
+
+# Seconds to wait for ikman.lk before giving up on a page
+SCRAPE_REQUEST_TIMEOUT = 30
+
+# Requests to one host that may be in flight at the same time: the cap starts
+# at SCRAPE_INITIAL_CONCURRENCY and adapts (AIMD) up to SCRAPE_MAX_CONCURRENCY
+SCRAPE_INITIAL_CONCURRENCY = 8
+SCRAPE_MAX_CONCURRENCY = 32
+
+# Retries of a page answered with 429/5xx or a network error, with exponential
+# backoff (seconds, full jitter) unless the server sends Retry-After
+SCRAPE_MAX_RETRIES = 4
+SCRAPE_BACKOFF_BASE = 0.5
+SCRAPE_BACKOFF_MAX = 60
+
+# Token bucket per host: (requests per second, burst). Hosts not listed are not rate limited.
+SCRAPE_HOST_RATE_LIMITS = {
+    "ikman.lk": (10, 20)
+}
+
+# Serp response cache: "off", "on" (serve fresh entries, store new responses)
+# or "replay" (serve only from the cache, never touch the network)
+SCRAPE_CACHE_MODE = "off"
+
+# Seconds a cached response stays fresh (None = forever)
+SCRAPE_CACHE_TTL = 6 * 60 * 60
+
+# Size limit of data/http_cache; least recently used responses are evicted
+SCRAPE_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# Background scrape/cleanup jobs that may run at the same time
+JOB_MAX_RUNNING = 3
+
+# Seconds between UI refreshes while a background job is running
+JOB_POLL_INTERVAL = 1.0
+
+# Record hot-path timings and counters (see services/metrics_service.py)
+METRICS_ENABLED = True
+
+# Format of the exported metrics file: "prometheus" (data/metrics.prom) or "json" (data/metrics.json)
+METRICS_FORMAT = "prometheus"
+
+# Distinct titles whose normalized form is memoized across cleanups
+NORMALIZE_CACHE_SIZE = 200_000
@@ -1,105 +1,659 @@
 import os
+import glob
+import importlib.util
 import json
+import pickle
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from openpyxl import Workbook, load_workbook
-import pandas as pd
+from .output_writers import OUTPUT_FORMATS, write_rows
+from .repository import DATA_DIR, ROOT_DIR, get_repository
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ASSETS_DIR = os.path.join(BASE_DIR, "..", "assets")
-RAW_SCRAPE_DIR = os.path.join(BASE_DIR, "..", "raw_scrape")
-CLEANED_SCRAPE_DIR = os.path.join(BASE_DIR, "..", "cleaned_scrape")
-HISTORY_FILE = os.path.join(BASE_DIR, "..", "data/scrape_history.json")
+RAW_SCRAPE_DIR = os.path.join(ROOT_DIR, "raw_scrape")
+CLEANED_SCRAPE_DIR = os.path.join(ROOT_DIR, "cleaned_scrape")
+# Incremental dedup states and similarity graphs of the cleanup
+DEDUP_STATE_DIR = os.path.join(CLEANED_SCRAPE_DIR, ".dedup_state")
+# Old JSON history; imported into the SQLite store once and renamed to *.migrated
+HISTORY_FILE = os.path.join(DATA_DIR, "scrape_history.json")
+# Headless runs: lock against overlapping scrapes, one JSON summary per line
+SCRAPE_LOCK_FILE = os.path.join(DATA_DIR, "scrape.lock")
+RUN_SUMMARY_FILE = os.path.join(DATA_DIR, "run_summaries.jsonl")
+# Latest hot-path metrics (see services/metrics_service.py), one file per export format
+METRICS_FILES = {
+    "prometheus": os.path.join(DATA_DIR, "metrics.prom"),
+    "json": os.path.join(DATA_DIR, "metrics.json")
+}
 LOCATIONS_FILE = os.path.join(ASSETS_DIR, "locations.json")
 
 
+# ----------------------------------
+# Cached loaders
+# ----------------------------------
+_loader_cache = {}  # name -> (version, value)
+_loader_cache_lock = threading.Lock()
+
+
+def files_stamp(paths):
+    """(mtime_ns, size) of every path, None for a missing one; changes whenever one of the files does."""
+    stamp = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+def cached_by_version(name, version, load):
+    """
+    The value of `load()`, kept under `name` until `version` changes.
+    The caller takes `version` before loading, so a change made while
+    loading is seen by the next call. One value is kept per name. The
+    value is shared between callers: treat it as read-only.
+    """
+    with _loader_cache_lock:
+        cached = _loader_cache.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    value = load()
+    with _loader_cache_lock:
+        _loader_cache[name] = (version, value)
+    return value
+
+
+def cached_by_mtime(name, paths, load):
+    """
+    cached_by_version keyed on `paths`: the value is kept until one of them
+    changes (mtime or size, or the file appears or disappears), so a
+    Streamlit rerun costs a few stat calls instead of reading the files again.
+    """
+    paths = tuple(paths)
+    return cached_by_version(name, (paths, files_stamp(paths)), load)
+
+
+def clear_cached_loaders():
+    """Forget every value of `cached_by_version` and `cached_by_mtime`."""
+    with _loader_cache_lock:
+        _loader_cache.clear()
+
+
+_history_migrated = False
+
+
+def _history_repository():
+    """The repository, after importing the old scrape_history.json once."""
+    global _history_migrated
+    repo = get_repository()
+    if not _history_migrated:
+        repo.migrate_history_json(HISTORY_FILE)
+        _history_migrated = True
+    return repo
+
+
 def load_history():
-    """Load the scrape history from a JSON file."""
-    if not os.path.exists(HISTORY_FILE):
-        return []
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """
+    Every scrape history record, oldest first. Cached until a record is
+    added (see cached_by_version); listing and checkpoint writes to the
+    same store keep the cache. Treat the records as read-only.
+    """
+    repo = _history_repository()
+    return cached_by_version("history", (repo.db_path, repo.history_version()), repo.load_history)
+
+
+def load_history_dates():
+    """Distinct scrape dates in the history, ascending (from the cached history, no second query)."""
+    return sorted({r["date"] for r in load_history()})
 
 
-def save_history(history_data):
-    """Overwrite the scrape_history.json file."""
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history_data, f, indent=4)
+def find_history_files(start_str, end_str):
+    """Output files of the runs dated in [start_str, end_str] ("YYYY-MM-DD"), each once."""
+    return _history_repository().history_files_between(start_str, end_str)
 
 
 def add_history_record(record):
-    """Append one record to scrape_history.json."""
-    history = load_history()
-    history.append(record)
-    save_history(history)
+    """Append one record to the scrape history."""
+    _history_repository().add_history_record(record)
 
 
-def load_locations():
-    """Read all available locations from assets/locations.json."""
+def append_run_summary(summary, path=None):
+    """Append one machine-readable run summary as a JSON line."""
+    path = path or RUN_SUMMARY_FILE
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+
+
+def _read_locations():
     if not os.path.exists(LOCATIONS_FILE):
         return []
     with open(LOCATIONS_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
-def ensure_excel_file():
+def load_locations():
+    """
+    All available locations from assets/locations.json, read again only
+    when the file changes; treat the list as read-only.
+    """
+    return cached_by_mtime("locations", [LOCATIONS_FILE], _read_locations)
+
+
+RAW_HEADERS = [
+    "Area Slug",
+    "Location",
+    "Title",
+    "Description",
+    "Details",
+    "Price (numeric)",
+    "Shop Name",
+    "Slug",
+    "URL",
+    "Date"
+]
+
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Scrape days appended to the store since their Excel file was last exported
+_pending_export_dates = set()
+_pending_lock = threading.Lock()
+
+
+def raw_excel_path(date_str):
+    """Path of the raw Excel export for one scrape day."""
+    return os.path.join(RAW_SCRAPE_DIR, f"ikman_scrape_{date_str}.xlsx")
+
+
+def append_raw_records(records):
+    """
+    Appends a list of records to the raw scrape store.
+    Each record is a list matching RAW_HEADERS.
+    Returns the Excel file the records will be exported to.
+    """
+    if not records:
+        return None
+    get_repository().append_raw_rows(records, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    dates = {row[-1] for row in records}
+    with _pending_lock:
+        _pending_export_dates.update(dates)
+    return raw_excel_path(records[-1][-1])
+
+
+def mark_export_pending(dates):
+    """Queue the raw Excel export of `dates` (e.g. days a crashed run wrote to)."""
+    with _pending_lock:
+        _pending_export_dates.update(dates)
+
+
+# ----------------------------------
+# Runs and checkpoints
+# ----------------------------------
+def _now_str():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def start_scrape_run(locations, run_id=None, filters=None):
+    """
+    Register a scrape run of `locations` with its search `filters`
+    (or reopen `run_id` to resume it). Returns the run id.
+    """
+    run_id = run_id or uuid.uuid4().hex[:12]
+    get_repository().start_run(run_id, locations, _now_str(), os.getpid(), filters)
+    return run_id
+
+
+def finish_scrape_run(run_id, status):
+    """Close a run as "done", "cancelled" or "failed"."""
+    get_repository().finish_run(run_id, status, _now_str())
+
+
+def load_scrape_run(run_id):
+    """One run {run_id, started_at, finished_at, status, pid, locations, filters}, or None."""
+    return get_repository().get_run(run_id)
+
+
+def list_scrape_runs(statuses=None, limit=20):
+    """Latest runs first."""
+    return get_repository().list_runs(statuses, limit)
+
+
+def open_checkpoint(run_id, location_slug):
+    """Checkpoint of one location in a run (created empty on first use)."""
+    return get_repository().open_checkpoint(run_id, location_slug, _now_str())
+
+
+def load_checkpoints(run_id):
+    """Every location checkpoint of a run."""
+    return get_repository().load_checkpoints(run_id)
+
+
+def commit_raw_page(run_id, location_slug, page, records, total_pages, failed=False):
+    """
+    Idempotent version of `append_raw_records` for checkpointed runs: the
+    records of one page and the checkpoint move together, and a page that
+    was already committed is ignored. A `failed` page only advances the
+    checkpoint and is listed in its failed pages, until a resume commits it.
+    Returns the Excel file the records will be exported to (None without records).
+    """
+    excel_file = raw_excel_path(records[-1][-1]) if records else None
+    committed = get_repository().commit_page(
+        run_id, location_slug, page, records, _now_str(), total_pages, failed=failed, excel_file=excel_file
+    )
+    if committed and records:
+        mark_export_pending({row[-1] for row in records})
+    return excel_file
+
+
+def set_checkpoint_status(run_id, location_slug, status):
+    """Mark one location of a run "running", "done", "cancelled" or "failed" (pages left to retry)."""
+    get_repository().set_checkpoint_status(run_id, location_slug, status, _now_str())
+
+
+def lookup_seen_slugs(location_slug, slugs):
+    """Return {slug: last_seen} for ads of this location that were scraped before."""
+    return get_repository().lookup_seen_slugs(location_slug, slugs)
+
+
+def query_listings(location=None, seen_since=None, page=1, page_size=50):
+    """
+    One page of the current listings (one row per ad slug, latest sighting first).
+    Returns {"rows", "total", "page", "pages"}.
+    """
+    page_size = max(1, int(page_size))
+    page = max(1, int(page))
+    rows, total = get_repository().query_listings(
+        location=location, seen_since=seen_since, limit=page_size, offset=(page - 1) * page_size
+    )
+    return {"rows": rows, "total": total, "page": page, "pages": max(1, -(-total // page_size))}
+
+
+def listing_locations():
+    """Locations that have tracked listings."""
+    return get_repository().listing_locations()
+
+
+def listing_price_history(slug):
+    """Recorded prices of one listing, oldest first."""
+    return get_repository().price_history(slug)
+
+
+def find_price_drops(since=None, location=None, limit=100):
+    """Listings whose latest price is below the previous one, largest drop first."""
+    return get_repository().price_drops(since=since, location=location, limit=limit)
+
+
+def _read_raw_excel_rows(path):
+    """Rows of a raw Excel file as store rows: RAW_HEADERS order, empty cells as "" (price as 0)."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = []
+        for row in wb.active.iter_rows(min_row=2, max_col=len(RAW_HEADERS), values_only=True):
+            if all(v is None for v in row):
+                continue
+            row = list(row) + [None] * (len(RAW_HEADERS) - len(row))
+            rows.append(tuple(
+                (0 if i == 5 else "") if v is None else v for i, v in enumerate(row)
+            ))
+        return rows
+    finally:
+        wb.close()
+
+
+def import_raw_excel(date_str):
     """
-    Creates/returns today's raw Excel file (WB, sheet, path).
+    Before the first export of `date_str`, merge its existing raw Excel file
+    into the store, so rows written by the old file-appending code are not
+    dropped by the export. Done once per day; returns the rows imported.
+    """
+    repo = get_repository()
+    if repo.raw_day_imported(date_str):
+        return 0
+    path = raw_excel_path(date_str)
+    rows = _read_raw_excel_rows(path) if os.path.exists(path) else []
+    return repo.import_raw_day_rows(date_str, rows, _now_str())
+
+
+def export_raw_excel(date_str):
     """
+    Write every ad stored for `date_str` to its raw Excel file in one pass.
+    Uses openpyxl's write-only mode, so rows are streamed instead of
+    building the whole workbook in memory.
+    """
+    from openpyxl import Workbook
+
     if not os.path.exists(RAW_SCRAPE_DIR):
         os.makedirs(RAW_SCRAPE_DIR)
 
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    filename = os.path.join(RAW_SCRAPE_DIR, f"ikman_scrape_{today_str}.xlsx")
+    import_raw_excel(date_str)
+    filename = raw_excel_path(date_str)
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet("ScrapeData")
+    sheet.append(RAW_HEADERS)
+    for row in get_repository().iter_raw_rows(date_str):
+        sheet.append(list(row))
 
-    if os.path.exists(filename):
-        wb = load_workbook(filename)
-        sheet = wb.active
-        return wb, sheet, filename
-    else:
-        wb = Workbook()
-        sheet = wb.active
-        sheet.title = "ScrapeData"
-        headers = [
-            "Area Slug",
-            "Location",
-            "Title",
-            "Description",
-            "Details",
-            "Price (numeric)",
-            "Shop Name",
-            "Slug",
-            "URL",
-            "Date"
-        ]
-        sheet.append(headers)
-        wb.save(filename)
-        return wb, sheet, filename
-
-
-def append_to_excel(records):
-    """
-    Appends a list of records to today's raw Excel file.
-    Each record is a list matching the columns above.
-    """
-    wb, sheet, filename = ensure_excel_file()
-    for row_data in records:
-        sheet.append(row_data)
-    wb.save(filename)
+    # Save next to the target and swap, so readers never see a half-written file;
+    # the name is unique per process and thread, so concurrent exports don't collide
+    tmp_name = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        wb.save(tmp_name)
+        os.replace(tmp_name, filename)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
     return filename
 
 
+def export_pending_raw_excel():
+    """Export the Excel file of every day appended to since the last export."""
+    with _pending_lock:
+        dates = sorted(_pending_export_dates)
+        _pending_export_dates.clear()
+    return [export_raw_excel(d) for d in dates]
+
+
 def read_excel_file(path):
     """Read an Excel file into a pandas DataFrame."""
+    import pandas as pd
+
     if not os.path.exists(path):
         return None
     return pd.read_excel(path)
 
 
-def write_excel_file(df, path):
-    """Write a pandas DataFrame to an Excel file."""
-    # Ensure folder exists (for cleaned files, etc.)
+def sidecar_path(path):
+    """
+    Columnar copy of a raw Excel file, named after the file's mtime and size
+    so an edited or re-exported file never matches an old sidecar.
+    Parquet when pyarrow is installed, a pickled DataFrame otherwise.
+    """
+    st = os.stat(path)
+    ext = "parquet" if _HAS_PYARROW else "pkl"
+    folder = os.path.join(os.path.dirname(path), ".sidecars")
+    return os.path.join(folder, f"{os.path.basename(path)}.{st.st_mtime_ns}.{st.st_size}.{ext}")
+
+
+def _select_columns(df, columns):
+    """The requested `columns` that `df` has, in the requested order (all of them for None)."""
+    if columns is None:
+        return df
+    return df[[c for c in columns if c in df.columns]]
+
+
+def _read_sidecar(cached, columns=None):
+    import pandas as pd
+
+    if cached.endswith(".parquet"):
+        if columns is not None:
+            try:
+                # Columnar: only the requested columns are read from disk
+                return pd.read_parquet(cached, columns=columns)
+            except Exception:
+                pass  # some of them are missing from this file
+        return _select_columns(pd.read_parquet(cached), columns)
+    return _select_columns(pd.read_pickle(cached), columns)
+
+
+def read_raw_file(path, columns=None):
+    """
+    Read one raw Excel file into a DataFrame through its columnar sidecar.
+    On a miss the Excel file is parsed and the sidecar (re)written.
+    With `columns`, only those of them that the file has are returned.
+    """
+    if not os.path.exists(path):
+        return None
+
+    cached = sidecar_path(path)
+    if os.path.exists(cached):
+        try:
+            return _read_sidecar(cached, columns)
+        except Exception:
+            pass  # unreadable sidecar: parse the Excel file again
+
+    import pandas as pd
+
+    df = pd.read_excel(path)
+
+    folder = os.path.dirname(cached)
+    os.makedirs(folder, exist_ok=True)
+    # Sidecars of older versions of this file are useless now
+    for old in glob.glob(os.path.join(glob.escape(folder), glob.escape(os.path.basename(path)) + ".*")):
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    tmp_path = f"{cached}.{os.getpid()}.tmp"
+    try:
+        if cached.endswith(".parquet"):
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, cached)
+    except Exception:
+        # Mixed-type columns can't always be stored as Parquet; the sidecar is only a cache
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return _select_columns(df, columns)
+
+
+def _warm_sidecar(path):
+    read_raw_file(path)
+
+
+def warm_sidecars(paths, workers=None):
+    """
+    Parse the raw files in `paths` that have no sidecar yet, in parallel
+    worker processes, without sending their data back. Later reads of
+    these files (e.g. column by column) then come from the sidecars.
+    """
+    misses = [p for p in paths if os.path.exists(p) and not os.path.exists(sidecar_path(p))]
+    if len(misses) == 1 or workers == 1:
+        for path in misses:
+            _warm_sidecar(path)
+    elif misses:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_warm_sidecar, misses))
+
+
+def read_raw_files(paths, workers=None, columns=None):
+    """
+    Read several raw Excel files, in the order of `paths`.
+    Files with a valid sidecar are loaded directly; the rest are parsed in
+    parallel worker processes (openpyxl parsing is CPU bound).
+    `columns` limits every frame to those columns (see read_raw_file).
+    """
+    frames = [None] * len(paths)
+    misses = []
+    for i, path in enumerate(paths):
+        if os.path.exists(path) and os.path.exists(sidecar_path(path)):
+            frames[i] = read_raw_file(path, columns)
+        else:
+            misses.append(i)
+
+    if len(misses) == 1 or workers == 1:
+        for i in misses:
+            frames[i] = read_raw_file(paths[i], columns)
+    elif misses:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            miss_paths = [paths[i] for i in misses]
+            for i, df in zip(misses, executor.map(read_raw_file, miss_paths, [columns] * len(miss_paths))):
+                frames[i] = df
+    return frames
+
+
+def write_cleaned_file(rows, headers, path, fmt="xlsx"):
+    """
+    Stream cleaned rows (tuples ordered like `headers`) into `path` in one of
+    OUTPUT_FORMATS. Returns {"format", "rows", "bytes", "seconds"}.
+    """
+    started = time.perf_counter()
+    count = write_rows(rows, headers, path, fmt)
+    return {
+        "format": fmt,
+        "rows": count,
+        "bytes": os.path.getsize(path),
+        "seconds": time.perf_counter() - started
+    }
+
+
+def read_dedup_state(path):
+    """Load a pickled cleanup dedup state, or None if there is none (or it is unreadable)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def similarity_graph_path(start_date, end_date):
+    """Where the cleanup keeps the similarity graph of a date range."""
+    return os.path.join(
+        DEDUP_STATE_DIR, f"graph_{start_date.strftime('%Y-%m-%d')}_to_{end_date.strftime('%Y-%m-%d')}.pkl"
+    )
+
+
+def read_similarity_graph(path):
+    """A saved similarity graph, read again only when its file changes (one graph is kept)."""
+    return cached_by_mtime("similarity_graph", [path], lambda: read_dedup_state(path))
+
+
+def write_dedup_state(state, path):
+    """Pickle a cleanup dedup state, replacing the old one atomically."""
     folder = os.path.dirname(path)
     if not os.path.exists(folder):
         os.makedirs(folder)
 
-    df.to_excel(path, index=False)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+# ----------------------------------
+# Cleaned listings store
+# ----------------------------------
+# cleaned_YYYY-MM-DD_to_YYYY-MM-DD.<extension of any OUTPUT_FORMATS>
+CLEANED_FILE_PATTERN = re.compile(
+    r"^(cleaned_(\d{4}-\d{2}-\d{2})_to_(\d{4}-\d{2}-\d{2}))("
+    + "|".join(re.escape(ext) for ext in OUTPUT_FORMATS.values()) + ")$"
+)
+
+
+def _file_signature_str(path):
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _cleaned_rows(df):
+    """Rows ordered like the store's CLEANED_COLUMNS from a cleaned DataFrame (missing values -> None)."""
+    import pandas as pd
+
+    prices = pd.to_numeric(df["Price"], errors="coerce").round().astype("Int64")
+    columns = pd.DataFrame({
+        "location": df["Location"].astype(object),
+        "date": pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m-%d"),
+        "title": df["Title"].astype(object),
+        "price": prices.astype(object),
+        "link": df["Link"].astype(object)
+    })
+    columns = columns.astype(object).where(columns.notna(), None)
+    return list(columns.itertuples(index=False, name=None))
+
+
+def store_cleaned_rows(rows, path):
+    """
+    Load cleaned rows (tuples ordered like the store's CLEANED_COLUMNS:
+    location, "YYYY-MM-DD" date, title, int price, link) written to `path`
+    into the indexed store, replacing the dataset of the same date range
+    (whatever format it was written in). Returns the dataset name.
+    """
+    name = os.path.basename(path)
+    match = CLEANED_FILE_PATTERN.match(name)
+    if match:
+        dataset, start_str, end_str, _ = match.groups()
+    else:
+        dataset, start_str, end_str = os.path.splitext(name)[0], None, None
+    get_repository().replace_cleaned_listings(
+        dataset, rows, start_str, end_str, path, _file_signature_str(path), _now_str()
+    )
+    return dataset
+
+
+def store_cleaned_listings(df, path):
+    """Load a cleaned DataFrame (the columns written to `path`) into the indexed store."""
+    return store_cleaned_rows(_cleaned_rows(df), path)
+
+
+def sync_cleaned_listings():
+    """
+    Load every cleaned_*.xlsx that is missing from the store or changed
+    since it was loaded (files cleaned before the store existed, or by
+    hand). Only file stats are compared, so an up-to-date store costs one
+    directory listing. A range last loaded from another file (e.g. a CSV
+    cleanup of it) is left alone while that file exists.
+    Returns the names of the datasets (re)loaded.
+    """
+    if not os.path.exists(CLEANED_SCRAPE_DIR):
+        return []
+    loaded = {d["name"]: d for d in get_repository().list_cleaned_datasets()}
+    synced = []
+    for name in sorted(os.listdir(CLEANED_SCRAPE_DIR)):
+        match = CLEANED_FILE_PATTERN.match(name)
+        if not match or match.group(4) != OUTPUT_FORMATS["xlsx"]:
+            continue
+        path = os.path.join(CLEANED_SCRAPE_DIR, name)
+        current = loaded.get(match.group(1))
+        if current is not None:
+            if current["source"] != path and current["source"] and os.path.exists(current["source"]):
+                continue
+            if current["source"] == path and current["signature"] == _file_signature_str(path):
+                continue
+        df = read_excel_file(path)
+        if df is None or any(c not in df.columns for c in ("Location", "Date", "Title", "Price", "Link")):
+            continue
+        synced.append(store_cleaned_listings(df, path))
+    return synced
+
+
+def list_cleaned_datasets():
+    """Cleaned datasets in the store, latest date range first."""
+    return get_repository().list_cleaned_datasets()
+
+
+def cleaned_locations(dataset):
+    """Locations present in one cleaned dataset."""
+    return get_repository().cleaned_locations(dataset)
+
+
+def query_cleaned_listings(dataset, page=1, page_size=50, **filters):
+    """
+    One page of a cleaned dataset; `filters` are the keyword arguments of
+    ScrapeRepository.query_cleaned_listings (locations, price_min, price_max,
+    date_from, date_to, title, sort_by, descending).
+    Returns {"rows", "total", "page", "pages"}; `page` is clamped to the last page.
+    """
+    page_size = max(1, int(page_size))
+    page = max(1, int(page))
+    rows, total = get_repository().query_cleaned_listings(
+        dataset, limit=page_size, offset=(page - 1) * page_size, **filters
+    )
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        page = pages
+        rows, total = get_repository().query_cleaned_listings(
+            dataset, limit=page_size, offset=(page - 1) * page_size, **filters
+        )
+    return {"rows": rows, "total": total, "page": page, "pages": pages}
@@ -0,0 +1,154 @@
+import csv
+import gzip
+import importlib.util
+import json
+import math
+import os
+import threading
+from datetime import date, datetime
+
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Output format -> file extension of the cleaned file
+OUTPUT_FORMATS = {
+    "xlsx": ".xlsx",
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "jsonl.gz": ".jsonl.gz"
+}
+
+# Parquet column types by header; any other column is stored as text
+PARQUET_TYPES = {
+    "Date": "timestamp",
+    "Price": "float64"
+}
+
+# Rows buffered per Parquet row group
+PARQUET_BATCH_ROWS = 10_000
+
+
+def plain_value(value):
+    """
+    A cell value every writer understands: NaN/NaT/None -> None,
+    pandas Timestamps -> datetime, numpy scalars -> Python numbers.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if isinstance(value, (str, int)):
+        return value
+    if hasattr(value, "to_pydatetime"):
+        # pandas Timestamp; NaT compares unequal to itself
+        return None if value != value else value.to_pydatetime()
+    if hasattr(value, "item"):
+        return plain_value(value.item())
+    if value != value:
+        return None
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_xlsx(rows, headers, f, sheet_name="Sheet1"):
+    from openpyxl import Workbook
+
+    # Write-only mode streams every row to disk instead of keeping the workbook in memory
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet(sheet_name)
+    sheet.append(headers)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    wb.save(f)
+    return count
+
+
+def _write_csv(rows, headers, f):
+    with open(f, "w", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out)
+        writer.writerow(headers)
+        count = 0
+        for row in rows:
+            writer.writerow(["" if v is None else v for v in row])
+            count += 1
+    return count
+
+
+def _write_jsonl_gz(rows, headers, f):
+    with gzip.open(f, "wt", encoding="utf-8") as out:
+        count = 0
+        for row in rows:
+            out.write(json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=_json_default))
+            out.write("\n")
+            count += 1
+    return count
+
+
+def _write_parquet(rows, headers, f):
+    if not _HAS_PYARROW:
+        raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"timestamp": pa.timestamp("us"), "float64": pa.float64()}
+    schema = pa.schema([(h, types.get(PARQUET_TYPES.get(h), pa.string())) for h in headers])
+    text_columns = [i for i, h in enumerate(headers) if h not in PARQUET_TYPES]
+    count = 0
+    with pq.ParquetWriter(f, schema) as writer:
+        batch = []
+
+        def flush():
+            columns = [list(col) for col in zip(*batch)]
+            for i in text_columns:
+                columns[i] = [None if v is None else str(v) for v in columns[i]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+            ))
+            batch.clear()
+
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                flush()
+        if batch:
+            flush()
+    return count
+
+
+_WRITERS = {
+    "xlsx": _write_xlsx,
+    "csv": _write_csv,
+    "parquet": _write_parquet,
+    "jsonl.gz": _write_jsonl_gz
+}
+
+
+def write_rows(rows, headers, path, fmt="xlsx"):
+    """
+    Stream `rows` (an iterable of tuples ordered like `headers`) into `path`
+    as one of OUTPUT_FORMATS, holding at most one Parquet row group in
+    memory. The file is written next to `path` and swapped in when complete.
+    Returns the number of rows written.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    # Unique per process and thread, so two writers of the same path never share a temp file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        count = _WRITERS[fmt]((tuple(plain_value(v) for v in row) for row in rows), list(headers), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
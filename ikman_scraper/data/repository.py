@@ -0,0 +1,845 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Everything the scraper writes lives under ROOT_DIR; set IKMAN_DATA_ROOT to move it
+# (e.g. benchmarks run against a scratch directory)
+ROOT_DIR = os.environ.get("IKMAN_DATA_ROOT") or os.path.join(BASE_DIR, "..")
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+DB_FILE = os.path.join(DATA_DIR, "ikman.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_ads (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    area_slug   TEXT,
+    location    TEXT,
+    title       TEXT,
+    description TEXT,
+    details     TEXT,
+    price       INTEGER,
+    shop_name   TEXT,
+    slug        TEXT,
+    url         TEXT,
+    date        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_raw_ads_date ON raw_ads (date);
+
+CREATE TABLE IF NOT EXISTS seen_slugs (
+    location_slug TEXT NOT NULL,
+    slug          TEXT NOT NULL,
+    first_seen    TEXT NOT NULL,
+    last_seen     TEXT NOT NULL,
+    PRIMARY KEY (location_slug, slug)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS listings (
+    slug          TEXT PRIMARY KEY,
+    location_slug TEXT,
+    location      TEXT,
+    title         TEXT,
+    url           TEXT,
+    price         INTEGER,
+    first_seen    TEXT NOT NULL,
+    last_seen     TEXT NOT NULL,
+    -- The price before the latest change and the day of that change
+    previous_price   INTEGER,
+    price_changed_on TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_listings_last_seen ON listings (last_seen);
+CREATE INDEX IF NOT EXISTS idx_listings_location ON listings (location, last_seen);
+
+CREATE TABLE IF NOT EXISTS price_history (
+    id      INTEGER PRIMARY KEY,
+    slug    TEXT NOT NULL,
+    seen_on TEXT NOT NULL,
+    price   INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_price_history_slug ON price_history (slug, id);
+CREATE INDEX IF NOT EXISTS idx_price_history_seen ON price_history (slug, seen_on);
+
+CREATE TABLE IF NOT EXISTS scrape_history (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    date      TEXT NOT NULL,
+    record    TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS history_files (
+    history_id INTEGER NOT NULL REFERENCES scrape_history (id),
+    date       TEXT NOT NULL,
+    excel_file TEXT NOT NULL,
+    PRIMARY KEY (history_id, excel_file)
+);
+CREATE INDEX IF NOT EXISTS idx_history_files_date ON history_files (date);
+
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    run_id      TEXT PRIMARY KEY,
+    started_at  TEXT NOT NULL,
+    finished_at TEXT,
+    status      TEXT NOT NULL,
+    pid         INTEGER,
+    locations   TEXT NOT NULL,
+    filters     TEXT
+);
+
+CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+    run_id          TEXT NOT NULL REFERENCES scrape_runs (run_id),
+    location_slug   TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    last_page       INTEGER NOT NULL DEFAULT 0,
+    total_pages     INTEGER NOT NULL DEFAULT 0,
+    pages_committed INTEGER NOT NULL DEFAULT 0,
+    ads_committed   INTEGER NOT NULL DEFAULT 0,
+    failed_pages    TEXT NOT NULL DEFAULT '[]',
+    excel_file      TEXT,
+    updated_at      TEXT NOT NULL,
+    PRIMARY KEY (run_id, location_slug)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cleaned_datasets (
+    id         INTEGER PRIMARY KEY,
+    name       TEXT NOT NULL UNIQUE,
+    start_date TEXT,
+    end_date   TEXT,
+    row_count  INTEGER NOT NULL,
+    source     TEXT,
+    signature  TEXT,
+    loaded_at  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS cleaned_listings (
+    id         INTEGER PRIMARY KEY,
+    dataset_id INTEGER NOT NULL REFERENCES cleaned_datasets (id),
+    location   TEXT,
+    date       TEXT,
+    title      TEXT,
+    price      INTEGER,
+    link       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cleaned_date ON cleaned_listings (dataset_id, date);
+CREATE INDEX IF NOT EXISTS idx_cleaned_price ON cleaned_listings (dataset_id, price);
+CREATE INDEX IF NOT EXISTS idx_cleaned_title ON cleaned_listings (dataset_id, title);
+CREATE INDEX IF NOT EXISTS idx_cleaned_location_date ON cleaned_listings (dataset_id, location, date);
+CREATE INDEX IF NOT EXISTS idx_cleaned_location_price ON cleaned_listings (dataset_id, location, price);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+RAW_COLUMNS = [
+    "area_slug", "location", "title", "description", "details",
+    "price", "shop_name", "slug", "url", "date"
+]
+
+LISTING_COLUMNS = ["slug", "location_slug", "location", "title", "url", "price", "first_seen", "last_seen"]
+
+CHECKPOINT_COLUMNS = [
+    "run_id", "location_slug", "status", "last_page", "total_pages",
+    "pages_committed", "ads_committed", "failed_pages", "excel_file", "updated_at"
+]
+
+CLEANED_COLUMNS = ["location", "date", "title", "price", "link"]
+
+CLEANED_DATASET_COLUMNS = ["name", "start_date", "end_date", "row_count", "source", "signature", "loaded_at"]
+
+# Columns the cleaned listings can be ordered by (anything else is refused, never interpolated)
+CLEANED_SORT_COLUMNS = ("date", "price", "location", "title")
+
+# Substring index over cleaned titles; needs SQLite built with FTS5 (3.34+ for the trigram tokenizer)
+TITLE_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS cleaned_titles USING fts5 (title, tokenize = 'trigram');
+"""
+
+# Trigram search can't match anything shorter than one trigram
+TITLE_SEARCH_MIN_LENGTH = 3
+
+
+class ScrapeRepository:
+    """
+    Append-only store for scraped ads, backed by SQLite in WAL mode.
+    One connection is kept open for the whole run; appends from several
+    threads are serialized through a lock and committed per batch.
+    """
+
+    def __init__(self, db_path=DB_FILE):
+        folder = os.path.dirname(db_path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only syncs on checkpoints, which is plenty for scrape data
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # 64 MB page cache, so bulk loads into the indexed cleaned store stay mostly in memory
+        self._conn.execute("PRAGMA cache_size=-65536")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._backfill_listings()
+        try:
+            self._conn.executescript(TITLE_SEARCH_SCHEMA)
+            self.title_search = True
+        except sqlite3.OperationalError:
+            # No FTS5 / trigram in this SQLite build: title filters fall back to LIKE scans
+            self.title_search = False
+
+    def _migrate(self):
+        """Add columns introduced after a table was first created."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scrape_runs)")}
+        if "filters" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE scrape_runs ADD COLUMN filters TEXT")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(listings)")}
+        if "previous_price" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE listings ADD COLUMN previous_price INTEGER")
+                self._conn.execute("ALTER TABLE listings ADD COLUMN price_changed_on TEXT")
+                # The last two prices of every listing, once, through idx_price_history_seen
+                self._conn.execute(
+                    "UPDATE listings SET "
+                    "previous_price = (SELECT price FROM price_history p WHERE p.slug = listings.slug "
+                    "                  ORDER BY seen_on DESC, id DESC LIMIT 1 OFFSET 1), "
+                    "price_changed_on = (SELECT seen_on FROM price_history p WHERE p.slug = listings.slug "
+                    "                    ORDER BY seen_on DESC, id DESC LIMIT 1)"
+                )
+        # Only the listings whose price went down; created here as older tables lack the columns
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_listings_drops ON listings (price_changed_on) "
+            "WHERE price < previous_price"
+        )
+
+    def _track_listings(self, rows):
+        """
+        Fold raw rows (ordered like RAW_COLUMNS) into the listings table:
+        one row per slug with its first/last scrape day and latest price.
+        The rows of each slug are taken in date order and every one is
+        compared with the sighting before it (earlier in the batch, else the
+        stored listing); a price_history row is appended whenever the price
+        differs (or the slug is new). A listing only moves forward: a row
+        older than its last_seen just extends first_seen and is slotted into
+        the price history at its date (see `_insert_past_price`).
+        Caller holds the transaction.
+        """
+        by_slug = {}
+        for r in rows:
+            if r[7]:
+                by_slug.setdefault(r[7], []).append(r)
+        if not by_slug:
+            return
+
+        stored = {}
+        slugs = list(by_slug)
+        for start in range(0, len(slugs), 500):
+            batch = slugs[start:start + 500]
+            for slug, *values in self._conn.execute(
+                "SELECT slug, price, first_seen, last_seen, previous_price, price_changed_on FROM listings "
+                f"WHERE slug IN ({', '.join('?' for _ in batch)})",
+                batch
+            ):
+                stored[slug] = dict(zip(("price", "first_seen", "last_seen", "previous_price", "price_changed_on"),
+                                        values))
+
+        history = []
+        forward = []
+        backward = []
+        rewritten = []
+        for slug, group in by_slug.items():
+            group.sort(key=lambda r: r[9])  # stable: same-day rows keep their batch order
+            current = stored.get(slug)
+            latest = None
+            for r in group:
+                price, date = r[5], r[9]
+                if current is None:
+                    history.append((slug, date, price))
+                    current = {"price": price, "first_seen": date, "last_seen": date,
+                               "previous_price": None, "price_changed_on": date}
+                    latest = r
+                elif date >= current["last_seen"]:
+                    if price != current["price"]:
+                        history.append((slug, date, price))
+                        current["previous_price"] = current["price"]
+                        current["price"] = price
+                        current["price_changed_on"] = date
+                    current["last_seen"] = date
+                    latest = r
+                else:
+                    # An older day imported after a newer one
+                    current["first_seen"] = min(current["first_seen"], date)
+                    self._insert_past_price(slug, date, price)
+                    rewritten.append(slug)
+            if latest is None:
+                backward.append((current["first_seen"], slug))
+            else:
+                forward.append((
+                    slug, latest[0], latest[1], latest[2], latest[8], current["price"], current["first_seen"],
+                    current["last_seen"], current["previous_price"], current["price_changed_on"]
+                ))
+
+        self._conn.executemany("INSERT INTO price_history (slug, seen_on, price) VALUES (?, ?, ?)", history)
+        self._conn.executemany(
+            "INSERT INTO listings (slug, location_slug, location, title, url, price, first_seen, last_seen, "
+            "previous_price, price_changed_on) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (slug) DO UPDATE SET location_slug = excluded.location_slug, "
+            "location = excluded.location, title = excluded.title, url = excluded.url, price = excluded.price, "
+            "first_seen = MIN(first_seen, excluded.first_seen), last_seen = excluded.last_seen, "
+            "previous_price = excluded.previous_price, price_changed_on = excluded.price_changed_on",
+            forward
+        )
+        self._conn.executemany("UPDATE listings SET first_seen = MIN(first_seen, ?) WHERE slug = ?", backward)
+        # A price slotted into the past can change which price came before the latest one
+        self._conn.executemany(
+            "UPDATE listings SET "
+            "previous_price = (SELECT price FROM price_history p WHERE p.slug = listings.slug "
+            "                  ORDER BY seen_on DESC, id DESC LIMIT 1 OFFSET 1), "
+            "price_changed_on = (SELECT seen_on FROM price_history p WHERE p.slug = listings.slug "
+            "                    ORDER BY seen_on DESC, id DESC LIMIT 1) "
+            "WHERE slug = ?",
+            [(slug,) for slug in dict.fromkeys(rewritten)]
+        )
+
+    def _insert_past_price(self, slug, seen_on, price):
+        """
+        Record that `slug` cost `price` on `seen_on`, a day before its latest
+        sighting. Nothing changes if the price in effect that day was the
+        same; if the next recorded price is this one, that change simply
+        happened earlier and is moved back to `seen_on`.
+        """
+        before = self._conn.execute(
+            "SELECT price FROM price_history WHERE slug = ? AND seen_on <= ? ORDER BY seen_on DESC, id DESC LIMIT 1",
+            (slug, seen_on)
+        ).fetchone()
+        if before is not None and before[0] == price:
+            return
+        after = self._conn.execute(
+            "SELECT id, price FROM price_history WHERE slug = ? AND seen_on > ? ORDER BY seen_on, id LIMIT 1",
+            (slug, seen_on)
+        ).fetchone()
+        if after is not None and after[1] == price:
+            self._conn.execute("UPDATE price_history SET seen_on = ? WHERE id = ?", (seen_on, after[0]))
+        else:
+            self._conn.execute(
+                "INSERT INTO price_history (slug, seen_on, price) VALUES (?, ?, ?)", (slug, seen_on, price)
+            )
+
+    def _backfill_listings(self):
+        """One-time build of the listings table from the raw ads stored before it existed."""
+        done = self._conn.execute("SELECT value FROM meta WHERE key = 'listings_backfilled'").fetchone()
+        if done:
+            return
+        with self._conn:
+            cursor = self._conn.execute(f"SELECT {', '.join(RAW_COLUMNS)} FROM raw_ads ORDER BY date, id")
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                self._track_listings(rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('listings_backfilled', '1')")
+
+    def _insert_raw_rows(self, rows, seen_at):
+        """Insert raw rows, mark their slugs as seen and track their listings (caller holds the transaction)."""
+        placeholders = ", ".join("?" for _ in RAW_COLUMNS)
+        sql = f"INSERT INTO raw_ads ({', '.join(RAW_COLUMNS)}) VALUES ({placeholders})"
+        seen = [(row[0], row[7], seen_at, seen_at) for row in rows if row[7]]
+        self._conn.executemany(sql, rows)
+        self._conn.executemany(
+            "INSERT INTO seen_slugs (location_slug, slug, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (location_slug, slug) DO UPDATE SET last_seen = excluded.last_seen",
+            seen
+        )
+        self._track_listings(rows)
+
+    def append_raw_rows(self, rows, seen_at):
+        """
+        Insert rows ordered like RAW_COLUMNS in one transaction and record
+        their slugs as seen at `seen_at` ("YYYY-MM-DD HH:MM:SS").
+        """
+        with self._lock, self._conn:
+            self._insert_raw_rows(rows, seen_at)
+
+    def lookup_seen_slugs(self, location_slug, slugs):
+        """Return {slug: last_seen} for the `slugs` already seen for this location."""
+        slugs = [s for s in set(slugs) if s]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(slugs), 500):
+                batch = slugs[start:start + 500]
+                placeholders = ", ".join("?" for _ in batch)
+                found.update(self._conn.execute(
+                    f"SELECT slug, last_seen FROM seen_slugs WHERE location_slug = ? AND slug IN ({placeholders})",
+                    [location_slug, *batch]
+                ).fetchall())
+        return found
+
+    def raw_day_imported(self, date_str):
+        """True once the raw Excel file of `date_str` went through `import_raw_day_rows`."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM meta WHERE key = ?", (f"raw_excel_imported:{date_str}",)
+            ).fetchone() is not None
+
+    def import_raw_day_rows(self, date_str, rows, seen_at):
+        """
+        One-time merge of the rows of a raw Excel file written before the
+        store existed (the old code appended to it directly) into raw_ads.
+        Rows the store already holds for that day (compared as whole rows,
+        duplicates counted) are skipped, so a file that is already an export
+        of the store adds nothing. Returns the number of rows imported.
+        """
+        key = f"raw_excel_imported:{date_str}"
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            stored = Counter(self._conn.execute(
+                f"SELECT {', '.join(RAW_COLUMNS)} FROM raw_ads WHERE date = ?", (date_str,)
+            ))
+            missing = []
+            for row in rows:
+                row = tuple(row)
+                if stored[row]:
+                    stored[row] -= 1
+                else:
+                    missing.append(row)
+            if missing:
+                self._insert_raw_rows(missing, seen_at)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, '1')", (key,))
+        return len(missing)
+
+    def iter_raw_rows(self, date_str):
+        """
+        Yield the rows scraped on `date_str` in insertion order.
+        Reads through its own connection, so writers are never blocked (WAL).
+        """
+        sql = f"SELECT {', '.join(RAW_COLUMNS)} FROM raw_ads WHERE date = ? ORDER BY id"
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield from conn.execute(sql, (date_str,))
+        finally:
+            conn.close()
+
+    # ----------------------------------
+    # Listings and price history
+    # ----------------------------------
+    def query_listings(self, location=None, seen_since=None, limit=100, offset=0):
+        """
+        Current listings, latest sighting first, optionally only one location
+        and/or those seen on or after `seen_since` ("YYYY-MM-DD").
+        Returns (rows as dicts, total number of matching listings).
+        """
+        where = []
+        params = []
+        if location:
+            where.append("location = ?")
+            params.append(location)
+        if seen_since:
+            where.append("last_seen >= ?")
+            params.append(seen_since)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM listings {where_sql}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(LISTING_COLUMNS)} FROM listings {where_sql} "
+                "ORDER BY last_seen DESC, slug LIMIT ? OFFSET ?",
+                [*params, limit, offset]
+            ).fetchall()
+        return [dict(zip(LISTING_COLUMNS, r)) for r in rows], total
+
+    def listing_locations(self):
+        """Distinct locations with at least one listing, sorted."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT location FROM listings WHERE location IS NOT NULL ORDER BY location"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def price_history(self, slug):
+        """Every recorded price of one listing, oldest first: [{"seen_on", "price"}]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seen_on, price FROM price_history WHERE slug = ? ORDER BY seen_on, id", (slug,)
+            ).fetchall()
+        return [{"seen_on": seen_on, "price": price} for seen_on, price in rows]
+
+    def price_drops(self, since=None, location=None, limit=100):
+        """
+        Listings whose latest recorded price is lower than the one before it,
+        largest relative drop first; `since` keeps drops recorded on or after
+        that day. Each row is a listing dict plus previous_price and dropped_on.
+        """
+        # previous_price is kept on the listing when its price changes, so this is a
+        # range scan of the drops index instead of a window over all of price_history
+        where = ["price < previous_price"]
+        params = []
+        if since:
+            where.append("price_changed_on >= ?")
+            params.append(since)
+        if location:
+            where.append("location = ?")
+            params.append(location)
+        sql = (
+            f"SELECT {', '.join(LISTING_COLUMNS)}, previous_price, price_changed_on FROM listings "
+            f"WHERE {' AND '.join(where)} "
+            "ORDER BY (previous_price - price) * 1.0 / previous_price DESC, slug LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, [*params, limit]).fetchall()
+        drops = []
+        for row in rows:
+            drop = dict(zip(LISTING_COLUMNS, row))
+            drop["previous_price"], drop["dropped_on"] = row[len(LISTING_COLUMNS):]
+            drops.append(drop)
+        return drops
+
+    # ----------------------------------
+    # Runs and checkpoints
+    # ----------------------------------
+    def start_run(self, run_id, locations, started_at, pid, filters=None):
+        """Register a new run, or mark an existing one as running again (resume)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO scrape_runs (run_id, started_at, status, pid, locations, filters) "
+                "VALUES (?, ?, 'running', ?, ?, ?) "
+                "ON CONFLICT (run_id) DO UPDATE SET status = 'running', pid = excluded.pid, finished_at = NULL",
+                (run_id, started_at, pid, json.dumps(locations, ensure_ascii=False),
+                 json.dumps(filters) if filters is not None else None)
+            )
+
+    def finish_run(self, run_id, status, finished_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE scrape_runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                (status, finished_at, run_id)
+            )
+
+    def _run_dict(self, row):
+        run_id, started_at, finished_at, status, pid, locations, filters = row
+        return {
+            "run_id": run_id,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "status": status,
+            "pid": pid,
+            "locations": json.loads(locations),
+            "filters": json.loads(filters) if filters else None
+        }
+
+    def get_run(self, run_id):
+        """One run as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, started_at, finished_at, status, pid, locations, filters FROM scrape_runs "
+                "WHERE run_id = ?",
+                (run_id,)
+            ).fetchone()
+        return self._run_dict(row) if row else None
+
+    def list_runs(self, statuses=None, limit=20):
+        """Latest runs first, optionally only those in `statuses`."""
+        sql = "SELECT run_id, started_at, finished_at, status, pid, locations, filters FROM scrape_runs"
+        params = []
+        if statuses:
+            sql += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        sql += " ORDER BY started_at DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._run_dict(r) for r in rows]
+
+    def _checkpoint_dict(self, row):
+        checkpoint = dict(zip(CHECKPOINT_COLUMNS, row))
+        checkpoint["failed_pages"] = json.loads(checkpoint["failed_pages"])
+        return checkpoint
+
+    def open_checkpoint(self, run_id, location_slug, updated_at):
+        """Return the checkpoint of one location in a run, creating an empty one first if needed."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO scrape_checkpoints (run_id, location_slug, status, updated_at) "
+                "VALUES (?, ?, 'running', ?)",
+                (run_id, location_slug, updated_at)
+            )
+            row = self._conn.execute(
+                f"SELECT {', '.join(CHECKPOINT_COLUMNS)} FROM scrape_checkpoints "
+                "WHERE run_id = ? AND location_slug = ?",
+                (run_id, location_slug)
+            ).fetchone()
+        return self._checkpoint_dict(row)
+
+    def load_checkpoints(self, run_id):
+        """Every checkpoint of a run."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(CHECKPOINT_COLUMNS)} FROM scrape_checkpoints WHERE run_id = ? "
+                "ORDER BY location_slug",
+                (run_id,)
+            ).fetchall()
+        return [self._checkpoint_dict(r) for r in rows]
+
+    def commit_page(self, run_id, location_slug, page, rows, seen_at, total_pages, failed=False, excel_file=None):
+        """
+        Store the rows of one page and move the location's checkpoint to it,
+        in a single transaction. `last_page` is the furthest page handled;
+        every page up to it was committed except those in `failed_pages`.
+        A page at or before the checkpoint that is not listed as failed was
+        committed already (e.g. by a run that crashed right after); it is
+        skipped, so replaying a page never duplicates rows. A listed page
+        that now succeeds (a retry on resume) is stored and taken off the
+        list; one that fails again stays listed once.
+        Returns True if the page was committed now.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT last_page, failed_pages FROM scrape_checkpoints WHERE run_id = ? AND location_slug = ?",
+                (run_id, location_slug)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"No checkpoint for {location_slug} in run {run_id}")
+            last_page, failed_pages = row
+            failed_pages = json.loads(failed_pages)
+            retry = page in failed_pages
+            if page <= last_page and not (retry and not failed):
+                return False
+
+            if failed:
+                failed_pages.append(page)
+            else:
+                if retry:
+                    failed_pages.remove(page)
+                self._insert_raw_rows(rows, seen_at)
+            self._conn.execute(
+                "UPDATE scrape_checkpoints SET last_page = ?, total_pages = ?, "
+                "pages_committed = pages_committed + ?, ads_committed = ads_committed + ?, "
+                "failed_pages = ?, excel_file = COALESCE(?, excel_file), updated_at = ? "
+                "WHERE run_id = ? AND location_slug = ?",
+                (max(page, last_page), total_pages, 0 if failed else 1, len(rows), json.dumps(failed_pages),
+                 excel_file, seen_at, run_id, location_slug)
+            )
+        return True
+
+    def set_checkpoint_status(self, run_id, location_slug, status, updated_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE scrape_checkpoints SET status = ?, updated_at = ? WHERE run_id = ? AND location_slug = ?",
+                (status, updated_at, run_id, location_slug)
+            )
+
+    # ----------------------------------
+    # Cleaned listings
+    # ----------------------------------
+    def replace_cleaned_listings(self, dataset, rows, start_date, end_date, source, signature, loaded_at):
+        """
+        Replace every row of one cleaned dataset with `rows` (ordered like
+        CLEANED_COLUMNS) in a single transaction, so readers see either the
+        old rows or the new ones. Statistics are refreshed afterwards so the
+        planner keeps picking the right index as datasets grow.
+        """
+        placeholders = ", ".join("?" for _ in CLEANED_COLUMNS)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO cleaned_datasets "
+                    "(name, start_date, end_date, row_count, source, signature, loaded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET start_date = excluded.start_date, end_date = excluded.end_date, "
+                    "row_count = excluded.row_count, source = excluded.source, signature = excluded.signature, "
+                    "loaded_at = excluded.loaded_at",
+                    (dataset, start_date, end_date, len(rows), source, signature, loaded_at)
+                )
+                dataset_id = self._conn.execute(
+                    "SELECT id FROM cleaned_datasets WHERE name = ?", (dataset,)
+                ).fetchone()[0]
+                if self.title_search:
+                    self._conn.execute(
+                        "DELETE FROM cleaned_titles "
+                        "WHERE rowid IN (SELECT id FROM cleaned_listings WHERE dataset_id = ?)",
+                        (dataset_id,)
+                    )
+                self._conn.execute("DELETE FROM cleaned_listings WHERE dataset_id = ?", (dataset_id,))
+                self._conn.executemany(
+                    f"INSERT INTO cleaned_listings (dataset_id, {', '.join(CLEANED_COLUMNS)}) "
+                    f"VALUES (?, {placeholders})",
+                    ((dataset_id, *row) for row in rows)
+                )
+                if self.title_search:
+                    self._conn.execute(
+                        "INSERT INTO cleaned_titles (rowid, title) "
+                        "SELECT id, title FROM cleaned_listings WHERE dataset_id = ? AND title IS NOT NULL",
+                        (dataset_id,)
+                    )
+            self._conn.execute("ANALYZE cleaned_listings")
+
+    def list_cleaned_datasets(self):
+        """Loaded cleaned datasets, latest range first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(CLEANED_DATASET_COLUMNS)} FROM cleaned_datasets "
+                "ORDER BY end_date DESC, start_date DESC"
+            ).fetchall()
+        return [dict(zip(CLEANED_DATASET_COLUMNS, r)) for r in rows]
+
+    def _dataset_id(self, dataset):
+        """Id and row count of a dataset by name (caller holds the lock); KeyError if unknown."""
+        row = self._conn.execute("SELECT id, row_count FROM cleaned_datasets WHERE name = ?", (dataset,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown cleaned dataset: {dataset}")
+        return row
+
+    def cleaned_locations(self, dataset):
+        """Distinct locations of one dataset, sorted (served by idx_cleaned_location_date)."""
+        with self._lock:
+            dataset_id, _ = self._dataset_id(dataset)
+            rows = self._conn.execute(
+                "SELECT DISTINCT location FROM cleaned_listings WHERE dataset_id = ? AND location IS NOT NULL "
+                "ORDER BY location",
+                (dataset_id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def query_cleaned_listings(self, dataset, locations=None, price_min=None, price_max=None, date_from=None,
+                               date_to=None, title=None, sort_by="date", descending=True, limit=50, offset=0):
+        """
+        One page of a cleaned dataset, filtered and sorted.
+        Every filter is optional; `title` matches a case-insensitive substring
+        (through the trigram index when there is one).
+        Returns (rows as dicts, total number of matching rows).
+        """
+        if sort_by not in CLEANED_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort_by!r}; use one of {CLEANED_SORT_COLUMNS}")
+
+        where = []
+        params = []
+        if locations:
+            where.append(f"location IN ({', '.join('?' for _ in locations)})")
+            params.extend(locations)
+        if price_min is not None:
+            where.append("price >= ?")
+            params.append(price_min)
+        if price_max is not None:
+            where.append("price <= ?")
+            params.append(price_max)
+        if date_from is not None:
+            where.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            where.append("date <= ?")
+            params.append(date_to)
+        order_term = sort_by
+        if title:
+            if self.title_search and len(title) >= TITLE_SEARCH_MIN_LENGTH:
+                where.append("id IN (SELECT rowid FROM cleaned_titles WHERE cleaned_titles MATCH ?)")
+                params.append('"' + title.replace('"', '""') + '"')
+                # The few matches are sorted directly instead of walking a whole index for them
+                order_term = f"+{sort_by}"
+            else:
+                escaped = title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                where.append("title LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+
+        direction = "DESC" if descending else "ASC"
+        with self._lock:
+            dataset_id, row_count = self._dataset_id(dataset)
+            where_sql = " AND ".join(["dataset_id = ?", *where])
+            if where:
+                total = self._conn.execute(
+                    f"SELECT COUNT(*) FROM cleaned_listings WHERE {where_sql}", [dataset_id, *params]
+                ).fetchone()[0]
+            else:
+                total = row_count
+            # With an index on (dataset_id, <sort column>) SQLite walks it in order and stops after one page
+            rows = self._conn.execute(
+                f"SELECT {', '.join(CLEANED_COLUMNS)} FROM cleaned_listings WHERE {where_sql} "
+                f"ORDER BY {order_term} {direction}, id {direction} LIMIT ? OFFSET ?",
+                [dataset_id, *params, limit, offset]
+            ).fetchall()
+        return [dict(zip(CLEANED_COLUMNS, r)) for r in rows], total
+
+    # ----------------------------------
+    # Scrape history
+    # ----------------------------------
+    def _insert_history(self, record):
+        """Insert one history record and its output files (caller holds the transaction)."""
+        cur = self._conn.execute(
+            "INSERT INTO scrape_history (date, record) VALUES (?, ?)",
+            (record["date"], json.dumps(record, ensure_ascii=False))
+        )
+        files = record.get("excel_files") or ([record["excel_file"]] if record.get("excel_file") else [])
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO history_files (history_id, date, excel_file) VALUES (?, ?, ?)",
+            [(cur.lastrowid, record["date"], f) for f in files]
+        )
+
+    def add_history_record(self, record):
+        """Append one scrape run record; O(1), nothing else is rewritten."""
+        with self._lock, self._conn:
+            self._insert_history(record)
+
+    def history_version(self):
+        """Id of the newest history record (0 if none); changes whenever a record is added."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM scrape_history").fetchone()[0]
+
+    def load_history(self):
+        """All history records, oldest first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM scrape_history ORDER BY id").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def history_files_between(self, start_str, end_str):
+        """Output files of runs dated within [start_str, end_str], in run order, each once."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT excel_file FROM history_files WHERE date BETWEEN ? AND ? "
+                "GROUP BY excel_file ORDER BY MIN(history_id)",
+                (start_str, end_str)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def migrate_history_json(self, json_path):
+        """
+        One-time import of the old scrape_history.json.
+        The check, the inserts and the flag share one write transaction
+        (BEGIN IMMEDIATE, so other processes wait too), and the file is
+        renamed to *.migrated afterwards, so it is never imported twice.
+        A file already renamed by a concurrent caller counts as done.
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                done = self._conn.execute("SELECT value FROM meta WHERE key = 'history_json_migrated'").fetchone()
+                if done:
+                    return
+                try:
+                    with open(json_path, "r", encoding="utf-8") as f:
+                        records = json.load(f)
+                except FileNotFoundError:
+                    return
+                for record in records:
+                    self._insert_history(record)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('history_json_migrated', '1')")
+            try:
+                os.replace(json_path, json_path + ".migrated")
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    """Return the process-wide repository, opening it on first use."""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = ScrapeRepository()
+        return _repository
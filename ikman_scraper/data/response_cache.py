@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from ..const.const import SCRAPE_CACHE_MAX_BYTES, SCRAPE_CACHE_TTL
+from .repository import DATA_DIR
+
+CACHE_DIR = os.path.join(DATA_DIR, "http_cache")
+
+
+class ResponseCache:
+    """
+    On-disk cache of serp JSON responses keyed by request URL.
+      - One gzip-compressed file per URL: {"url", "stored_at", "data"}
+      - Entries older than `ttl` seconds are ignored (ttl=None: never expire)
+      - The directory is kept under `max_bytes`; the least recently used
+        entries (file mtime, refreshed on every hit) are evicted first
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=None, max_bytes=None):
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # file name -> size, so eviction doesn't have to stat the whole directory
+        self._sizes = {}
+        for name in os.listdir(cache_dir):
+            if name.endswith(".json.gz"):
+                self._sizes[name] = os.path.getsize(os.path.join(cache_dir, name))
+        self._total = sum(self._sizes.values())
+
+    def _name(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json.gz"
+
+    def get(self, url, fresh_only=True):
+        """
+        Return the cached JSON for `url`, or None if missing or expired.
+        With fresh_only=False expired entries are served too (offline replay).
+        """
+        name = self._name(url)
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("url") != url:
+            return None
+        if fresh_only and self.ttl is not None and time.time() - entry.get("stored_at", 0) > self.ttl:
+            return None
+
+        # Mark as recently used for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["data"]
+
+    def put(self, url, data):
+        """Store the JSON `data` fetched from `url`."""
+        name = self._name(url)
+        path = os.path.join(self.cache_dir, name)
+        payload = json.dumps({"url": url, "stored_at": time.time(), "data": data}, ensure_ascii=False)
+        blob = gzip.compress(payload.encode("utf-8"))
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total += len(blob) - self._sizes.get(name, 0)
+            self._sizes[name] = len(blob)
+            if self.max_bytes is not None and self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in self._sizes:
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.cache_dir, name)), name))
+            except OSError:
+                entries.append((0, name))
+        entries.sort()
+
+        for _, name in entries:
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            self._total -= self._sizes.pop(name)
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            for name in list(self._sizes):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+            self._sizes.clear()
+            self._total = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(ttl=SCRAPE_CACHE_TTL, max_bytes=SCRAPE_CACHE_MAX_BYTES)
+        return _cache
@@ -0,0 +1,77 @@
+from itertools import compress
+
+# Column of every raw field, in the order of data_access.RAW_HEADERS
+AD_FIELDS = (
+    "area_slug", "location", "title", "description", "details",
+    "price", "shop_name", "slug", "url", "date"
+)
+
+AD_URL_PREFIX = "https://ikman.lk/en/ad/"
+
+
+def clean_price(price_str: str) -> int:
+    """
+    Remove 'Rs', commas, extra spaces, then convert to integer.
+    e.g. "Rs 19,500,000" -> 19500000
+    """
+    if not price_str:
+        return 0
+    p = price_str.replace("Rs", "").replace(",", "").strip()
+    try:
+        return int(p)
+    except ValueError:
+        return 0
+
+
+class AdBatch:
+    """
+    The ads of one serp page, stored column by column: one list per field
+    of AD_FIELDS instead of an object or list per ad. Filtering builds new
+    column lists (`keep`), and `rows()` zips them into store rows only when
+    the page is written.
+    `known` is set by the scrape pipeline: True when every ad of the page
+    was scraped before, False when some were not, None when not checked.
+    """
+
+    __slots__ = AD_FIELDS + ("page", "known")
+
+    def __init__(self, page=0, columns=None):
+        self.page = page
+        self.known = None
+        columns = columns or {}
+        for f in AD_FIELDS:
+            setattr(self, f, list(columns.get(f, ())))
+
+    @classmethod
+    def from_serp(cls, ads, location_slug, date_str, page=0):
+        """Decode the 'ads' list of a serp page; the "Date" column is `date_str` (the scrape day)."""
+        slugs = [ad.get("slug", "") for ad in ads]
+        return cls(page, {
+            "area_slug": [location_slug] * len(ads),
+            "location": [ad.get("location", "") for ad in ads],
+            "title": [ad.get("title", "") for ad in ads],
+            "description": [ad.get("description", "") for ad in ads],
+            "details": [ad.get("details", "") for ad in ads],
+            "price": [clean_price(ad.get("price", "")) for ad in ads],
+            "shop_name": [ad.get("shopName", "") for ad in ads],
+            "slug": slugs,
+            "url": [AD_URL_PREFIX + s for s in slugs],
+            "date": [date_str] * len(ads)
+        })
+
+    def __len__(self):
+        return len(self.slug)
+
+    def keep(self, mask):
+        """A batch of the same page with the ads whose `mask` entry is true."""
+        mask = list(mask)
+        batch = AdBatch(self.page, {f: compress(getattr(self, f), mask) for f in AD_FIELDS})
+        batch.known = self.known
+        return batch
+
+    def rows(self):
+        """Store rows (tuples ordered like RAW_HEADERS), in page order."""
+        return list(zip(*(getattr(self, f) for f in AD_FIELDS)))
+
+    def __repr__(self):
+        return f"AdBatch(page={self.page}, ads={len(self)})"
@@ -1,8 +1,19 @@
 class Location:
+    """One searchable ikman.lk location (an entry of assets/locations.json)."""
+
+    __slots__ = ("id", "name", "slug")
+
     def __init__(self, loc_id, name, slug):
         self.id = loc_id
         self.name = name
         self.slug = slug
 
+    @classmethod
+    def from_dict(cls, data):
+        """A Location from a {"id", "name", "slug"} dict; a Location is returned as is."""
+        if isinstance(data, cls):
+            return data
+        return cls(data["id"], data["name"], data["slug"])
+
     def __repr__(self):
         return f"Location(id={self.id}, name={self.name}, slug={self.slug})"
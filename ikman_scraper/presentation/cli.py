@@ -0,0 +1,205 @@
+"""
+Headless entry point:
+
+    python -m ikman_scraper scrape --locations Kottawa Negombo
+    python -m ikman_scraper scrape --price-max 40000000 --bedrooms 3 4 --bathrooms 2 3
+    python -m ikman_scraper resume [--run-id RUN_ID | --list]
+    python -m ikman_scraper cleanup --start 2025-01-01 --end 2025-01-31 [--streaming] [--format csv] [--save-graph]
+    python -m ikman_scraper schedule --every 1440 --at 02:00 --batch Kottawa,Negombo --batch all
+    python -m ikman_scraper serve
+
+Run summaries are printed to stdout as JSON (one object per line); progress
+goes to stderr. Streamlit is only imported by `serve`.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+from ikman_scraper.const.const import (
+    CLEANUP_OUTPUT_FORMAT, CLEANUP_STREAMING, DEDUPLICATION_BACKEND, DEDUPLICATION_THRESHOLD, DEDUPLICATION_WORKERS,
+    SCRAPE_CACHE_MODE, SCRAPE_FILTERS, SCRAPE_MAX_LOCATIONS, SCRAPE_MAX_WORKERS
+)
+from ikman_scraper.data.data_access import load_locations
+from ikman_scraper.data.output_writers import OUTPUT_FORMATS
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+def emit(summary):
+    print(json.dumps(summary, ensure_ascii=False, default=str), flush=True)
+
+
+def select_locations(names):
+    """Match names or slugs (case-insensitive) against locations.json; "all" selects every one."""
+    all_locs = load_locations()
+    if not names or any(n.lower() == "all" for n in names):
+        return all_locs
+    wanted = {n.strip().lower() for n in names if n.strip()}
+    selected = [loc for loc in all_locs if loc["name"].lower() in wanted or loc["slug"].lower() in wanted]
+    unknown = wanted - {loc["name"].lower() for loc in selected} - {loc["slug"].lower() for loc in selected}
+    if unknown:
+        raise SystemExit(f"Unknown locations: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def scrape_options(args):
+    return {
+        "max_locations": args.max_locations,
+        "max_workers": args.max_workers,
+        "cache_mode": args.cache_mode
+    }
+
+
+def search_filters(args):
+    """SCRAPE_FILTERS with the --price-min/--price-max/--bedrooms/--bathrooms overrides."""
+    filters = dict(SCRAPE_FILTERS)
+    for key in ("price_min", "price_max", "bedrooms", "bathrooms"):
+        value = getattr(args, key)
+        if value is not None:
+            filters[key] = value
+    # 0 lifts a price bound, an explicit empty list accepts any number of rooms
+    filters["price_min"] = filters["price_min"] or None
+    filters["price_max"] = filters["price_max"] or None
+    return filters
+
+
+def cmd_scrape(args):
+    from ikman_scraper.services.scheduler_service import LockHeld, run_scrape_batch
+
+    try:
+        emit(run_scrape_batch(
+            select_locations(args.locations), log=log, filters=search_filters(args), **scrape_options(args)
+        ))
+    except LockHeld as e:
+        log(str(e))
+        return 1
+    return 0
+
+
+def cmd_resume(args):
+    from ikman_scraper.services.scheduler_service import LockHeld, resumable_runs, resume_scrape_batch
+
+    if args.list:
+        for run in resumable_runs():
+            emit({
+                "run_id": run["run_id"],
+                "started_at": run["started_at"],
+                "status": run["status"],
+                "locations": [loc["name"] for loc in run["locations"]]
+            })
+        return 0
+    try:
+        summary = resume_scrape_batch(args.run_id, log=log, **scrape_options(args))
+    except LockHeld as e:
+        log(str(e))
+        return 1
+    except KeyError as e:
+        log(str(e.args[0]))
+        return 1
+    if summary is None:
+        log("Nothing to resume.")
+        return 0
+    emit(summary)
+    return 0
+
+
+def cmd_cleanup(args):
+    from ikman_scraper.services.cleanup_service import cleanup_duplicates
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end = datetime.strptime(args.end, "%Y-%m-%d").date()
+    result = cleanup_duplicates(
+        start, end, args.threshold, backend=args.backend, workers=args.workers, streaming=args.streaming,
+        output_format=args.format, save_graph=args.save_graph
+    )
+    emit({"kind": "cleanup", "start": args.start, "end": args.end, **result})
+    return 0 if result["success"] else 1
+
+
+def cmd_schedule(args):
+    from ikman_scraper.services.scheduler_service import run_schedule
+
+    batches = [select_locations(b.split(",")) for b in (args.batch or ["all"])]
+    at = datetime.strptime(args.at, "%H:%M").time() if args.at else None
+    run_schedule(
+        batches, timedelta(minutes=args.every), at=at, runs=args.runs,
+        log=log, on_summary=emit, filters=search_filters(args), **scrape_options(args)
+    )
+    return 0
+
+
+def cmd_serve(args):
+    import streamlit.web.cli as stcli
+
+    ui_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui.py")
+    sys.argv = ["streamlit", "run", ui_path, f"--server.port={args.port}"]
+    return stcli.main()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m ikman_scraper", description="Ikman.lk housing scraper")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_scrape_args(p):
+        p.add_argument("--max-locations", type=int, default=SCRAPE_MAX_LOCATIONS)
+        p.add_argument("--max-workers", type=int, default=SCRAPE_MAX_WORKERS)
+        p.add_argument("--cache-mode", choices=["off", "on", "replay"], default=SCRAPE_CACHE_MODE)
+
+    def add_filter_args(p):
+        p.add_argument("--price-min", type=int, help="rupees (default from SCRAPE_FILTERS, 0 = no bound)")
+        p.add_argument("--price-max", type=int, help="rupees (default from SCRAPE_FILTERS, 0 = no bound)")
+        p.add_argument("--bedrooms", nargs="*", help="accepted bedroom counts (none given = any)")
+        p.add_argument("--bathrooms", nargs="*", help="accepted bathroom counts (none given = any)")
+
+    p = sub.add_parser("scrape", help="scrape locations once")
+    p.add_argument("--locations", nargs="*", help="names or slugs from locations.json (default: all)")
+    add_scrape_args(p)
+    add_filter_args(p)
+    p.set_defaults(func=cmd_scrape)
+
+    p = sub.add_parser("resume", help="continue an interrupted scrape from its checkpoints")
+    p.add_argument("--run-id", help="run to resume (default: the latest unfinished one)")
+    p.add_argument("--list", action="store_true", help="list the runs that can be resumed")
+    add_scrape_args(p)
+    p.set_defaults(func=cmd_resume)
+
+    p = sub.add_parser("cleanup", help="fuzzy-deduplicate a date range")
+    p.add_argument("--start", required=True, help="YYYY-MM-DD")
+    p.add_argument("--end", required=True, help="YYYY-MM-DD")
+    p.add_argument("--threshold", type=int, default=DEDUPLICATION_THRESHOLD)
+    p.add_argument("--backend", choices=["index", "matrix"], default=DEDUPLICATION_BACKEND)
+    p.add_argument("--workers", type=int, default=DEDUPLICATION_WORKERS)
+    p.add_argument("--streaming", action=argparse.BooleanOptionalAction, default=CLEANUP_STREAMING,
+                   help="merge and deduplicate the range out of core, with bounded memory")
+    p.add_argument("--format", choices=list(OUTPUT_FORMATS), default=CLEANUP_OUTPUT_FORMAT,
+                   help="file format of the cleaned output (parquet needs pyarrow)")
+    p.add_argument("--save-graph", action="store_true",
+                   help="also save the similarity graph of the range, for previewing other thresholds in the UI")
+    p.set_defaults(func=cmd_cleanup)
+
+    p = sub.add_parser("schedule", help="scrape location batches on an interval")
+    p.add_argument("--every", type=float, default=24 * 60, help="minutes between runs (default: daily)")
+    p.add_argument("--at", help="HH:MM of the first run (default: now)")
+    p.add_argument("--batch", action="append", help="comma-separated locations; repeat for more batches")
+    p.add_argument("--runs", type=int, help="stop after this many rounds")
+    add_scrape_args(p)
+    add_filter_args(p)
+    p.set_defaults(func=cmd_schedule)
+
+    p = sub.add_parser("serve", help="start the Streamlit UI")
+    p.add_argument("--port", type=int, default=8501)
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
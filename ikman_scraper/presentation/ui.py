@@ -1,20 +1,253 @@
 import streamlit as st
 from datetime import datetime
 import os
+import time
 
-from ikman_scraper.const.const import DEDUPLICATION_THRESHOLD
+from ikman_scraper.const.const import (
+    CLEANUP_OUTPUT_FORMAT, CLEANUP_STREAMING, DEDUPLICATION_THRESHOLD, JOB_POLL_INTERVAL, SCRAPE_FILTERS,
+    SIMILARITY_GRAPH_FLOOR
+)
 # Domain or data layer references
-from ikman_scraper.data.data_access import load_history, load_locations
-from ikman_scraper.services.scrape_service import scrape_location, record_scrape_summary
-from ikman_scraper.services.cleanup_service import cleanup_duplicates
+from ikman_scraper.data.data_access import (
+    cleaned_locations, find_price_drops, list_cleaned_datasets, listing_locations, listing_price_history,
+    load_history, load_history_dates, load_locations, query_cleaned_listings, query_listings, similarity_graph_path,
+    sync_cleaned_listings
+)
+from ikman_scraper.data.output_writers import OUTPUT_FORMATS
+from ikman_scraper.data.repository import CLEANED_SORT_COLUMNS
+from ikman_scraper.services.job_service import (
+    cancel_job, job_status, list_jobs, submit_cleanup_job, submit_scrape_job
+)
+from ikman_scraper.services.metrics_service import get_metrics, to_prometheus
+
+FINISHED_LOCATION_STATUSES = ("done", "failed", "cancelled")
+ROOM_OPTIONS = [str(n) for n in range(1, 11)]
+EXPLORE_PAGE_SIZES = [25, 50, 100, 250]
+
+
+def show_scrape_job(job):
+    """Render one background scrape job: status, per-location progress, cancel button."""
+    st.subheader(job["label"])
+    st.write(f"**Status**: {job['status']}  (started {job['created_at'][:19]})")
+
+    progress = job["progress"]
+    if progress:
+        finished = sum(1 for e in progress.values() if e["status"] in FINISHED_LOCATION_STATUSES)
+        st.progress(int(finished / len(progress) * 100))
+        for name, event in progress.items():
+            if event["status"] == "page":
+                st.text(
+                    f"{name}: Scraped : {event['ads_scraped']} ads. "
+                    f"Page : {event['page']} of {event['total_pages']} pages"
+                )
+            elif "error" in event:
+                st.text(f"{name}: {event['status']}: {event['error']}")
+            else:
+                st.text(f"{name}: {event['status']} ({event['ads_scraped']} ads)")
+
+    if job["status"] in ("queued", "running"):
+        if job["cancel_requested"]:
+            st.caption("Cancelling...")
+        elif st.button("Cancel", key=f"cancel_{job['id']}"):
+            cancel_job(job["id"])
+    elif job["status"] == "failed":
+        st.error(job["error"])
+
+
+def search_filter_inputs():
+    """Widgets for the search filters, pre-filled from SCRAPE_FILTERS. Returns the filters dict."""
+    with st.expander("Search filters"):
+        col_min, col_max = st.columns(2)
+        price_min = col_min.number_input(
+            "Minimum price (Rs, 0 = none)", min_value=0, step=500_000,
+            value=int(SCRAPE_FILTERS.get("price_min") or 0)
+        )
+        price_max = col_max.number_input(
+            "Maximum price (Rs, 0 = none)", min_value=0, step=500_000,
+            value=int(SCRAPE_FILTERS.get("price_max") or 0)
+        )
+        bedrooms = st.multiselect(
+            "Bedrooms (empty = any)", ROOM_OPTIONS, default=[str(v) for v in SCRAPE_FILTERS.get("bedrooms", [])]
+        )
+        bathrooms = st.multiselect(
+            "Bathrooms (empty = any)", ROOM_OPTIONS, default=[str(v) for v in SCRAPE_FILTERS.get("bathrooms", [])]
+        )
+    return {
+        "price_min": int(price_min) or None,
+        "price_max": int(price_max) or None,
+        "bedrooms": bedrooms,
+        "bathrooms": bathrooms
+    }
+
+
+def format_labels(labels):
+    return ", ".join(f"{k}={v}" for k, v in labels.items())
+
+
+def show_metrics():
+    """Render the in-process metrics: timings, counters, Prometheus download."""
+    metrics = get_metrics()
+    if not metrics.enabled:
+        st.info("Metrics are turned off (METRICS_ENABLED in const.py).")
+        return
+
+    snapshot = metrics.snapshot()
+    st.caption(f"Collected since {snapshot['started_at'][:19]}")
+    if not snapshot["counters"] and not snapshot["summaries"]:
+        st.write("No metrics yet. Run a scrape or a cleanup.")
+        return
+
+    st.subheader("Timings")
+    st.dataframe([
+        {
+            "Metric": s["name"],
+            "Labels": format_labels(s["labels"]),
+            "Count": s["count"],
+            "Total (s)": round(s["sum"], 3),
+            "Mean (ms)": round(s["mean"] * 1000, 2),
+            "Max (ms)": round(s["max"] * 1000, 2)
+        }
+        for s in snapshot["summaries"]
+    ])
+
+    st.subheader("Counters")
+    st.dataframe([
+        {"Metric": c["name"], "Labels": format_labels(c["labels"]), "Value": c["value"]}
+        for c in snapshot["counters"]
+    ])
+
+    st.download_button("Download Prometheus text", to_prometheus(snapshot), file_name="metrics.prom")
+    if st.button("Reset metrics"):
+        metrics.reset()
+        st.rerun()
+
+
+def show_threshold_preview(start_date, end_date):
+    """Slider over the saved similarity graph of the range: rows kept at each threshold."""
+    counts = None
+    if os.path.exists(similarity_graph_path(start_date, end_date)):
+        # Loads pandas and the fuzzy matchers, so only once there is a graph to preview
+        from ikman_scraper.services.cleanup_service import preview_thresholds
+
+        counts = preview_thresholds(start_date, end_date, range(SIMILARITY_GRAPH_FLOOR, 101))
+    if not counts:
+        st.caption("Run a cleanup with \"Save similarity graph\" to preview other thresholds for this range.")
+        return
+
+    thresholds = list(counts)
+    threshold = st.slider(
+        "Preview threshold", min_value=thresholds[0], max_value=thresholds[-1],
+        value=min(max(DEDUPLICATION_THRESHOLD, thresholds[0]), thresholds[-1])
+    )
+    configured = counts.get(DEDUPLICATION_THRESHOLD)
+    st.metric(
+        "Rows kept", counts[threshold], delta=None if configured is None else counts[threshold] - configured,
+        help=f"Change compared with the configured threshold ({DEDUPLICATION_THRESHOLD})"
+    )
+    st.line_chart({"threshold": thresholds, "rows kept": list(counts.values())}, x="threshold", y="rows kept")
+
+
+def dataset_label(dataset):
+    """Selectbox label of a cleaned dataset: its date range and size, or its name if it has no range."""
+    if not dataset["start_date"]:
+        return dataset["name"]
+    return f"{dataset['start_date']} to {dataset['end_date']} ({dataset['row_count']} listings)"
+
+
+def show_explore():
+    """Paged, filtered and sorted view of a cleaned dataset, served by the indexed store."""
+    sync_cleaned_listings()
+    datasets = list_cleaned_datasets()
+    if not datasets:
+        st.info("No cleaned data yet. Run a cleanup first.")
+        return
+
+    labels = {d["name"]: dataset_label(d) for d in datasets}
+    dataset = st.selectbox("Dataset", list(labels), format_func=labels.get)
+
+    col_loc, col_title = st.columns(2)
+    locations = col_loc.multiselect("Locations (empty = all)", cleaned_locations(dataset))
+    title = col_title.text_input("Title contains")
+
+    col_min, col_max, col_from, col_to = st.columns(4)
+    price_min = col_min.number_input("Minimum price (Rs, 0 = none)", min_value=0, step=500_000)
+    price_max = col_max.number_input("Maximum price (Rs, 0 = none)", min_value=0, step=500_000)
+    date_from = col_from.date_input("From", value=None)
+    date_to = col_to.date_input("To", value=None)
+
+    col_sort, col_order, col_size, col_page = st.columns(4)
+    sort_by = col_sort.selectbox("Sort by", CLEANED_SORT_COLUMNS)
+    descending = col_order.selectbox("Order", ["Descending", "Ascending"]) == "Descending"
+    page_size = col_size.selectbox("Rows per page", EXPLORE_PAGE_SIZES, index=1)
+    page = col_page.number_input("Page", min_value=1, step=1)
+
+    started = time.perf_counter()
+    result = query_cleaned_listings(
+        dataset, page=page, page_size=page_size,
+        locations=locations or None,
+        price_min=int(price_min) or None,
+        price_max=int(price_max) or None,
+        date_from=date_from.strftime("%Y-%m-%d") if date_from else None,
+        date_to=date_to.strftime("%Y-%m-%d") if date_to else None,
+        title=title.strip() or None,
+        sort_by=sort_by,
+        descending=descending
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    st.caption(
+        f"{result['total']} listings, page {result['page']} of {result['pages']} "
+        f"(query took {elapsed_ms:.1f} ms)"
+    )
+    st.dataframe(result["rows"], column_config={"link": st.column_config.LinkColumn("link")})
+
+
+def show_listings():
+    """Current listings tracked by ad slug, with their price drops and price history."""
+    col_loc, col_since = st.columns(2)
+    location = col_loc.selectbox("Location", ["All"] + listing_locations())
+    seen_since = col_since.date_input("Seen since", value=None, key="listings_seen_since")
+    location = None if location == "All" else location
+    seen_since = seen_since.strftime("%Y-%m-%d") if seen_since else None
+
+    st.subheader("Price drops")
+    drops = find_price_drops(since=seen_since, location=location)
+    if not drops:
+        st.write("No price drops recorded.")
+    else:
+        st.dataframe([
+            {
+                "Title": d["title"],
+                "Location": d["location"],
+                "Previous price": d["previous_price"],
+                "Price": d["price"],
+                "Drop (%)": round((d["previous_price"] - d["price"]) / d["previous_price"] * 100, 1),
+                "Dropped on": d["dropped_on"],
+                "First seen": d["first_seen"],
+                "Link": d["url"]
+            }
+            for d in drops
+        ], column_config={"Link": st.column_config.LinkColumn("Link")})
+
+    st.subheader("Current listings")
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Rows per page", EXPLORE_PAGE_SIZES, index=1, key="listings_page_size")
+    page = col_page.number_input("Page", min_value=1, step=1, key="listings_page")
+    result = query_listings(location=location, seen_since=seen_since, page=page, page_size=page_size)
+    st.caption(f"{result['total']} listings, page {result['page']} of {result['pages']}")
+    st.dataframe(result["rows"], column_config={"url": st.column_config.LinkColumn("url")})
+
+    slug = st.selectbox("Price history of", [""] + [r["slug"] for r in result["rows"]])
+    if slug:
+        st.dataframe(listing_price_history(slug))
 
 
 def main():
     st.set_page_config(page_title="Ikman Scraper", layout="wide")
     st.title("Ikman Scraper Web UI")
 
-    tab_scrape, tab_process, tab_history, tab_cleanup = st.tabs(
-        ["Scrape", "Start Process", "History", "Cleanup"]
+    tab_scrape, tab_process, tab_history, tab_cleanup, tab_explore, tab_listings, tab_metrics = st.tabs(
+        ["Scrape", "Start Process", "History", "Cleanup", "Explore", "Listings", "Metrics"]
     )
 
     # ----------------------------------
@@ -28,47 +261,27 @@ def main():
         else:
             names = [l["name"] for l in all_locs]
             selection = st.multiselect("Select locations", options=names)
+            filters = search_filter_inputs()
 
             if st.button("Start Scrape"):
                 if not selection:
                     st.warning("No locations selected.")
                 else:
-                    st.session_state["selected_locs"] = [
-                        loc for loc in all_locs if loc["name"] in selection
-                    ]
-                    st.session_state["scrape_in_progress"] = True
-                    st.success("Locations selected. Go to 'Start Process' tab.")
+                    selected_locs = [loc for loc in all_locs if loc["name"] in selection]
+                    # Runs in the background job runner; reruns only poll it
+                    submit_scrape_job(selected_locs, filters)
+                    st.success("Scrape started. Go to 'Start Process' tab.")
 
     # ----------------------------------
-    # TAB: START PROCESS (example)
+    # TAB: START PROCESS
     # ----------------------------------
     with tab_process:
         st.header("Scrape Progress")
-        if "scrape_in_progress" not in st.session_state:
-            st.session_state["scrape_in_progress"] = False
-
-        if st.session_state["scrape_in_progress"]:
-            selected_locs = st.session_state.get("selected_locs", [])
-            if not selected_locs:
-                st.info("No locations to scrape.")
-            else:
-                progress_bar = st.progress(0)
-                log_area = st.empty()
-                summary_list = []
-
-                for i, loc in enumerate(selected_locs, start=1):
-                    log_area.text(f"Scraping Started for {loc['name']}...This will take few minutes to complete.")
-                    res = scrape_location(loc, log_area)
-                    if res:
-                        summary_list.append(res)
-                    progress_bar.progress(int(i / len(selected_locs) * 100))
-
-                st.session_state["scrape_in_progress"] = False
-                st.success("Scrape process complete.")
-                record_scrape_summary(summary_list)
-
-        else:
+        scrape_jobs = [j for j in list_jobs() if j["kind"] == "scrape"]
+        if not scrape_jobs:
             st.info("No scrape in progress.")
+        for job in scrape_jobs:
+            show_scrape_job(job)
 
     # ----------------------------------
     # TAB: HISTORY
@@ -84,9 +297,17 @@ def main():
                 st.write(f"**Date**: {run['date']}")
                 st.write(f"**Ads**: {run['total_ads_scraped']}")
                 st.write(f"**Pages**: {run['total_pages_scraped']}")
-                file_ = run.get("excel_file", "")
-                if file_ and os.path.exists(file_):
-                    st.markdown(f"[Open Excel File]({file_})")
+                if run.get("total_failed_pages"):
+                    st.write(f"**Failed pages**: {run['total_failed_pages']} (resume the run to fetch them again)")
+                if run.get("locations_scraped"):
+                    st.write(f"**Locations**: {', '.join(run['locations_scraped'])}")
+                # Older records only have the last file of the run
+                files = run.get("excel_files") or ([run["excel_file"]] if run.get("excel_file") else [])
+                for file_ in files:
+                    if os.path.exists(file_):
+                        st.markdown(f"[Open {os.path.basename(file_)}]({file_})")
+                    else:
+                        st.write(f"{os.path.basename(file_)} (missing)")
 
     # ----------------------------------
     # TAB: CLEANUP
@@ -95,30 +316,81 @@ def main():
         st.header("Cleanup Duplicate Records")
 
         # Build a list of dates from history
-        history = load_history()
-        if not history:
+        all_dates = load_history_dates()
+        if not all_dates:
             st.info("No scrape history. Nothing to clean up.")
-            return
+        else:
+            start_date_str = st.selectbox("Start Date", all_dates, index=0)
+            end_date_str = st.selectbox("End Date", all_dates, index=len(all_dates) - 1)
+            streaming = st.checkbox(
+                "Low-memory (streaming) cleanup", value=CLEANUP_STREAMING,
+                help="Merges the raw files day by day instead of loading the whole range; best for long ranges."
+            )
+            output_format = st.selectbox(
+                "Output format", list(OUTPUT_FORMATS), index=list(OUTPUT_FORMATS).index(CLEANUP_OUTPUT_FORMAT),
+                help="Excel for opening by hand; CSV, Parquet (needs pyarrow) or compressed JSONL are faster to write."
+            )
+            save_graph = st.checkbox(
+                "Save similarity graph", value=False,
+                help=f"Scores every title pair once (keeping scores of {SIMILARITY_GRAPH_FLOOR} and up) "
+                     "so other thresholds can be previewed below without another cleanup."
+            )
+            dt_start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            dt_end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
 
-        all_dates = sorted(list({h["date"] for h in history}))
-        if not all_dates:
-            st.info("No valid dates in history.")
-            return
+            if st.button("Cleanup"):
+                st.session_state["cleanup_job_id"] = submit_cleanup_job(
+                    dt_start, dt_end, DEDUPLICATION_THRESHOLD, streaming=streaming, output_format=output_format,
+                    save_graph=save_graph
+                )
 
-        start_date_str = st.selectbox("Start Date", all_dates, index=0)
-        end_date_str = st.selectbox("End Date", all_dates, index=len(all_dates) - 1)
+            job = job_status(st.session_state.get("cleanup_job_id"))
+            if job is not None:
+                if job["status"] in ("queued", "running"):
+                    st.info(f"{job['label']}: {job['status']}...")
+                elif job["status"] == "failed":
+                    st.error(job["error"])
+                elif job["result"] is not None:
+                    result = job["result"]
+                    if result["success"]:
+                        st.success(result["message"])
+                        st.caption(
+                            f"{result['format']}: {result['bytes'] / 1024:,.0f} KB written in "
+                            f"{result['write_seconds']:.2f}s"
+                        )
+                        if os.path.exists(result["file"]):
+                            st.markdown(f"[Open Cleaned File]({result['file']})")
+                    else:
+                        st.error(result["message"])
 
-        if st.button("Cleanup"):
-            dt_start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            dt_end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+            st.subheader("Threshold Preview")
+            show_threshold_preview(dt_start, dt_end)
 
-            result = cleanup_duplicates(dt_start, dt_end, DEDUPLICATION_THRESHOLD)
-            if result["success"]:
-                st.success(result["message"])
-                if os.path.exists(result["file"]):
-                    st.markdown(f"[Open Cleaned File]({result['file']})")
-            else:
-                st.error(result["message"])
+    # ----------------------------------
+    # TAB: EXPLORE
+    # ----------------------------------
+    with tab_explore:
+        st.header("Explore Cleaned Listings")
+        show_explore()
+
+    # ----------------------------------
+    # TAB: LISTINGS
+    # ----------------------------------
+    with tab_listings:
+        st.header("Listings and Price Drops")
+        show_listings()
+
+    # ----------------------------------
+    # TAB: METRICS
+    # ----------------------------------
+    with tab_metrics:
+        st.header("Metrics")
+        show_metrics()
+
+    # Poll the background jobs while any of them is still working
+    if list_jobs(active_only=True):
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 
 if __name__ == "__main__":
@@ -1,35 +1,46 @@
+import heapq
 import os
+from collections import Counter
 import pandas as pd
 import re
-from datetime import datetime
-from thefuzz import fuzz
 import unicodedata
+from functools import lru_cache
 import regex
-from ..data.data_access import load_history, read_excel_file, write_excel_file, CLEANED_SCRAPE_DIR
+from ..data.data_access import (
+    cached_by_mtime, find_history_files, read_raw_file, read_raw_files, write_cleaned_file, read_dedup_state,
+    read_similarity_graph, similarity_graph_path, write_dedup_state, store_cleaned_listings, store_cleaned_rows,
+    warm_sidecars, CLEANED_SCRAPE_DIR, DEDUP_STATE_DIR
+)
+from ..data.output_writers import OUTPUT_FORMATS
+from ..const.const import (
+    CLEANUP_OUTPUT_FORMAT, CLEANUP_STREAMING, DEDUPLICATION_BACKEND, DEDUPLICATION_WORKERS, NORMALIZE_CACHE_SIZE,
+    SIMILARITY_GRAPH_FLOOR
+)
+from .dedup_service import (
+    build_index, count_grams, extend_newer, extend_older, first_occurrences, graph_dedup, greedy_dedup,
+    greedy_keep_mask, iter_dedup, keep_counts, similarity_graph
+)
+from .metrics_service import export_metrics, get_metrics
+
+# Raw columns the incremental dedup state keeps for every row (and the only ones cleanup reads)
+STATE_COLUMNS = ["Location", "Date", "Title", "Price (numeric)", "URL"]
+
+# Columns of the cleaned file, in order
+FINAL_COLUMNS = ["Location", "Date", "Title", "Price", "Link"]
+
+# Title normalization patterns, compiled once
+NON_WORD_PATTERN = regex.compile(r"[^\p{L}\p{N}\s]+")
+SPACES_PATTERN = regex.compile(r"\s+")
 
 
 def find_excel_files_for_range(start_date, end_date):
     """
-    Looks at scrape_history.json to find all excel files
+    Looks up the scrape history (indexed by date) to find all excel files
     that fall between start_date and end_date (inclusive).
     Returns list of file paths (existing on disk).
     """
-    history = load_history()
-    if not history:
-        return []
-
-    valid_paths = []
-    for run in history:
-        run_date_str = run["date"]  # "YYYY-MM-DD"
-        run_file = run.get("excel_file", "")
-        if not run_file:
-            continue
-
-        run_date = datetime.strptime(run_date_str, "%Y-%m-%d").date()
-        if start_date <= run_date <= end_date and os.path.exists(run_file):
-            valid_paths.append(run_file)
-
-    return valid_paths
+    paths = find_history_files(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+    return [p for p in paths if os.path.exists(p)]
 
 
 def normalize_title(title: str) -> str:
@@ -49,10 +60,10 @@ def normalize_title(title: str) -> str:
 
     # 2) Keep letters (\p{L}), digits (\p{N}), or whitespace (\s); replace others with a space
     #    This allows Sinhala, Tamil, Devanagari, Arabic, etc. to remain
-    title = regex.sub(r"[^\p{L}\p{N}\s]+", " ", title)
+    title = NON_WORD_PATTERN.sub(" ", title)
 
     # 3) Collapse multiple spaces
-    title = regex.sub(r"\s+", " ", title)
+    title = SPACES_PATTERN.sub(" ", title)
 
     # 4) Strip and lowercase
     title = title.strip().lower()
@@ -60,37 +71,229 @@ def normalize_title(title: str) -> str:
     return title
 
 
-def fuzzy_drop_duplicates(df, threshold=95):
+# Memo of normalized titles shared by every cleanup in this process;
+# the same ads are scraped day after day, so most titles repeat.
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(normalize_title)
+
+
+def normalize_titles(titles):
+    """
+    Batched `normalize_title` over a whole column (Series or list).
+    Every distinct title is normalized once, through a bounded memo kept
+    across calls (NORMALIZE_CACHE_SIZE entries), and the result is
+    broadcast back to the rows. Returns a list in the same order.
+    """
+    codes, uniques = pd.factorize(pd.Series(titles, dtype=object))
+    # Missing titles get code -1, which picks the trailing "" below
+    normalized = [_normalize_cached(t) if isinstance(t, str) else "" for t in uniques]
+    normalized.append("")
+    return pd.Series(normalized, dtype=object).to_numpy()[codes].tolist()
+
+
+def listing_keys(df):
+    """
+    Exact identity of every row for the hash pass before fuzzy matching:
+    the ad URL (built from the ad slug), or None when a row has none.
+    """
+    if "URL" not in df.columns:
+        return [None] * len(df)
+    return [u if isinstance(u, str) and u else None for u in df["URL"]]
+
+
+def fuzzy_drop_duplicates(df, threshold=95, backend=DEDUPLICATION_BACKEND, workers=DEDUPLICATION_WORKERS):
     """
     Remove duplicates based on fuzzy string matching of 'title_normalized'.
-    Assumes DataFrame is sorted by 'Date' descending.
+    Assumes DataFrame is sorted by 'Date' descending, so the newest row wins.
+    Rows of an ad seen before (same URL) are dropped by hash first; then a
+    row is dropped if its title scores >= threshold against any row kept
+    before it. `backend` picks how pairs are scored (see SCORING_BACKENDS);
+    every backend keeps exactly the same rows.
+    """
+    keep = greedy_keep_mask(
+        df["title_normalized"].tolist(), threshold, backend=backend, workers=workers, keys=listing_keys(df)
+    )
+    return df[keep]
+
+
+def load_combined_frame(paths):
+    """
+    Load the raw files in `paths`, merge them and sort by Date DESC.
+    Files are read in parallel (through their columnar sidecars when
+    available) and concatenated once.
+    Rows with the same Date keep the order of `paths`.
+    Returns an empty DataFrame if there is no data.
     """
-    final_rows = []
-    seen_titles = []
+    metrics = get_metrics()
+    with metrics.timer("cleanup_load_seconds"):
+        frames = [df for df in read_raw_files(paths, columns=STATE_COLUMNS) if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        combined_df = pd.concat(frames, ignore_index=True)
+        if "Date" in combined_df.columns:
+            combined_df["Date"] = pd.to_datetime(combined_df["Date"], errors="coerce")
+
+            # Sort by newest
+            combined_df.sort_values(by="Date", ascending=False, kind="stable", inplace=True)
+            combined_df.reset_index(drop=True, inplace=True)
+
+    metrics.inc("cleanup_rows_in_total", len(combined_df))
+    return combined_df
+
+
+def add_normalized_titles(df):
+    """Add the 'title_normalized' column used for fuzzy matching."""
+    with get_metrics().timer("cleanup_normalize_seconds"):
+        df["title_normalized"] = normalize_titles(df["Title"])
+
 
-    for _, row in df.iterrows():
-        t_norm = row["title_normalized"]
-        is_duplicate = False
-        for existing_t in seen_titles:
-            ratio = fuzz.ratio(t_norm, existing_t)
-            if ratio >= threshold:
-                is_duplicate = True
-                break
-        if not is_duplicate:
-            final_rows.append(row)
-            seen_titles.append(t_norm)
+def dedup_state_path(threshold):
+    """Where the incremental dedup state for one threshold is kept."""
+    return os.path.join(DEDUP_STATE_DIR, f"threshold_{threshold}.pkl")
 
-    return pd.DataFrame(final_rows)
 
+def file_signature(paths):
+    """{path: (mtime_ns, size)} used to notice source files that changed."""
+    signature = {}
+    for p in paths:
+        st = os.stat(p)
+        signature[p] = (st.st_mtime_ns, st.st_size)
+    return signature
 
-def cleanup_duplicates(start_date, end_date, threshold):
+
+def incremental_drop_duplicates(excel_files, threshold, backend, workers, graph=None):
     """
-    1) Collect all Excel files in [start_date, end_date].
-    2) Merge them, sort by Date DESC.
-    3) Fuzzy deduplicate by 'Title'.
-    4) Keep only these columns (in order):
-         [Location, Date, Title, Price, Link].
-    5) Save to 'cleaned_scrape/cleaned_YYYY-MM-DD_to_YYYY-MM-DD.xlsx'
+    Fuzzy deduplicate `excel_files` reusing the state saved by the last cleanup
+    with the same threshold (cleaned_scrape/.dedup_state/):
+      - Files already in the state are not read or normalized again.
+      - If every new row is newer than the saved rows, or every new row is
+        older, only the new rows are normalized and compared
+        (see dedup_service.extend_newer / extend_older).
+      - Anything else (a source file changed or left the range, new rows in
+        the middle, rows without a Date) falls back to a full dedup, and the
+        state is rebuilt from it. With a similarity `graph` of the same files
+        covering the threshold, that run is a pass over the graph instead.
+    Returns (deduplicated DataFrame, None) or (None, error message).
+    """
+    signature = file_signature(excel_files)
+    state_path = dedup_state_path(threshold)
+    state = read_dedup_state(state_path)
+    if state is not None and (
+        state["threshold"] != threshold
+        # States saved before the exact URL pass don't know which rows it drops
+        or not state.get("exact_keys")
+        or any(signature.get(p) != sig for p, sig in state["sources"].items())
+    ):
+        state = None
+
+    if state is not None:
+        new_files = [p for p in excel_files if p not in state["sources"]]
+        if not new_files:
+            rows = state["rows"]
+            return rows[state["keep"]], None
+
+        new_df = load_combined_frame(new_files)
+        if new_df.empty:
+            state["sources"] = signature
+            write_dedup_state(state, state_path)
+            rows = state["rows"]
+            return rows[state["keep"]], None
+
+        missing_cols = [c for c in STATE_COLUMNS if c not in new_df.columns]
+        if missing_cols:
+            return None, f"Missing columns in data: {missing_cols}"
+
+        new_df = new_df[STATE_COLUMNS].copy()
+        old_rows = state["rows"]
+        if new_df["Date"].isna().any():
+            state = None
+        elif new_df["Date"].min() > old_rows["Date"].max():
+            add_normalized_titles(new_df)
+            with get_metrics().timer("cleanup_dedup_seconds", backend="incremental"):
+                keep, blockers, index, kept_positions = extend_newer(
+                    threshold, state["gram_counts"],
+                    new_df["title_normalized"].tolist(), old_rows["title_normalized"].tolist(),
+                    state["keep"], state["blockers"],
+                    exact_first=first_occurrences(listing_keys(new_df) + listing_keys(old_rows))
+                )
+            rows = pd.concat([new_df, old_rows], ignore_index=True)
+        elif new_df["Date"].max() < old_rows["Date"].min():
+            add_normalized_titles(new_df)
+            index, kept_positions = state["index"], state["kept_positions"]
+            exact_first = first_occurrences(listing_keys(old_rows) + listing_keys(new_df))[len(old_rows):]
+            with get_metrics().timer("cleanup_dedup_seconds", backend="incremental"):
+                new_keep, new_blockers = extend_older(
+                    index, kept_positions, len(old_rows), new_df["title_normalized"].tolist(), exact_first
+                )
+            keep = state["keep"] + new_keep
+            blockers = state["blockers"] + new_blockers
+            rows = pd.concat([old_rows, new_df], ignore_index=True)
+        else:
+            state = None
+
+    if state is None:
+        # Full run over every file in the range
+        rows = load_combined_frame(excel_files)
+        if rows.empty:
+            return None, "No data in the selected files."
+        if "Title" not in rows.columns:
+            return None, "No 'Title' column found. Cannot remove duplicates."
+        missing_cols = [c for c in STATE_COLUMNS if c not in rows.columns]
+        if missing_cols:
+            return None, f"Missing columns in data: {missing_cols}"
+
+        rows = rows[STATE_COLUMNS].copy()
+        add_normalized_titles(rows)
+        titles = rows["title_normalized"].tolist()
+        if graph is not None and graph["floor"] <= threshold <= 100 and graph["rows"] == len(rows):
+            with get_metrics().timer("cleanup_dedup_seconds", backend="graph"):
+                keep, blockers = graph_dedup(graph, threshold)
+        else:
+            with get_metrics().timer("cleanup_dedup_seconds", backend=backend):
+                keep, blockers = greedy_dedup(
+                    titles, threshold, backend=backend, workers=workers, keys=listing_keys(rows)
+                )
+        gram_counts = count_grams(titles)
+        index, kept_positions = build_index(threshold, gram_counts, titles, keep)
+        state = {"threshold": threshold, "gram_counts": gram_counts, "exact_keys": True}
+
+    # Saved rows only need a Date to be ordered; rows without one force a full run next time
+    if not rows["Date"].isna().any():
+        state.update({
+            "sources": signature,
+            "rows": rows,
+            "keep": keep,
+            "blockers": blockers,
+            "index": index,
+            "kept_positions": kept_positions
+        })
+        write_dedup_state(state, state_path)
+
+    return rows[keep], None
+
+
+# ----------------------------------
+# Similarity graph
+# ----------------------------------
+def load_similarity_graph(start_date, end_date, excel_files=None):
+    """
+    The saved similarity graph of a date range, or None if there is none or
+    a source file changed (or joined/left the range) since it was built.
+    """
+    if excel_files is None:
+        excel_files = find_excel_files_for_range(start_date, end_date)
+    graph = read_similarity_graph(similarity_graph_path(start_date, end_date))
+    if graph is None or graph.get("sources") != file_signature(excel_files):
+        return None
+    return graph
+
+
+def build_similarity_graph(start_date, end_date, floor=SIMILARITY_GRAPH_FLOOR, workers=DEDUPLICATION_WORKERS):
+    """
+    Score every title pair of the range once and save the pairs reaching
+    `floor` (see dedup_service.similarity_graph), so any threshold from
+    `floor` to 100 can be previewed or applied without new comparisons.
+    An up-to-date graph with a floor at least as low is kept as it is.
     """
     excel_files = find_excel_files_for_range(start_date, end_date)
     if not excel_files:
@@ -100,40 +303,313 @@ def cleanup_duplicates(start_date, end_date, threshold):
             "file": ""
         }
 
-    combined_df = pd.DataFrame()
+    path = similarity_graph_path(start_date, end_date)
+    graph = load_similarity_graph(start_date, end_date, excel_files)
+    if graph is None or graph["floor"] > floor:
+        rows = load_combined_frame(excel_files)
+        if rows.empty:
+            return {
+                "success": False,
+                "message": "No data in the selected files.",
+                "file": ""
+            }
+        if "Title" not in rows.columns:
+            return {
+                "success": False,
+                "message": "No 'Title' column found. Cannot build the similarity graph.",
+                "file": ""
+            }
+        titles = normalize_titles(rows["Title"])
+        with get_metrics().timer("cleanup_graph_seconds"):
+            graph = similarity_graph(titles, floor, keys=listing_keys(rows), workers=workers)
+        graph["sources"] = file_signature(excel_files)
+        write_dedup_state(graph, path)
+
+    return {
+        "success": True,
+        "message": (
+            f"Similarity graph saved: {len(graph['node_rows'])} distinct titles, "
+            f"{len(graph['neighbors'])} pairs scoring {graph['floor']} or more."
+        ),
+        "file": path
+    }
+
+
+def preview_thresholds(start_date, end_date, thresholds):
+    """
+    {threshold: rows kept} for every threshold the saved graph of the range
+    covers, from one pass over the graph. None if the range has no
+    up-to-date graph. The counts are kept until the graph file or one of
+    the range's raw files changes (see cached_by_mtime), so UI reruns
+    don't walk the graph again.
+    """
+    excel_files = find_excel_files_for_range(start_date, end_date)
+    thresholds = tuple(sorted(set(thresholds)))
+
+    def count():
+        graph = load_similarity_graph(start_date, end_date, excel_files)
+        if graph is None:
+            return None
+        return keep_counts(graph, [t for t in thresholds if graph["floor"] <= t <= 100])
+
+    paths = [similarity_graph_path(start_date, end_date), *excel_files]
+    return cached_by_mtime(f"threshold_preview{thresholds}", paths, count)
+
+
+# ----------------------------------
+# Streaming cleanup
+# ----------------------------------
+def _date_sort_key(date):
+    """Newest first, rows without a Date last (the order of sort_values(ascending=False))."""
+    return (1, 0) if pd.isna(date) else (0, -date.value)
+
+
+def read_sorted_raw_file(path):
+    """One raw file's STATE_COLUMNS with Date parsed, newest first (stable). None if empty."""
+    df = read_raw_file(path, STATE_COLUMNS)
+    if df is None or df.empty:
+        return None
+    df = df.assign(Date=pd.to_datetime(df["Date"], errors="coerce")) if "Date" in df.columns else df
+    if "Date" in df.columns:
+        df = df.sort_values(by="Date", ascending=False, kind="stable")
+    return df
+
+
+def scan_raw_files(paths):
+    """
+    First pass of a streaming cleanup, one file at a time:
+      - checks every file has STATE_COLUMNS
+      - finds the newest Date of each file, so the merge knows when to open it
+      - counts the bigrams of the normalized titles for the dedup index
+    Returns (files, gram_counts, rows, error): files are (newest key, position, path).
+    """
+    files = []
+    gram_counts = Counter()
+    rows = 0
+    for position, path in enumerate(paths):
+        df = read_sorted_raw_file(path)
+        if df is None:
+            continue
+        missing_cols = [c for c in STATE_COLUMNS if c not in df.columns]
+        if missing_cols:
+            return None, None, 0, f"Missing columns in data: {missing_cols}"
+        files.append((_date_sort_key(df["Date"].iloc[0]), position, path))
+        gram_counts.update(count_grams(normalize_titles(df["Title"])))
+        rows += len(df)
+    return files, gram_counts, rows, None
+
+
+def merge_raw_files(files):
+    """
+    K-way merge (heapq) of raw files into one stream of STATE_COLUMNS
+    tuples, newest Date first; rows with the same Date keep the order of
+    the files, as in load_combined_frame. A file is only read once the
+    merge reaches its newest Date, so only files whose dates overlap are
+    in memory together (one per scrape day for daily exports).
+    """
+    pending = sorted(files)
+    next_file = 0
+    heap = []
+    iterators = {}
+
+    def push(position):
+        row = next(iterators[position], None)
+        if row is None:
+            del iterators[position]
+        else:
+            seq, values = row
+            heapq.heappush(heap, (_date_sort_key(values[1]), position, seq, values))
+
+    while True:
+        # Open every file that could hold the next row before taking it
+        while next_file < len(pending) and (not heap or pending[next_file][0] <= heap[0][0]):
+            _, position, path = pending[next_file]
+            next_file += 1
+            df = read_sorted_raw_file(path)
+            iterators[position] = enumerate(df[STATE_COLUMNS].itertuples(index=False, name=None))
+            push(position)
+        if not heap:
+            return
+        _, position, _, values = heapq.heappop(heap)
+        yield values
+        push(position)
+
+
+def stream_drop_duplicates(excel_files, threshold, out_path, output_format="xlsx", workers=DEDUPLICATION_WORKERS):
+    """
+    Out-of-core version of the cleanup: the raw files are k-way merged in
+    Date-descending order (only the STATE_COLUMNS are read), deduplicated
+    by a generator and every kept row is written to `out_path` (in
+    `output_format`) as soon as it is decided. Peak memory follows the
+    dedup index (kept titles, seen URLs), not the size of the date range.
+    Returns (store rows of the kept listings, write report, None)
+    or (None, None, error message).
+    """
+    metrics = get_metrics()
+    # Parse the files without sidecars in parallel once; every later read is columnar
+    warm_sidecars(excel_files, workers=None if workers == -1 else workers)
+    with metrics.timer("cleanup_load_seconds"):
+        files, gram_counts, rows_in, error = scan_raw_files(excel_files)
+    if error:
+        return None, None, error
+    if not rows_in:
+        return None, None, "No data in the selected files."
+    metrics.inc("cleanup_rows_in_total", rows_in)
+
+    def items():
+        for row in merge_raw_files(files):
+            url, title = row[4], row[2]
+            yield (
+                url if isinstance(url, str) and url else None,
+                _normalize_cached(title) if isinstance(title, str) else "",
+                row
+            )
+
+    kept = []
+
+    def output_rows():
+        for location, date, title, price, url in iter_dedup(items(), threshold, gram_counts):
+            date = None if pd.isna(date) else date.to_pydatetime()
+            price = None if pd.isna(price) else price
+            kept.append((
+                location if isinstance(location, str) else None,
+                date.strftime("%Y-%m-%d") if date is not None else None,
+                title if isinstance(title, str) else None,
+                int(round(price)) if price is not None else None,
+                url if isinstance(url, str) else None
+            ))
+            yield location, date, title, price, url
+
+    # Dedup and write are interleaved, so both are timed together
+    with metrics.timer("cleanup_dedup_seconds", backend="stream"):
+        report = write_cleaned_file(output_rows(), FINAL_COLUMNS, out_path, output_format)
+    return kept, report, None
 
-    # Load & combine
-    for fpath in excel_files:
-        df = read_excel_file(fpath)  # your own function
-        if df is not None and not df.empty:
-            if "Date" in df.columns:
-                df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
 
-    if combined_df.empty:
+def cleaned_file_path(start_date, end_date, output_format="xlsx"):
+    """cleaned_scrape/cleaned_YYYY-MM-DD_to_YYYY-MM-DD.<ext> for a date range and output format."""
+    start_str = start_date.strftime("%Y-%m-%d")
+    end_str = end_date.strftime("%Y-%m-%d")
+    return os.path.join(CLEANED_SCRAPE_DIR, f"cleaned_{start_str}_to_{end_str}{OUTPUT_FORMATS[output_format]}")
+
+
+def record_write(report):
+    """Count a cleaned file write in the metrics; returns the result fields that describe it."""
+    metrics = get_metrics()
+    metrics.observe("cleanup_write_seconds", report["seconds"], format=report["format"])
+    metrics.inc("cleanup_written_bytes_total", report["bytes"], format=report["format"])
+    return {
+        "format": report["format"],
+        "bytes": report["bytes"],
+        "write_seconds": round(report["seconds"], 3)
+    }
+
+
+def cleanup_duplicates(start_date, end_date, threshold, backend=DEDUPLICATION_BACKEND,
+                       workers=DEDUPLICATION_WORKERS, incremental=True, streaming=CLEANUP_STREAMING,
+                       output_format=CLEANUP_OUTPUT_FORMAT, save_graph=False):
+    """
+    1) Collect all Excel files in [start_date, end_date].
+    2) Merge them, sort by Date DESC.
+    3) Drop repeated sightings of the same ad (same URL) by hash, then
+       fuzzy deduplicate by 'Title' with the given scoring backend
+       ("index" or "matrix") on `workers` cores. With `incremental`,
+       rows handled by an earlier cleanup are reused from the saved
+       dedup state instead of being deduplicated again.
+       With `streaming`, steps 2-5 run out of core instead (see
+       stream_drop_duplicates); `backend` and `incremental` don't apply.
+       With `save_graph`, the similarity graph of the range is built first
+       (see build_similarity_graph); a full dedup of the range then runs
+       as a pass over that graph.
+    4) Keep only these columns (in order):
+         [Location, Date, Title, Price, Link].
+    5) Save to 'cleaned_scrape/cleaned_YYYY-MM-DD_to_YYYY-MM-DD.xlsx', or
+       .csv / .parquet / .jsonl.gz for another `output_format`; rows are
+       streamed to the file. The result reports the bytes and write time.
+    6) Load the same rows into the indexed store behind the Explore tab.
+    """
+    if output_format not in OUTPUT_FORMATS:
         return {
             "success": False,
-            "message": "No data in the selected files.",
+            "message": f"Unknown output format: {output_format}",
             "file": ""
         }
 
-    # Sort by newest
-    if "Date" in combined_df.columns:
-        combined_df.sort_values(by="Date", ascending=False, inplace=True)
-
-    # Must have Title for dedup
-    if "Title" not in combined_df.columns:
+    excel_files = find_excel_files_for_range(start_date, end_date)
+    if not excel_files:
         return {
             "success": False,
-            "message": "No 'Title' column found. Cannot remove duplicates.",
+            "message": "No Excel files found in the selected date range.",
             "file": ""
         }
 
-    # Create a normalized col for fuzzy matching
-    combined_df["title_normalized"] = combined_df["Title"].apply(normalize_title)
+    if save_graph:
+        graph_result = build_similarity_graph(start_date, end_date, workers=workers)
+        if not graph_result["success"]:
+            return graph_result
 
-    # Fuzzy deduplicate
-    dedup_df = fuzzy_drop_duplicates(combined_df, threshold=threshold)
+    if streaming:
+        out_path = cleaned_file_path(start_date, end_date, output_format)
+        try:
+            kept, report, error = stream_drop_duplicates(
+                excel_files, threshold, out_path, output_format=output_format, workers=workers
+            )
+            if error:
+                return {
+                    "success": False,
+                    "message": error,
+                    "file": ""
+                }
+            with get_metrics().timer("cleanup_store_seconds"):
+                store_cleaned_rows(kept, out_path)
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error saving file: {e}",
+                "file": ""
+            }
+        get_metrics().inc("cleanup_rows_out_total", len(kept))
+        written = record_write(report)
+        export_metrics()
+        return {
+            "success": True,
+            "message": f"Fuzzy cleanup done. {len(kept)} records remain.",
+            "file": out_path,
+            **written
+        }
+
+    if incremental:
+        graph = load_similarity_graph(start_date, end_date, excel_files)
+        dedup_df, error = incremental_drop_duplicates(excel_files, threshold, backend, workers, graph=graph)
+        if error:
+            return {
+                "success": False,
+                "message": error,
+                "file": ""
+            }
+    else:
+        combined_df = load_combined_frame(excel_files)
+        if combined_df.empty:
+            return {
+                "success": False,
+                "message": "No data in the selected files.",
+                "file": ""
+            }
+
+        # Must have Title for dedup
+        if "Title" not in combined_df.columns:
+            return {
+                "success": False,
+                "message": "No 'Title' column found. Cannot remove duplicates.",
+                "file": ""
+            }
+
+        # Create a normalized col for fuzzy matching
+        add_normalized_titles(combined_df)
+
+        # Fuzzy deduplicate
+        with get_metrics().timer("cleanup_dedup_seconds", backend=backend):
+            dedup_df = fuzzy_drop_duplicates(combined_df, threshold=threshold, backend=backend, workers=workers)
 
     # Now select and rename columns as desired
     # Assume your DF has "Location", "Date", "Title", "Price (numeric)", "URL"
@@ -146,8 +622,8 @@ def cleanup_duplicates(start_date, end_date, threshold):
         if old_col in dedup_df.columns:
             dedup_df.rename(columns={old_col: new_col}, inplace=True)
 
-    # Keep only these columns, in this order:
-    final_columns = ["Location", "Date", "Title", "Price", "Link"]
+    # Keep only these columns, in this order (FINAL_COLUMNS):
+    final_columns = FINAL_COLUMNS
     # If any are missing, you may need to handle that gracefully
     missing_cols = [c for c in final_columns if c not in dedup_df.columns]
     if missing_cols:
@@ -162,19 +638,21 @@ def cleanup_duplicates(start_date, end_date, threshold):
     final_count = len(dedup_df)
 
     # Write file
-    start_str = start_date.strftime("%Y-%m-%d")
-    end_str = end_date.strftime("%Y-%m-%d")
-    filename = f"cleaned_{start_str}_to_{end_str}.xlsx"
-    out_dir = CLEANED_SCRAPE_DIR
-    os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, filename)
+    out_path = cleaned_file_path(start_date, end_date, output_format)
+    os.makedirs(CLEANED_SCRAPE_DIR, exist_ok=True)
 
     try:
-        write_excel_file(dedup_df, out_path)  # your own function
+        report = write_cleaned_file(dedup_df.itertuples(index=False, name=None), final_columns, out_path, output_format)
+        with get_metrics().timer("cleanup_store_seconds"):
+            store_cleaned_listings(dedup_df, out_path)
+        get_metrics().inc("cleanup_rows_out_total", final_count)
+        written = record_write(report)
+        export_metrics()
         return {
             "success": True,
             "message": f"Fuzzy cleanup done. {final_count} records remain.",
-            "file": out_path
+            "file": out_path,
+            **written
         }
     except Exception as e:
         return {
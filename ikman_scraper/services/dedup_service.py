@@ -0,0 +1,627 @@
+import math
+from collections import Counter
+import numpy as np
+from rapidfuzz import fuzz as rf_fuzz, process
+from thefuzz import fuzz
+from .metrics_service import get_metrics
+
+# Titles are split into overlapping character bigrams for the candidate index
+GRAM_SIZE = 2
+
+# Titles scored per batch by the "matrix" backend, and kept titles per matrix tile
+MATRIX_CHUNK_SIZE = 512
+MATRIX_TILE_SIZE = 8192
+
+
+def title_grams(title, q=GRAM_SIZE):
+    """All overlapping q-grams of `title` (with repeats)."""
+    return [title[i:i + q] for i in range(len(title) - q + 1)]
+
+
+def count_grams(titles, q=GRAM_SIZE):
+    """How often every q-gram occurs across `titles`; used to rank rare grams first."""
+    counts = Counter()
+    for t in titles:
+        counts.update(title_grams(t, q))
+    return counts
+
+
+class DedupIndex:
+    """
+    Candidate index for greedy fuzzy deduplication.
+
+    `fuzz.ratio(a, b)` is 100 * 2 * LCS(a, b) / (len(a) + len(b)), rounded.
+    For a given threshold that gives two cheap necessary conditions:
+      1) Length filter: the lengths of a and b cannot differ too much.
+      2) Bigram filter: a and b must share a minimum number of bigrams
+         (every character outside the LCS breaks at most one shared bigram).
+    Kept titles are indexed by the "prefix" of their rarest bigrams, which
+    is enough to find every pair meeting the bigram bound. Only the pairs
+    that pass both filters are checked with the exact `fuzz.ratio`, so the
+    keep/drop decisions are the same as comparing against every title.
+    `comparisons` counts those exact scorer calls.
+    """
+
+    # Class default so indexes pickled before the counter existed still load
+    comparisons = 0
+
+    def __init__(self, threshold, gram_counts=None, q=GRAM_SIZE):
+        self.threshold = threshold
+        self.q = q
+        # A ratio rounds to >= threshold only if the raw similarity is >= threshold - 0.5;
+        # keep a little slack so float rounding can never drop a true candidate.
+        self.min_sim = (threshold - 0.5) / 100 - 1e-9
+        self.gram_counts = gram_counts if gram_counts is not None else Counter()
+
+        self.titles = []
+        self.exact = {}  # title -> id, identical titles always score 100
+        self.postings = {}  # token -> [ids of kept titles with the token in their prefix]
+        self.unindexed = []  # ids of titles too short for the bigram bound to help
+        self._bounds = {}  # title length -> _min_bound(length)
+
+    # ----------------------------------
+    # Filters derived from the threshold
+    # ----------------------------------
+    def length_window(self, length):
+        """Smallest and largest partner length that can still reach the threshold."""
+        s = self.min_sim
+        if s <= 0:
+            return 0, math.inf
+        if length == 0:
+            return 0, 0
+        low = math.ceil(length * s / (2 - s) - 1e-9)
+        high = math.floor(length * (2 - s) / s + 1e-9)
+        return low, high
+
+    def min_shared_grams(self, len_a, len_b):
+        """Lower bound on the bigrams a pair of these lengths shares if it matches."""
+        min_lcs = max(0, math.ceil(self.min_sim * (len_a + len_b) / 2 - 1e-9))
+        unmatched = len_a + len_b - 2 * min_lcs
+        return min_lcs - self.q + 1 - (self.q - 1) * unmatched
+
+    def _min_bound(self, length):
+        """The weakest bigram bound over every partner length in the window."""
+        if length not in self._bounds:
+            low, high = self.length_window(length)
+            if high == math.inf:
+                self._bounds[length] = 0
+            elif low > high:
+                # Nothing can reach the threshold (e.g. threshold > 100)
+                self._bounds[length] = length + 1
+            else:
+                self._bounds[length] = min(
+                    self.min_shared_grams(length, other) for other in range(low, high + 1)
+                )
+        return self._bounds[length]
+
+    def _prefix(self, title):
+        """
+        Tokens (bigram, occurrence number) sorted rare-first, cut to the prefix
+        that must overlap with any matching title's prefix.
+        Returns (prefix, indexable) where indexable is False when the
+        bound is too weak and the title has to be compared directly.
+        """
+        occurrences = Counter()
+        tokens = []
+        for g in title_grams(title, self.q):
+            occurrences[g] += 1
+            tokens.append((g, occurrences[g]))
+        tokens.sort(key=lambda tok: (self.gram_counts.get(tok[0], 0), tok))
+
+        bound = self._min_bound(len(title))
+        prefix_len = len(tokens) - max(bound, 1) + 1
+        return tokens[:max(prefix_len, 0)], bound > 0
+
+    # ----------------------------------
+    # Lookup and insert
+    # ----------------------------------
+    def find_match(self, title):
+        """Return the id of a kept title with fuzz.ratio >= threshold, or None."""
+        if self.threshold <= 100 and title in self.exact:
+            return self.exact[title]
+
+        prefix, indexable = self._prefix(title)
+        candidates = set()
+        for tok in prefix:
+            candidates.update(self.postings.get(tok, ()))
+        if not indexable:
+            # Short titles can match without sharing bigrams; compare them directly
+            candidates.update(self.unindexed)
+
+        low, high = self.length_window(len(title))
+        for idx in sorted(candidates):
+            other = self.titles[idx]
+            if low <= len(other) <= high:
+                self.comparisons += 1
+                if fuzz.ratio(title, other) >= self.threshold:
+                    return idx
+        return None
+
+    def add(self, title):
+        """Index a kept title and return its id."""
+        idx = len(self.titles)
+        self.titles.append(title)
+        self.exact.setdefault(title, idx)
+
+        prefix, indexable = self._prefix(title)
+        for tok in prefix:
+            self.postings.setdefault(tok, []).append(idx)
+        if not indexable:
+            self.unindexed.append(idx)
+        return idx
+
+
+def index_dedup(titles, threshold, workers=1):
+    """
+    Greedy "first wins" dedup over `titles` (already sorted newest first),
+    scoring one candidate pair at a time through `DedupIndex`.
+    Returns (keep, blockers): keep[i] is True for every kept title and
+    blockers[i] is the position of a kept title that title i duplicates
+    (-1 for kept titles).
+    `workers` is accepted for a common backend signature and ignored.
+    """
+    index = DedupIndex(threshold, gram_counts=count_grams(titles))
+    kept_positions = []
+    keep = []
+    blockers = []
+    for pos, t in enumerate(titles):
+        match = index.find_match(t)
+        if match is None:
+            index.add(t)
+            kept_positions.append(pos)
+            keep.append(True)
+            blockers.append(-1)
+        else:
+            keep.append(False)
+            blockers.append(kept_positions[match])
+    get_metrics().inc("dedup_comparisons_total", index.comparisons, backend="index")
+    return keep, blockers
+
+
+def _score_matrix(queries, choices, threshold, workers):
+    """
+    Boolean matrix: queries[i] vs choices[j] reaches the threshold.
+    Scores are rounded like `thefuzz.fuzz.ratio` (round half to even) so
+    the decisions match the pairwise scorer exactly.
+    """
+    scores = process.cdist(
+        queries, choices,
+        scorer=rf_fuzz.ratio,
+        dtype=np.float64,
+        score_cutoff=max(0, threshold - 1),
+        workers=workers
+    )
+    return np.round(scores) >= threshold
+
+
+def matrix_dedup(titles, threshold, workers=1):
+    """
+    Same decisions as `index_dedup`, but titles are scored in blocks:
+      1) Each chunk of MATRIX_CHUNK_SIZE titles is scored against every kept
+         title of a compatible length in one `cdist` call (tiled so memory
+         stays bounded). `workers` cores score the tiles (-1 = all cores).
+      2) The chunk is then scored against itself and the greedy decisions
+         are made row by row on the small chunk x chunk matrix.
+    """
+    length_filter = DedupIndex(threshold)
+    kept_titles = []
+    kept_positions = np.empty(0, dtype=np.int64)
+    kept_lengths = np.empty(0, dtype=np.int64)
+    keep = []
+    blockers = []
+    comparisons = 0
+
+    for start in range(0, len(titles), MATRIX_CHUNK_SIZE):
+        chunk = titles[start:start + MATRIX_CHUNK_SIZE]
+
+        # 1) Chunk vs titles kept by earlier chunks
+        blocker_chunk = np.full(len(chunk), -1, dtype=np.int64)
+        if kept_titles:
+            windows = [length_filter.length_window(len(t)) for t in chunk]
+            low = min(w[0] for w in windows)
+            high = max(w[1] for w in windows)
+            compatible = np.flatnonzero((kept_lengths >= low) & (kept_lengths <= high))
+            for tile_start in range(0, len(compatible), MATRIX_TILE_SIZE):
+                tile_ids = compatible[tile_start:tile_start + MATRIX_TILE_SIZE]
+                hits = _score_matrix(chunk, [kept_titles[j] for j in tile_ids], threshold, workers)
+                comparisons += hits.size
+                new_hits = hits.any(axis=1) & (blocker_chunk < 0)
+                blocker_chunk[new_hits] = kept_positions[tile_ids[hits[new_hits].argmax(axis=1)]]
+
+        # 2) Greedy pass inside the chunk
+        within = _score_matrix(chunk, chunk, threshold, workers)
+        comparisons += within.size
+        keep_chunk = np.zeros(len(chunk), dtype=bool)
+        for i in range(len(chunk)):
+            if blocker_chunk[i] >= 0:
+                continue
+            local = np.flatnonzero(within[i, :i] & keep_chunk[:i])
+            if len(local):
+                blocker_chunk[i] = start + local[0]
+            else:
+                keep_chunk[i] = True
+
+        new_ids = np.flatnonzero(keep_chunk)
+        kept_titles.extend(chunk[i] for i in new_ids)
+        kept_positions = np.concatenate([kept_positions, start + new_ids])
+        kept_lengths = np.concatenate([kept_lengths, [len(chunk[i]) for i in new_ids]]).astype(np.int64)
+        keep.extend(keep_chunk.tolist())
+        blockers.extend(blocker_chunk.tolist())
+
+    get_metrics().inc("dedup_comparisons_total", comparisons, backend="matrix")
+    return keep, blockers
+
+
+# Available scoring backends for cleanup; all return identical keep masks
+SCORING_BACKENDS = {
+    "index": index_dedup,
+    "matrix": matrix_dedup,
+}
+
+
+def first_occurrences(keys):
+    """
+    Exact matching by hash: for every key, the position of the first row
+    with the same key, or -1 if it is the first one (or the key is None).
+    """
+    first = {}
+    positions = []
+    for pos, key in enumerate(keys):
+        if key is None:
+            positions.append(-1)
+            continue
+        first_pos = first.setdefault(key, pos)
+        positions.append(first_pos if first_pos != pos else -1)
+    return positions
+
+
+def greedy_dedup(titles, threshold, backend="index", workers=1, keys=None):
+    """
+    Greedy "first wins" dedup over `titles` (already sorted newest first)
+    using one of SCORING_BACKENDS. Returns (keep, blockers).
+    With `keys` (e.g. ad URLs), a row whose key already appeared is dropped
+    (blocked by that first row) before any fuzzy scoring; only the first
+    row of each key takes part in the fuzzy pass.
+    """
+    if backend not in SCORING_BACKENDS:
+        raise ValueError(f"Unknown scoring backend: {backend}")
+    if keys is None:
+        return SCORING_BACKENDS[backend](titles, threshold, workers=workers)
+
+    exact_first = first_occurrences(keys)
+    unique_positions = [pos for pos, first in enumerate(exact_first) if first < 0]
+    unique_keep, unique_blockers = SCORING_BACKENDS[backend](
+        [titles[pos] for pos in unique_positions], threshold, workers=workers
+    )
+    keep = [False] * len(titles)
+    blockers = list(exact_first)
+    for pos, k, blocker in zip(unique_positions, unique_keep, unique_blockers):
+        keep[pos] = k
+        blockers[pos] = unique_positions[blocker] if blocker >= 0 else -1
+    get_metrics().inc("dedup_exact_matches_total", len(titles) - len(unique_positions))
+    return keep, blockers
+
+
+def greedy_keep_mask(titles, threshold, backend="index", workers=1, keys=None):
+    """
+    Greedy "first wins" dedup over `titles` (already sorted newest first).
+    Returns a list of booleans: True for every title that is kept.
+    """
+    return greedy_dedup(titles, threshold, backend=backend, workers=workers, keys=keys)[0]
+
+
+def iter_dedup(items, threshold, gram_counts=None):
+    """
+    Streaming greedy dedup. `items` yields (key, normalized title, payload)
+    already sorted newest first; the payload of every kept item is yielded
+    as soon as it is decided, with the same decisions as
+    greedy_dedup(titles, threshold, keys=keys). Memory holds the index of
+    kept titles and the set of keys seen, never the whole input.
+    `gram_counts` should cover the titles (it only orders bigrams rare-first
+    for speed; any fixed counts give the same result).
+    """
+    index = DedupIndex(threshold, gram_counts=gram_counts)
+    seen_keys = set()
+    exact = 0
+    try:
+        for key, title, payload in items:
+            if key is not None:
+                if key in seen_keys:
+                    exact += 1
+                    continue
+                seen_keys.add(key)
+            if index.find_match(title) is None:
+                index.add(title)
+                yield payload
+    finally:
+        get_metrics().inc("dedup_comparisons_total", index.comparisons, backend="stream")
+        get_metrics().inc("dedup_exact_matches_total", exact)
+
+
+# ----------------------------------
+# Incremental dedup
+# ----------------------------------
+def build_index(threshold, gram_counts, titles, keep):
+    """Index the kept `titles`. Returns (index, kept_positions)."""
+    index = DedupIndex(threshold, gram_counts=gram_counts)
+    kept_positions = []
+    for pos, (t, k) in enumerate(zip(titles, keep)):
+        if k:
+            index.add(t)
+            kept_positions.append(pos)
+    return index, kept_positions
+
+
+def extend_older(index, kept_positions, offset, new_titles, exact_first=None):
+    """
+    Continue a finished dedup with titles that all sort after the old ones
+    (older rows). Only the new titles are compared; `index` and
+    `kept_positions` are updated in place. New title i gets position offset + i.
+    `exact_first[i]` (see first_occurrences, over the combined rows) drops
+    new title i without scoring when its key appeared before.
+    Returns (keep, blockers) for the new titles.
+    """
+    keep = []
+    blockers = []
+    comparisons_before = index.comparisons
+    exact = 0
+    for i, t in enumerate(new_titles):
+        if exact_first is not None and exact_first[i] >= 0:
+            keep.append(False)
+            blockers.append(exact_first[i])
+            exact += 1
+            continue
+        match = index.find_match(t)
+        if match is None:
+            index.add(t)
+            kept_positions.append(offset + i)
+            keep.append(True)
+            blockers.append(-1)
+        else:
+            keep.append(False)
+            blockers.append(kept_positions[match])
+    get_metrics().inc("dedup_comparisons_total", index.comparisons - comparisons_before, backend="incremental")
+    get_metrics().inc("dedup_exact_matches_total", exact)
+    return keep, blockers
+
+
+def extend_newer(threshold, gram_counts, new_titles, old_titles, old_keep, old_blockers, exact_first=None):
+    """
+    Redo a finished dedup after `new_titles` were put in front of it (newer rows),
+    giving the same result as a full run over new_titles + old_titles:
+      - A row whose key appeared earlier in the combined rows (`exact_first`,
+        see first_occurrences) is dropped first, without scoring; an old
+        row whose ad shows up again among the new rows goes this way.
+      - New titles are deduplicated among themselves.
+      - An old kept title can only be knocked out by a title that became kept
+        since the old run, so it is compared against those alone.
+      - An old dropped title stays dropped while its blocker is still kept;
+        otherwise it is compared against everything kept before it.
+    Returns (keep, blockers, index, kept_positions) over the combined list.
+    """
+    index = DedupIndex(threshold, gram_counts=gram_counts)
+    newly_kept = DedupIndex(threshold, gram_counts=gram_counts)
+    kept_positions = []
+    newly_kept_positions = []
+    keep = []
+    blockers = []
+
+    def mark_kept(pos, t, is_new):
+        index.add(t)
+        kept_positions.append(pos)
+        if is_new:
+            newly_kept.add(t)
+            newly_kept_positions.append(pos)
+        keep.append(True)
+        blockers.append(-1)
+
+    def mark_dropped(blocker):
+        keep.append(False)
+        blockers.append(blocker)
+
+    exact = 0
+    for pos, t in enumerate(new_titles):
+        if exact_first is not None and exact_first[pos] >= 0:
+            mark_dropped(exact_first[pos])
+            exact += 1
+            continue
+        match = index.find_match(t)
+        if match is None:
+            mark_kept(pos, t, True)
+        else:
+            mark_dropped(kept_positions[match])
+
+    offset = len(new_titles)
+    for old_pos, t in enumerate(old_titles):
+        pos = offset + old_pos
+        if exact_first is not None and exact_first[pos] >= 0:
+            mark_dropped(exact_first[pos])
+            exact += 1
+        elif old_keep[old_pos]:
+            match = newly_kept.find_match(t)
+            if match is None:
+                mark_kept(pos, t, False)
+            else:
+                mark_dropped(newly_kept_positions[match])
+        else:
+            blocker = old_blockers[old_pos] + offset
+            if keep[blocker]:
+                mark_dropped(blocker)
+                continue
+            match = index.find_match(t)
+            if match is None:
+                mark_kept(pos, t, True)
+            else:
+                mark_dropped(kept_positions[match])
+
+    get_metrics().inc(
+        "dedup_comparisons_total", index.comparisons + newly_kept.comparisons, backend="incremental"
+    )
+    get_metrics().inc("dedup_exact_matches_total", exact)
+    return keep, blockers, index, kept_positions
+
+
+# ----------------------------------
+# Similarity graph
+# ----------------------------------
+def _score_pairs(queries, choices, floor, workers):
+    """Scores of queries[i] vs choices[j], rounded like `thefuzz.fuzz.ratio`; 0 below `floor`."""
+    scores = process.cdist(
+        queries, choices,
+        scorer=rf_fuzz.ratio,
+        dtype=np.float64,
+        score_cutoff=max(0, floor - 1),
+        workers=workers
+    )
+    scores = np.round(scores)
+    scores[scores < floor] = 0
+    return scores
+
+
+def similarity_graph(titles, floor, keys=None, workers=1):
+    """
+    Sparse graph of every title pair scoring >= `floor`, for re-running the
+    greedy dedup at any threshold in [floor, 100] without new comparisons.
+    `titles` are sorted newest first; with `keys` the exact pass of
+    greedy_dedup is applied first.
+      - Nodes are the distinct titles left after the exact pass, in
+        first-occurrence order. A repeated title always scores 100, so it
+        follows the decision of its first row and needs no node.
+      - Node i lists its neighbours j < i with their fuzz.ratio score.
+        Pairs are scored in MATRIX_CHUNK_SIZE x MATRIX_TILE_SIZE `cdist`
+        tiles on `workers` cores, skipping lengths that cannot reach `floor`.
+    Returns a dict of numpy arrays:
+      node_rows[n]  row position of node n
+      row_refs[r]   the earlier row that row r repeats (same key or same title), -1 for node rows
+      offsets       neighbours of node n are neighbors/scores[offsets[n]:offsets[n + 1]]
+    """
+    exact_first = first_occurrences(keys) if keys is not None else [-1] * len(titles)
+    node_of_title = {}
+    node_rows = []
+    node_titles = []
+    row_refs = []
+    for pos, (t, first) in enumerate(zip(titles, exact_first)):
+        if first >= 0:
+            row_refs.append(first)
+            continue
+        node = node_of_title.get(t)
+        if node is not None:
+            row_refs.append(node_rows[node])
+            continue
+        node_of_title[t] = len(node_rows)
+        node_rows.append(pos)
+        node_titles.append(t)
+        row_refs.append(-1)
+
+    length_filter = DedupIndex(floor)
+    lengths = np.array([len(t) for t in node_titles], dtype=np.int64)
+    sources = []
+    targets = []
+    scores = []
+    comparisons = 0
+    for start in range(0, len(node_titles), MATRIX_CHUNK_SIZE):
+        chunk = node_titles[start:start + MATRIX_CHUNK_SIZE]
+        windows = [length_filter.length_window(len(t)) for t in chunk]
+        low = min(w[0] for w in windows)
+        high = max(w[1] for w in windows)
+        # Earlier nodes and the chunk itself; pairs j >= i are masked out below
+        compatible = np.flatnonzero((lengths[:start + len(chunk)] >= low) & (lengths[:start + len(chunk)] <= high))
+        for tile_start in range(0, len(compatible), MATRIX_TILE_SIZE):
+            tile_ids = compatible[tile_start:tile_start + MATRIX_TILE_SIZE]
+            tile = _score_pairs(chunk, [node_titles[j] for j in tile_ids], floor, workers)
+            comparisons += tile.size
+            rows, cols = np.nonzero(tile)
+            earlier = tile_ids[cols] < start + rows
+            sources.append(start + rows[earlier])
+            targets.append(tile_ids[cols[earlier]])
+            scores.append(tile[rows[earlier], cols[earlier]])
+    get_metrics().inc("dedup_comparisons_total", comparisons, backend="graph")
+
+    sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.int64)
+    scores = np.concatenate(scores) if scores else np.empty(0)
+    # Neighbour lists grouped by node, in node order within each list
+    order = np.lexsort((targets, sources))
+    offsets = np.searchsorted(sources[order], np.arange(len(node_titles) + 1))
+
+    return {
+        "floor": floor,
+        "rows": len(titles),
+        "node_rows": np.asarray(node_rows, dtype=np.int64),
+        "row_refs": np.asarray(row_refs, dtype=np.int64),
+        "offsets": offsets.astype(np.int64),
+        "neighbors": targets[order].astype(np.int32),
+        "scores": scores[order].astype(np.uint8)
+    }
+
+
+def _check_graph_threshold(graph, threshold):
+    if not graph["floor"] <= threshold <= 100:
+        raise ValueError(f"Threshold {threshold} is outside the graph's range [{graph['floor']}, 100]")
+
+
+def _node_adjacency(graph):
+    """Neighbour lists of every node as Python lists of (node, score); faster to walk than array slices."""
+    offsets = graph["offsets"].tolist()
+    pairs = list(zip(graph["neighbors"].tolist(), graph["scores"].tolist()))
+    return [pairs[offsets[n]:offsets[n + 1]] for n in range(len(offsets) - 1)]
+
+
+def graph_dedup(graph, threshold):
+    """
+    Greedy "first wins" dedup from a similarity graph: the same keep mask
+    as greedy_dedup(titles, threshold, keys=keys) over the rows the graph
+    was built from, in one pass over its edges. Returns (keep, blockers).
+    """
+    _check_graph_threshold(graph, threshold)
+    node_keep = []
+    node_blockers = []
+    for pairs in _node_adjacency(graph):
+        blocker = -1
+        for j, score in pairs:
+            if score >= threshold and node_keep[j]:
+                blocker = j
+                break
+        node_keep.append(blocker < 0)
+        node_blockers.append(blocker)
+
+    node_rows = graph["node_rows"].tolist()
+    keep = [False] * graph["rows"]
+    blockers = [-1] * graph["rows"]
+    for node, pos in enumerate(node_rows):
+        keep[pos] = node_keep[node]
+        if node_blockers[node] >= 0:
+            blockers[pos] = node_rows[node_blockers[node]]
+    for pos, ref in enumerate(graph["row_refs"].tolist()):
+        if ref >= 0:
+            blockers[pos] = ref if keep[ref] else blockers[ref]
+    return keep, blockers
+
+
+def keep_counts(graph, thresholds):
+    """
+    How many rows the greedy dedup keeps at each of `thresholds`
+    (all within [floor, 100]), from one pass over the graph: every node
+    carries a bitmask of the thresholds it is kept at.
+    Returns {threshold: rows kept}.
+    """
+    thresholds = sorted(set(thresholds))
+    for t in thresholds:
+        _check_graph_threshold(graph, t)
+    full = (1 << len(thresholds)) - 1
+    # at_least[score]: bits of the thresholds a pair with this score reaches
+    at_least = [sum(1 << k for k, t in enumerate(thresholds) if t <= score) for score in range(101)]
+
+    kept = []
+    for pairs in _node_adjacency(graph):
+        blocked = 0
+        for j, score in pairs:
+            blocked |= kept[j] & at_least[score]
+        kept.append(full & ~blocked)
+
+    counts = dict.fromkeys(thresholds, 0)
+    for mask, n in Counter(kept).items():
+        for k, t in enumerate(thresholds):
+            if mask >> k & 1:
+                counts[t] += n
+    return counts
@@ -0,0 +1,200 @@
+import json
+import threading
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from ..const.const import CLEANUP_OUTPUT_FORMAT, CLEANUP_STREAMING, JOB_MAX_RUNNING
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class Job:
+    """
+    One background scrape or cleanup run. Its fields are only changed by the
+    worker thread; readers use `snapshot()` to get a consistent copy.
+    """
+
+    def __init__(self, kind, key, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key
+        self.label = label
+        self.status = "queued"
+        self.created_at = str(datetime.now())
+        self.finished_at = None
+        self.progress = {}  # location name -> latest progress event
+        self.messages = deque(maxlen=50)
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def on_progress(self, event):
+        with self._lock:
+            self.progress[event["location_name"]] = event
+
+    def log(self, message):
+        with self._lock:
+            self.messages.append(message)
+
+    def snapshot(self):
+        """Plain dict copy of the job's state, safe to read from any thread."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "label": self.label,
+                "status": self.status,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "progress": dict(self.progress),
+                "messages": list(self.messages),
+                "result": self.result,
+                "error": self.error,
+                "cancel_requested": self.cancel_event.is_set()
+            }
+
+    def _set(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+
+class JobRunner:
+    """
+    Runs scrape and cleanup jobs on a thread pool that lives as long as the
+    process, not as long as one Streamlit script run. A rerun or browser
+    refresh only polls the jobs; submitting the same work while it is still
+    queued or running returns the existing job instead of starting it twice.
+    """
+
+    def __init__(self, max_running=JOB_MAX_RUNNING):
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="ikman-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, key, label, fn):
+        """
+        Queue `fn(job)` unless a job with the same key is still active.
+        Returns the job id.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.status in ACTIVE_STATUSES:
+                    return job.id
+            job = Job(kind, key, label)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn)
+        return job.id
+
+    def _run(self, job, fn):
+        if job.cancel_event.is_set():
+            job._set(status="cancelled", finished_at=str(datetime.now()))
+            return
+        job._set(status="running")
+        try:
+            result = fn(job)
+        except Exception as e:
+            job.log(traceback.format_exc())
+            job._set(status="failed", error=str(e), finished_at=str(datetime.now()))
+            return
+        status = "cancelled" if job.cancel_event.is_set() else "done"
+        job._set(status=status, result=result, finished_at=str(datetime.now()))
+
+    def status(self, job_id):
+        """Snapshot of one job, or None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def list_jobs(self, active_only=False):
+        """Snapshots of all jobs, newest first."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        snapshots = [j.snapshot() for j in reversed(jobs)]
+        if active_only:
+            snapshots = [s for s in snapshots if s["status"] in ACTIVE_STATUSES]
+        return snapshots
+
+    def cancel(self, job_id):
+        """Ask a job to stop; a running scrape stops after its current pages."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel_event.set()
+        return True
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Return the process-wide job runner, creating it on first use."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+
+def submit_scrape_job(locations, filters=None):
+    """Scrape `locations` with `filters` in the background and record the run in the history."""
+    key = "scrape:" + ",".join(str(i) for i in sorted(loc["id"] for loc in locations))
+    if filters is not None:
+        key += ":" + json.dumps(filters, sort_keys=True)
+    label = "Scrape " + ", ".join(loc["name"] for loc in locations)
+
+    def run(job):
+        # Imported by the first job, so polling the runner never loads the scraper
+        from .orchestrator_service import scrape_locations
+        from .scrape_service import record_scrape_summary
+
+        for loc in locations:
+            job.on_progress({
+                "location_name": loc["name"], "status": "queued",
+                "page": 0, "total_pages": 0, "ads_scraped": 0
+            })
+        summaries = scrape_locations(
+            locations, on_progress=job.on_progress, cancel_event=job.cancel_event, filters=filters
+        )
+        record_scrape_summary(summaries)
+        return summaries
+
+    return get_job_runner().submit("scrape", key, label, run)
+
+
+def submit_cleanup_job(start_date, end_date, threshold, streaming=CLEANUP_STREAMING,
+                       output_format=CLEANUP_OUTPUT_FORMAT, save_graph=False):
+    """Run `cleanup_duplicates` in the background. It can only be cancelled before it starts."""
+    key = f"cleanup:{start_date}:{end_date}:{threshold}:{streaming}:{output_format}:{save_graph}"
+    label = f"Cleanup {start_date} to {end_date} ({output_format})"
+
+    def run(job):
+        # pandas and the fuzzy matchers are only loaded once a cleanup actually runs
+        from .cleanup_service import cleanup_duplicates
+
+        return cleanup_duplicates(
+            start_date, end_date, threshold, streaming=streaming, output_format=output_format,
+            save_graph=save_graph
+        )
+
+    return get_job_runner().submit("cleanup", key, label, run)
+
+
+def job_status(job_id):
+    """Snapshot of one job for polling, or None."""
+    return get_job_runner().status(job_id)
+
+
+def list_jobs(active_only=False):
+    """Snapshots of every job, newest first."""
+    return get_job_runner().list_jobs(active_only=active_only)
+
+
+def cancel_job(job_id):
+    """Request cancellation of a job."""
+    return get_job_runner().cancel(job_id)
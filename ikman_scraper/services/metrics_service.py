@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from ..const.const import METRICS_ENABLED, METRICS_FORMAT
+from ..data.data_access import METRICS_FILES
+
+METRIC_FORMATS = ("prometheus", "json")
+
+# Help text for the Prometheus export; metrics without an entry are still exported
+METRIC_HELP = {
+    "scrape_request_seconds": "Time spent on one serp request (network or cache)",
+    "scrape_response_bytes_total": "Bytes of serp response bodies received",
+    "scrape_json_decode_seconds": "Time spent decoding serp JSON",
+    "scrape_requests_failed_total": "Serp requests that returned no usable page",
+    "scrape_cache_hits_total": "Serp pages served from the response cache",
+    "scrape_ads_parsed_total": "Ads found on serp pages",
+    "scrape_ads_filtered_total": "Ads left out by the title keyword filter",
+    "scrape_ads_known_total": "Ads dropped because they were already stored today",
+    "scrape_ads_stored_total": "Ads appended to the raw store",
+    "storage_write_seconds": "Time spent appending one page of ads to the raw store",
+    "storage_export_seconds": "Time spent exporting raw Excel files after a run",
+    "cleanup_load_seconds": "Time spent reading and merging raw files for cleanup",
+    "cleanup_normalize_seconds": "Time spent normalizing titles",
+    "cleanup_dedup_seconds": "Time spent on fuzzy deduplication",
+    "cleanup_write_seconds": "Time spent writing the cleaned file, by output format",
+    "cleanup_written_bytes_total": "Bytes of cleaned files written, by output format",
+    "cleanup_store_seconds": "Time spent loading the cleaned rows into the indexed store",
+    "cleanup_graph_seconds": "Time spent scoring title pairs for the similarity graph",
+    "cleanup_rows_in_total": "Rows read by cleanup",
+    "cleanup_rows_out_total": "Rows left after cleanup",
+    "dedup_comparisons_total": "Title pairs scored by the fuzzy matcher",
+    "dedup_exact_matches_total": "Rows dropped by an exact ad URL match before fuzzy scoring",
+}
+
+
+class _Timer:
+    """Context manager that records its wall time into a registry."""
+
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class _NullTimer:
+    """Stand-in returned by `timer()` while metrics are off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    In-process counters and timings for the scrape and cleanup hot paths.
+      - Counters only go up: inc("scrape_ads_parsed_total", 25)
+      - Observations keep count / sum / max: observe("storage_write_seconds", 0.01)
+      - Labels are keyword arguments: inc("...", 1, reason="status")
+    Every method returns right away while `enabled` is False, so the
+    instrumentation costs one attribute check when metrics are off.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = str(datetime.now())
+        self._counters = {}  # (name, labels) -> value
+        self._summaries = {}  # (name, labels) -> [count, sum, max]
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                if value > summary[2]:
+                    summary[2] = value
+
+    def timer(self, name, **labels):
+        """`with metrics.timer("cleanup_dedup_seconds"):` records the block's wall time."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+            self.started_at = str(datetime.now())
+
+    def snapshot(self):
+        """
+        Plain dict copy of every metric:
+          {"started_at", "counters": [{"name", "labels", "value"}],
+           "summaries": [{"name", "labels", "count", "sum", "max", "mean"}]}
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted((k, list(v)) for k, v in self._summaries.items())
+        return {
+            "started_at": self.started_at,
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ],
+            "summaries": [
+                {"name": name, "labels": dict(labels), "count": count, "sum": total, "max": peak,
+                 "mean": total / count if count else 0.0}
+                for (name, labels), (count, total, peak) in summaries
+            ]
+        }
+
+
+def _prometheus_labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def to_prometheus(snapshot):
+    """Render a snapshot in the Prometheus text exposition format."""
+    lines = []
+    announced = set()
+
+    def announce(name, kind):
+        if name not in announced:
+            announced.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP ikman_{name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE ikman_{name} {kind}")
+
+    for c in snapshot["counters"]:
+        announce(c["name"], "counter")
+        lines.append(f"ikman_{c['name']}{_prometheus_labels(c['labels'])} {c['value']}")
+    for s in snapshot["summaries"]:
+        announce(s["name"], "summary")
+        name = f"ikman_{s['name']}"
+        lines.append(f"{name}_count{_prometheus_labels(s['labels'])} {s['count']}")
+        lines.append(f"{name}_sum{_prometheus_labels(s['labels'])} {s['sum']:.6f}")
+        lines.append(f"{name}{_prometheus_labels(s['labels'], quantile='1')} {s['max']:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry, creating it on first use."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
+
+
+def export_metrics(fmt=METRICS_FORMAT, path=None):
+    """
+    Write the current metrics to data/metrics.prom ("prometheus") or
+    data/metrics.json ("json"). Returns the path, or None while metrics are off.
+    The file is replaced atomically so a collector never reads half of it.
+    """
+    if fmt not in METRIC_FORMATS:
+        raise ValueError(f"Unknown metrics format: {fmt}")
+    metrics = get_metrics()
+    if not metrics.enabled:
+        return None
+
+    snapshot = metrics.snapshot()
+    text = to_prometheus(snapshot) if fmt == "prometheus" else json.dumps(snapshot, indent=4)
+    path = path or METRICS_FILES[fmt]
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,132 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from ..const.const import SCRAPE_CACHE_MODE, SCRAPE_MAX_LOCATIONS, SCRAPE_MAX_WORKERS
+from ..data.data_access import export_pending_raw_excel, finish_scrape_run, load_checkpoints, start_scrape_run
+from .metrics_service import export_metrics, get_metrics
+from .scrape_service import create_session, scrape_location
+
+
+def error_message(e):
+    """Text of an exception for summaries and logs; the class name when it has no message."""
+    return str(e) or type(e).__name__
+
+
+def scrape_locations(locations, on_progress=None, max_locations=SCRAPE_MAX_LOCATIONS,
+                     max_workers=SCRAPE_MAX_WORKERS, cache_mode=SCRAPE_CACHE_MODE, cancel_event=None,
+                     run_id=None, filters=None):
+    """
+    Scrape several locations at once:
+      - At most `max_locations` locations run at the same time
+      - Every location fetches up to `max_workers` pages in parallel
+      - All of them share one pooled HTTP session
+      - Serp responses go through the response cache per `cache_mode`
+      - Export the day's raw Excel file once every location is done,
+        then the metrics file (see metrics_service.export_metrics)
+      - Search with `filters` (default SCRAPE_FILTERS)
+      - Checkpoint every page under one run id (see data_access.start_scrape_run);
+        pass the `run_id` of an unfinished run to resume it
+      - Return the summary dicts in the same order as `locations`,
+        each with the "run_id"; a location that raised gets an empty
+        summary with the "error"
+
+    `on_progress(event)` receives a dict for every step:
+      {"location_name", "status", "page", "total_pages", "ads_scraped"}
+    where status is "started", "page", "done", "failed" or "cancelled";
+    a "failed" event also has the "error".
+    The callback always runs in the calling thread (Streamlit elements
+    can only be updated from the script thread).
+    Setting `cancel_event` (a threading.Event) stops running locations after
+    their current page and skips the ones not started yet.
+    """
+    if not locations:
+        return []
+
+    events = queue.Queue()
+    run_id = start_scrape_run(locations, run_id, filters)
+
+    def emit(loc, status, page=0, total_pages=0, ads_scraped=0, error=None):
+        event = {
+            "location_name": loc["name"],
+            "status": status,
+            "page": page,
+            "total_pages": total_pages,
+            "ads_scraped": ads_scraped
+        }
+        if error is not None:
+            event["error"] = error
+        events.put(event)
+
+    def run(loc):
+        if cancel_event is not None and cancel_event.is_set():
+            emit(loc, "cancelled")
+            return None
+        emit(loc, "started")
+        try:
+            summary = scrape_location(
+                loc,
+                max_workers=max_workers,
+                session=session,
+                cache_mode=cache_mode,
+                cancel_event=cancel_event,
+                run_id=run_id,
+                filters=filters,
+                progress_callback=lambda page, total, ads: emit(loc, "page", page, total, ads)
+            )
+        except Exception as e:
+            emit(loc, "failed", error=error_message(e))
+            raise
+        emit(loc, "done", summary["pages_scraped"], summary["pages_scraped"], summary["ads_scraped"])
+        return summary
+
+    session = create_session(max_locations * max_workers)
+    status = "failed"
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_locations)) as executor:
+            futures = [executor.submit(run, loc) for loc in locations]
+
+            # Relay progress events until every location has finished
+            while True:
+                all_done = all(f.done() for f in futures)
+                try:
+                    event = events.get(timeout=0.1)
+                except queue.Empty:
+                    if all_done:
+                        break
+                    continue
+                if on_progress is not None:
+                    on_progress(event)
+
+            summaries = []
+            for loc, future in zip(locations, futures):
+                if future.exception() is None and future.result() is not None:
+                    summaries.append(future.result())
+                    continue
+                summary = {
+                    "location_name": loc["name"],
+                    "excel_file": None,
+                    "ads_scraped": 0,
+                    "pages_scraped": 0,
+                    "failed_pages": []
+                }
+                if future.exception() is not None:
+                    summary["error"] = error_message(future.exception())
+                summaries.append(summary)
+            for summary in summaries:
+                summary["run_id"] = run_id
+
+            # A location whose first page failed, or with failed pages left, never reaches "done"
+            # and is retried on resume
+            done = {c["location_slug"] for c in load_checkpoints(run_id) if c["status"] == "done"}
+            if cancel_event is not None and cancel_event.is_set():
+                status = "cancelled"
+            elif all(loc["slug"] in done for loc in locations):
+                status = "done"
+    finally:
+        # "failed" and "cancelled" runs can be resumed from their checkpoints
+        finish_scrape_run(run_id, status)
+        session.close()
+        with get_metrics().timer("storage_export_seconds"):
+            export_pending_raw_excel()
+        export_metrics()
+
+    return summaries
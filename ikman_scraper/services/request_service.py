@@ -0,0 +1,215 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from ..const.const import (
+    SCRAPE_BACKOFF_BASE, SCRAPE_BACKOFF_MAX, SCRAPE_HOST_RATE_LIMITS, SCRAPE_INITIAL_CONCURRENCY,
+    SCRAPE_MAX_CONCURRENCY, SCRAPE_MAX_RETRIES, SCRAPE_REQUEST_TIMEOUT
+)
+from .metrics_service import get_metrics
+
+# Answers that mean "slow down and try again"; anything else is final
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# A 200 slower than this many times the best latency seen counts as congestion
+LATENCY_TOLERANCE = 3.0
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average and bursts of up to `burst`.
+    `pause(seconds)` empties the bucket for a while (used for Retry-After).
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+class AimdLimiter:
+    """
+    Concurrency cap that adapts like TCP congestion control:
+      - Additive increase: every fast 200 adds 1 / limit, so the cap grows
+        by about one request per "round" of `limit` requests
+      - Multiplicative decrease: 429/5xx/timeouts halve the cap, a 200 slower
+        than LATENCY_TOLERANCE x the best latency seen takes 10% off
+    At most one decrease per round trip, so a burst of failures from the
+    same window of requests only counts once.
+    """
+
+    def __init__(self, initial=SCRAPE_INITIAL_CONCURRENCY, min_limit=1, max_limit=SCRAPE_MAX_CONCURRENCY):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self.best_latency = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency):
+        with self._cond:
+            if self.best_latency is None or latency < self.best_latency:
+                self.best_latency = latency
+            if latency > self.best_latency * LATENCY_TOLERANCE:
+                self._decrease(0.9, latency)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def on_congestion(self, latency=None):
+        with self._cond:
+            self._decrease(0.5, latency)
+
+    def _decrease(self, factor, latency):
+        now = time.monotonic()
+        if now - self._last_decrease < (latency or self.best_latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RequestController:
+    """
+    Sends the GET requests of one host:
+      - The host's token bucket (SCRAPE_HOST_RATE_LIMITS) spaces requests out
+      - The AIMD limiter caps how many run at the same time
+      - 429/5xx answers and network errors are retried up to `max_retries`
+        times, waiting Retry-After when the server sends it and an
+        exponential backoff with full jitter otherwise
+    """
+
+    def __init__(self, rate_limit=None, max_retries=SCRAPE_MAX_RETRIES, backoff_base=SCRAPE_BACKOFF_BASE,
+                 backoff_max=SCRAPE_BACKOFF_MAX, timeout=SCRAPE_REQUEST_TIMEOUT):
+        self.bucket = TokenBucket(*rate_limit) if rate_limit else None
+        self.limiter = AimdLimiter()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, session, url, cancel_event=None):
+        """
+        GET `url` through the controller. Returns the final response
+        (200 or a status not worth retrying), or None when every attempt
+        failed. Gives up early if `cancel_event` is set while waiting.
+        """
+        metrics = get_metrics()
+        for attempt in range(self.max_retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            self.limiter.acquire()
+            started = time.perf_counter()
+            resp = None
+            try:
+                resp = session.get(url, timeout=self.timeout)
+            except requests.RequestException:
+                pass
+            finally:
+                latency = time.perf_counter() - started
+                self.limiter.release()
+                metrics.observe("scrape_request_seconds", latency, source="network")
+
+            if resp is not None and resp.status_code not in RETRY_STATUSES:
+                if resp.status_code == 200:
+                    self.limiter.on_success(latency)
+                return resp
+
+            self.limiter.on_congestion(latency)
+            reason = "error" if resp is None else str(resp.status_code)
+            if attempt == self.max_retries:
+                metrics.inc("scrape_requests_failed_total", reason=reason)
+                return resp
+
+            wait = retry_after_seconds(resp.headers.get("Retry-After")) if resp is not None else None
+            if wait is not None:
+                wait = min(wait, self.backoff_max)
+                if self.bucket is not None:
+                    # Retry-After is about the whole host, not just this request
+                    self.bucket.pause(wait)
+            else:
+                wait = self.backoff(attempt)
+            metrics.inc("scrape_retries_total", reason=reason)
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return resp
+            else:
+                time.sleep(wait)
+        return None
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_request_controller(url):
+    """Return the process-wide controller for the host of `url`, creating it on first use."""
+    host = urlparse(url).hostname or ""
+    with _controllers_lock:
+        controller = _controllers.get(host)
+        if controller is None:
+            rate_limit = SCRAPE_HOST_RATE_LIMITS.get(host)
+            if rate_limit is None and host.startswith("www."):
+                rate_limit = SCRAPE_HOST_RATE_LIMITS.get(host[4:])
+            controller = RequestController(rate_limit=rate_limit)
+            _controllers[host] = controller
+        return controller
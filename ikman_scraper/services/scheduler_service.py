@@ -0,0 +1,211 @@
+import os
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from ..data.data_access import (
+    SCRAPE_LOCK_FILE, append_run_summary, list_scrape_runs, load_scrape_run, mark_export_pending
+)
+from .orchestrator_service import scrape_locations
+from .scrape_service import record_scrape_summary
+
+
+class LockHeld(Exception):
+    """Another scrape already holds the lock file."""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+@contextmanager
+def scrape_lock(path=SCRAPE_LOCK_FILE):
+    """
+    Hold an exclusive lock file for the duration of a run.
+    The file holds the owner's pid; a lock left behind by a dead process is
+    taken over. Raises LockHeld if a live process owns it.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                with open(path, "r") as f:
+                    pid = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                pid = 0
+            if pid and _pid_alive(pid):
+                raise LockHeld(f"Scrape already running (pid {pid}, lock {path})")
+            # Stale lock from a crashed run
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    else:
+        raise LockHeld(f"Could not acquire lock {path}")
+
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def run_scrape_batch(locations, log=None, summary_file=None, run_id=None, **scrape_kwargs):
+    """
+    Scrape one batch of locations under the lock, record it in the history
+    and append a JSON run summary. Returns the run summary dict; locations
+    that raised are listed with their error under "failed_locations".
+    Pass the `run_id` of an unfinished run to resume it from its checkpoints.
+    """
+    started = datetime.now()
+
+    def on_progress(event):
+        if log is None or event["status"] == "page":
+            return
+        if "error" in event:
+            log(f"{event['location_name']}: {event['status']}: {event['error']}")
+        else:
+            log(f"{event['location_name']}: {event['status']} ({event['ads_scraped']} ads)")
+
+    with scrape_lock():
+        summaries = scrape_locations(locations, on_progress=on_progress, run_id=run_id, **scrape_kwargs)
+        record_scrape_summary(summaries)
+
+    finished = datetime.now()
+    run_summary = {
+        "kind": "scrape",
+        "run_id": summaries[0]["run_id"] if summaries else run_id,
+        "started_at": started.isoformat(timespec="seconds"),
+        "finished_at": finished.isoformat(timespec="seconds"),
+        "duration_seconds": round((finished - started).total_seconds(), 3),
+        "locations": summaries,
+        "total_ads_scraped": sum(s["ads_scraped"] for s in summaries),
+        "total_pages_scraped": sum(s["pages_scraped"] for s in summaries),
+        "failed_locations": {s["location_name"]: s["error"] for s in summaries if "error" in s}
+    }
+    append_run_summary(run_summary, summary_file)
+    return run_summary
+
+
+def resumable_runs(limit=20):
+    """
+    Runs that stopped before finishing, latest first: cancelled, failed, or
+    still marked running although their process is gone (crashed).
+    """
+    runs = list_scrape_runs(statuses=("running", "failed", "cancelled"), limit=limit)
+    return [r for r in runs if not (r["status"] == "running" and r["pid"] and _pid_alive(r["pid"]))]
+
+
+def resume_scrape_batch(run_id=None, log=None, summary_file=None, **scrape_kwargs):
+    """
+    Continue an unfinished run (the latest resumable one if `run_id` is None)
+    from the page after each location's last committed page.
+    Returns the run summary dict, or None if there is nothing to resume.
+    """
+    if run_id is None:
+        runs = resumable_runs(limit=1)
+        if not runs:
+            return None
+        run = runs[0]
+    else:
+        run = load_scrape_run(run_id)
+        if run is None:
+            raise KeyError(f"Unknown run: {run_id}")
+        if run["status"] == "done":
+            return None
+
+    # A crashed run never exported its raw Excel files
+    day = datetime.strptime(run["started_at"][:10], "%Y-%m-%d").date()
+    dates = []
+    while day <= datetime.now().date():
+        dates.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+    mark_export_pending(dates)
+
+    if log is not None:
+        log(f"Resuming run {run['run_id']} started {run['started_at']} ({run['status']})")
+    # Same search as the interrupted run
+    scrape_kwargs["filters"] = run["filters"]
+    return run_scrape_batch(run["locations"], log=log, summary_file=summary_file, run_id=run["run_id"],
+                            **scrape_kwargs)
+
+
+def next_run_time(now, every, at=None):
+    """
+    When the next scheduled run starts: at `at` (a datetime.time) on the
+    first matching slot after `now`, or simply `now` when `at` is None.
+    """
+    if at is None:
+        return now
+    candidate = now.replace(hour=at.hour, minute=at.minute, second=0, microsecond=0)
+    while candidate < now:
+        candidate += every
+    return candidate
+
+
+def run_schedule(batches, every, at=None, runs=None, log=None, on_summary=None, summary_file=None,
+                 **scrape_kwargs):
+    """
+    Run every batch of locations once per `every` (a timedelta), starting
+    at `at` if given. A batch that finds the lock held is skipped and
+    reported instead of overlapping with the running scrape; a batch that
+    fails (e.g. "database is locked") is logged and reported as failed, and
+    the schedule goes on. Its run can be resumed later.
+    Stops after `runs` rounds (None = forever).
+    """
+    next_at = next_run_time(datetime.now(), every, at)
+    done = 0
+    while runs is None or done < runs:
+        wait = (next_at - datetime.now()).total_seconds()
+        if wait > 0:
+            if log is not None:
+                log(f"Next run at {next_at.isoformat(timespec='seconds')}")
+            time.sleep(wait)
+
+        for batch in batches:
+            try:
+                summary = run_scrape_batch(batch, log=log, summary_file=summary_file, **scrape_kwargs)
+            except LockHeld as e:
+                summary = {
+                    "kind": "scrape",
+                    "skipped": True,
+                    "reason": str(e),
+                    "locations": [loc["name"] for loc in batch],
+                    "started_at": datetime.now().isoformat(timespec="seconds")
+                }
+                append_run_summary(summary, summary_file)
+            except Exception as e:
+                if log is not None:
+                    log(f"Batch {', '.join(loc['name'] for loc in batch)} failed: {e!r}\n{traceback.format_exc()}")
+                summary = {
+                    "kind": "scrape",
+                    "failed": True,
+                    "reason": repr(e),
+                    "locations": [loc["name"] for loc in batch],
+                    "started_at": datetime.now().isoformat(timespec="seconds")
+                }
+                append_run_summary(summary, summary_file)
+            if on_summary is not None:
+                on_summary(summary)
+
+        done += 1
+        next_at += every
+        # Don't try to catch up on slots missed by a long run
+        while next_at < datetime.now():
+            next_at += every
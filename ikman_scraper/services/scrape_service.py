@@ -1,43 +1,82 @@
+import json
+import math
+import re
+import threading
 import requests
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from ..data.data_access import append_to_excel, add_history_record
+from functools import lru_cache, partial
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from ..const.const import (
+    IKMAN_BASE_URL, SCRAPE_BAND_MAX_PAGES, SCRAPE_BAND_MIN_WIDTH, SCRAPE_CACHE_MODE, SCRAPE_FILTERS,
+    SCRAPE_MAX_WORKERS, SCRAPE_STOP_AFTER_KNOWN_PAGES
+)
+from ..data.data_access import (
+    append_raw_records, add_history_record, commit_raw_page, load_checkpoints, lookup_seen_slugs,
+    open_checkpoint, set_checkpoint_status
+)
+from ..data.response_cache import get_response_cache
+from ..domain.ad import AdBatch, clean_price  # noqa: F401 (clean_price is re-exported)
+from ..domain.location import Location
+from .metrics_service import get_metrics
+from .request_service import RETRY_STATUSES, get_request_controller
 
+CACHE_MODES = ("off", "on", "replay")
 
-# If you have these helpers in a different module, adjust imports accordingly.
-# e.g. from ..services.helpers import clean_price, construct_api_url, get_pagination_info
+# Ads whose title contains one of these (case-insensitive) are not houses we want
+SKIP_KEYWORDS = ("Single", "තනි තට්ටු", "තනිමහල්", "තනිමහළේ")
 
-def clean_price(price_str: str) -> int:
+
+def build_filter_json(filters=None, price_band=None):
     """
-    Remove 'Rs', commas, extra spaces, then convert to integer.
-    e.g. "Rs 19,500,000" -> 19500000
+    Encode search filters (see SCRAPE_FILTERS) as the serp `filter_json` value:
+      [{"type":"money","key":"price","minimum":..,"maximum":..},
+       {"type":"enum","key":"bedrooms","values":["3","4","5"]}, ...]
+    `price_band` = (minimum, maximum) replaces the price bounds of `filters`.
+    Returns "" when nothing is filtered.
     """
-    if not price_str:
-        return 0
-    p = price_str.replace("Rs", "").replace(",", "").strip()
-    try:
-        return int(p)
-    except ValueError:
-        return 0
+    filters = SCRAPE_FILTERS if filters is None else filters
+    if price_band is None:
+        price_band = (filters.get("price_min"), filters.get("price_max"))
+    price_min, price_max = price_band
+
+    items = []
+    money = {"type": "money", "key": "price"}
+    if price_min:
+        money["minimum"] = int(price_min)
+    if price_max is not None:
+        money["maximum"] = int(price_max)
+    if len(money) > 2:
+        items.append(money)
+    for key in ("bedrooms", "bathrooms"):
+        if filters.get(key):
+            items.append({"type": "enum", "key": key, "values": [str(v) for v in filters[key]]})
+    if not items:
+        return ""
+    return quote(json.dumps(items, separators=(",", ":")), safe="[]:,")
 
 
-def construct_api_url(location_id, location_slug, page):
+def construct_api_url(location_id, location_slug, page, filters=None, price_band=None):
     """
     Build the API URL for the given location and page number.
-    Adjust the filter_json as needed based on your requirements.
+    `filters` default to SCRAPE_FILTERS; `price_band` narrows the price
+    range to one band of a sharded search (see plan_price_bands).
     """
-    return (
-        "https://ikman.lk/data/serp?top_ads=2&spotlights=5&sort=date&order=desc"
+    url = (
+        f"{IKMAN_BASE_URL}/data/serp?top_ads=2&spotlights=5&sort=date&order=desc"
         "&buy_now=0&urgent=0"
         "&categorySlug=houses-for-sale"
         f"&locationSlug={location_slug}"
         "&category=415"
         f"&location={location_id}"
         f"&page={page}"
-        "&filter_json=[%7B%22type%22:%22money%22,%22key%22:%22price%22,"
-        "%22maximum%22:25000000%7D,%7B%22type%22:%22enum%22,%22key%22:%22bedrooms%22,"
-        "%22values%22:[%223%22,%224%22,%225%22]%7D,%7B%22type%22:%22enum%22,"
-        "%22key%22:%22bathrooms%22,%22values%22:[%222%22]%7D]"
     )
+    filter_json = build_filter_json(filters, price_band)
+    if filter_json:
+        url += f"&filter_json={filter_json}"
+    return url
 
 
 def get_pagination_info(json_data) -> int:
@@ -48,127 +87,555 @@ def get_pagination_info(json_data) -> int:
          "pageSize": 25,
          ...
       }
-    If total=838, pageSize=25 => 838 // 25 = 33 pages
+    If total=838, pageSize=25 => 34 pages (the last one holds 13 ads)
     """
     pagination = json_data.get("paginationData", {})
     total = pagination.get("total", 0)
     page_size = pagination.get("pageSize", 1)
     if page_size == 0:
         return 0
-    return total // page_size
+    # Round up: flooring dropped the ads of the last, partly filled page,
+    # once per price band when a search is sharded
+    return -(-total // page_size)
 
 
-def scrape_location(location_dict, log_area):
+def create_session(pool_size=SCRAPE_MAX_WORKERS):
+    """
+    Create a keep-alive HTTP session whose connection pool can serve
+    `pool_size` requests at the same time, so parallel page fetches
+    reuse connections instead of opening a new one per page.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_page(session, url, cache_mode=SCRAPE_CACHE_MODE, cancel_event=None):
+    """
+    GET one serp page and return its JSON, or None if the page could not be fetched.
+    Network requests go through the host's RequestController (rate limit,
+    adaptive concurrency, retries with backoff); `cancel_event` cuts a
+    retry wait short.
+    cache_mode:
+      - "off": always hit ikman.lk
+      - "on": serve a fresh cached response if there is one, cache new ones
+      - "replay": serve only from the cache; a miss counts as a failed page
+    """
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode: {cache_mode}")
+    metrics = get_metrics()
+
+    if cache_mode != "off":
+        # Replay must be deterministic, so it also serves expired entries
+        with metrics.timer("scrape_request_seconds", source="cache"):
+            cached = get_response_cache().get(url, fresh_only=cache_mode == "on")
+        if cached is not None:
+            metrics.inc("scrape_cache_hits_total")
+            return cached
+        if cache_mode == "replay":
+            metrics.inc("scrape_requests_failed_total", reason="cache_miss")
+            return None
+
+    resp = get_request_controller(url).get(session, url, cancel_event=cancel_event)
+    if resp is None:
+        return None
+    metrics.inc("scrape_response_bytes_total", len(resp.content))
+    if resp.status_code != 200:
+        if resp.status_code not in RETRY_STATUSES:
+            metrics.inc("scrape_requests_failed_total", reason=str(resp.status_code))
+        return None
+
+    try:
+        with metrics.timer("scrape_json_decode_seconds"):
+            data = resp.json()
+    except ValueError:
+        metrics.inc("scrape_requests_failed_total", reason="json")
+        return None
+    if cache_mode == "on":
+        get_response_cache().put(url, data)
+    return data
+
+
+@lru_cache(maxsize=32)
+def compile_skip_matcher(skip_keywords):
+    """
+    One compiled pattern matching any of `skip_keywords` (a tuple), to be
+    searched in a lower-cased title. Gives the same answer as
+    `any(k.lower() in title.lower() for k in skip_keywords)`.
+    Returns None for an empty tuple (nothing is skipped).
+    """
+    if not skip_keywords:
+        return None
+    keywords = sorted({k.lower() for k in skip_keywords})
+    return re.compile("|".join(re.escape(k) for k in keywords))
+
+
+def fetch_pages(fetch, pages, window, prefetched=None):
+    """
+    Fetch stage of the scrape pipeline: yield (page, JSON or None) for every
+    page number of `pages`, in that order.
+    `fetch(page)` returns a page's JSON (None if it failed); `prefetched`
+    maps pages that were fetched already (e.g. by the planner) to their JSON.
+    Pages are fetched on a pool of `window` threads, but a page is only
+    submitted when the consumer asks for the next one, so at most `window`
+    responses are buffered however many pages there are. Closing the
+    generator drops the pages still queued instead of downloading them.
+    """
+    prefetched = dict(prefetched or {})
+    pending = iter(pages)
+    executor = ThreadPoolExecutor(max_workers=window)
+    in_flight = deque()
+
+    def submit(page):
+        if page in prefetched:
+            future = Future()
+            future.set_result(prefetched.pop(page))
+        else:
+            future = executor.submit(fetch, page)
+        in_flight.append((page, future))
+
+    try:
+        while True:
+            if not in_flight:
+                page = next(pending, None)
+                if page is None:
+                    return
+                if page in prefetched:
+                    # Hand it over before fetching ahead, so stopping here costs nothing
+                    yield page, prefetched.pop(page)
+                    continue
+                submit(page)
+            while len(in_flight) < window:
+                page = next(pending, None)
+                if page is None:
+                    break
+                submit(page)
+            page, future = in_flight.popleft()
+            yield page, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def decode_pages(pages, location_slug):
+    """
+    Decode stage: turn each page's JSON into an AdBatch of its 'ads'
+    (prices cleaned, "Date" = today so you can identify the scrape day).
+    A failed page (None) is passed on as None.
+    """
+    metrics = get_metrics()
+    for page, data in pages:
+        if data is None:
+            yield page, None
+            continue
+        ads = data.get("ads", [])
+        metrics.inc("scrape_ads_parsed_total", len(ads))
+        yield page, AdBatch.from_serp(ads, location_slug, datetime.now().strftime("%Y-%m-%d"), page)
+
+
+def filter_pages(pages, skip_keywords=SKIP_KEYWORDS):
+    """Filter stage: drop ads whose title contains one of `skip_keywords` (case-insensitive)."""
+    skip_matcher = compile_skip_matcher(tuple(skip_keywords))
+    metrics = get_metrics()
+    for page, batch in pages:
+        if batch is not None and skip_matcher is not None:
+            kept = batch.keep(skip_matcher.search(title.lower()) is None for title in batch.title)
+            metrics.inc("scrape_ads_filtered_total", len(batch) - len(kept))
+            batch = kept
+        yield page, batch
+
+
+def dedup_pages(pages, location_slug, claimed_slugs=None, lock=None):
+    """
+    Transform stage: look up the page's slugs among the ads scraped before,
+    set `batch.known` (True when every ad was scraped before, None for a
+    page without ads), then drop exact duplicates: ads already stored today
+    (earlier run or page) or already in `claimed_slugs` (taken by another
+    band of this location). Kept slugs are added to `claimed_slugs` under `lock`.
+    """
+    claimed_slugs = set() if claimed_slugs is None else claimed_slugs
+    lock = threading.Lock() if lock is None else lock
+    metrics = get_metrics()
+    for page, batch in pages:
+        if batch is None:
+            yield page, None
+            continue
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        seen = lookup_seen_slugs(location_slug, batch.slug)
+        # Pages without any kept ad neither extend nor break a run of known pages
+        if len(batch):
+            batch.known = all(slug in seen for slug in batch.slug)
+        with lock:
+            kept = batch.keep(
+                not slug or (not seen.get(slug, "").startswith(today_str) and slug not in claimed_slugs)
+                for slug in batch.slug
+            )
+            claimed_slugs.update(slug for slug in kept.slug if slug)
+        metrics.inc("scrape_ads_known_total", len(batch) - len(kept))
+        yield page, kept
+
+
+def default_stages(location_slug, claimed_slugs=None, lock=None, skip_keywords=SKIP_KEYWORDS):
+    """The stages between fetch and store: decode -> filter -> dedup (see `run_stages`)."""
+    return [
+        partial(decode_pages, location_slug=location_slug),
+        partial(filter_pages, skip_keywords=skip_keywords),
+        partial(dedup_pages, location_slug=location_slug, claimed_slugs=claimed_slugs, lock=lock)
+    ]
+
+
+def run_stages(pages, stages):
+    """
+    Chain `stages` onto the (page, item) stream `pages`; every stage is a
+    callable taking the stream and returning the next one, lazily, one page
+    at a time. Returns the last stream.
+    """
+    for stage in stages:
+        pages = stage(pages)
+    return pages
+
+
+def split_band(band, parts):
+    """Split the price band (low, high) into `parts` adjacent bands of about the same width."""
+    low, high = band
+    step = (high - low + 1) / parts
+    bounds = [low + round(step * i) for i in range(parts)] + [high + 1]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(parts)]
+
+
+def plan_price_bands(probe, filters=None, max_pages=SCRAPE_BAND_MAX_PAGES, min_width=SCRAPE_BAND_MIN_WIDTH,
+                     executor=None):
+    """
+    Query planner: split a location's search into price bands that are
+    short enough to page through in parallel.
+      - Probe page 1 of the whole search and read paginationData.total
+      - A search with more than `max_pages` pages is split into
+        ceil(pages / max_pages) equal-width price bands (none narrower than
+        `min_width`), and every band is probed and split the same way
+      - Searches without a price_max are never split
+
+    `probe(band)` returns the page-1 JSON of a band, or None if it failed;
+    band None is the unsplit search. Probes of one level run on `executor`.
+    Returns [(band, page-1 JSON)] ordered by price; the scraper reuses those
+    pages, so planning costs one request per band that gets split.
+    """
+    filters = SCRAPE_FILTERS if filters is None else filters
+    whole = probe(None)
+    price_max = filters.get("price_max")
+    if whole is None or not max_pages or price_max is None or get_pagination_info(whole) <= max_pages:
+        return [(None, whole)]
+
+    leaves = []
+    frontier = [((filters.get("price_min") or 0, price_max), whole)]
+    while frontier:
+        children = []
+        for band, data in frontier:
+            parts = 0
+            if data is not None:
+                pages = get_pagination_info(data)
+                parts = min(math.ceil(pages / max_pages), (band[1] - band[0] + 1) // max(1, min_width))
+            if parts < 2:
+                leaves.append((band, data))
+            else:
+                children.extend(split_band(band, parts))
+        probed = list(executor.map(probe, children)) if executor is not None else [probe(b) for b in children]
+        frontier = list(zip(children, probed))
+    return sorted(leaves, key=lambda leaf: leaf[0][0])
+
+
+def band_key(location_slug, band):
+    """Checkpoint key of one price band of a location (the slug itself for an unsplit search)."""
+    return location_slug if band is None else f"{location_slug}#{band[0]}-{band[1]}"
+
+
+def parse_band_key(key):
+    """Inverse of `band_key`: the (low, high) band, or None for an unsplit search."""
+    if "#" not in key:
+        return None
+    low, high = key.rsplit("#", 1)[1].split("-")
+    return int(low), int(high)
+
+
+def scrape_location(location, log_area=None, max_workers=SCRAPE_MAX_WORKERS, session=None,
+                    progress_callback=None, stop_after_known_pages=SCRAPE_STOP_AFTER_KNOWN_PAGES,
+                    cache_mode=SCRAPE_CACHE_MODE, cancel_event=None, run_id=None, filters=None, stages=None):
     """
     Actual scraping logic:
-      - Construct URL for page=1
-      - Get total_pages
-      - For each page, fetch ads
-      - Skip ads whose title has "Single", "තනි තට්ටු", or "තනිමහල්"
+      - Plan the search (`plan_price_bands`): a location with many pages is
+        split into price bands that are paged at the same time
+      - Fetch page=1 once to get total_pages (its ads are reused, not fetched again)
+      - Fetch the following pages in parallel, at most `max_workers` ahead
+        (shared by the bands), over one pooled keep-alive session
+      - Skip ads whose title has one of SKIP_KEYWORDS ("Single", "තනි තට්ටු", ...)
+      - Drop ads whose slug was already stored today, or taken by another
+        band of this location (an ad can sit on a band boundary)
       - Clean up price
-      - Append valid ads to Excel
+      - Append valid ads to the raw store in page order (per band)
+      - A page that still fails after the request controller's retries is
+        listed in "failed_pages" and the following pages are still scraped;
+        a resume fetches the failed pages of the run again
+      - Stop a band once `stop_after_known_pages` pages in a row held only ads
+        scraped before (0 walks every page)
       - Return a summary dict
+
+    Every band runs as a generator pipeline fetch -> decode -> filter ->
+    dedup -> store (`fetch_pages`, `default_stages`), so memory per band
+    stays at about `window` pages whatever the page count. `stages` replaces
+    the middle of it: a list of callables that each take a (page, item)
+    stream and return the next one, the first receiving (page, JSON or None)
+    and the last yielding (page, AdBatch or None). Shared by the bands.
+
+    `location` is a domain Location or a {"id", "name", "slug"} dict.
+    `filters` (default SCRAPE_FILTERS) are the search filters; see
+    `build_filter_json`. "failed_pages" holds page numbers for an unsplit
+    search and "<band>:<page>" strings for banded ones.
+
+    With a `run_id` (see data_access.start_scrape_run) every page is
+    committed together with its band's checkpoint (`commit_raw_page`).
+    A location of that run is resumed with the same bands, right after each
+    band's last committed page; one already finished is not fetched again.
+
+    `excel_file` in the summary is the day's raw Excel file; it is written
+    by `export_pending_raw_excel` once the run is over.
+
+    `log_area` is an optional sink for progress text: a Streamlit element
+    (anything with `.text()`) or a plain callable such as `print`.
+    Pass `session` to share one connection pool between several locations;
+    otherwise a session is created for this call and closed at the end.
+    `progress_callback(page_num, total_pages, ads_scraped)` is called after
+    every page, fetched or failed, with the pages handled so far over all
+    bands. `cache_mode` is passed to `fetch_page`.
+    Setting `cancel_event` (a threading.Event) stops after the current page.
     """
-    location_name = location_dict["name"]
-    location_slug = location_dict["slug"]
-    location_id = location_dict["id"]
+    location = Location.from_dict(location)
+    filters = SCRAPE_FILTERS if filters is None else filters
 
-    skip_keywords = ["Single", "තනි තට්ටු", "තනිමහල්", "තනිමහළේ"]
-    ads_scraped = 0
-    pages_scraped = 0
+    log = log_area.text if hasattr(log_area, "text") else log_area
+    metrics = get_metrics()
 
-    # 1) Fetch page=1 to get pagination info
-    url_page1 = construct_api_url(location_id, location_slug, page=1)
-    resp1 = requests.get(url_page1)
-    if resp1.status_code != 200:
-        # If failed to fetch first page, we can return partial or zero
+    # Shared by the bands of this location
+    lock = threading.Lock()
+    claimed_slugs = set()
+    progress = {}  # band key -> [pages handled, total pages, ads]
+    if stages is None:
+        stages = default_stages(location.slug, claimed_slugs, lock)
+
+    def summary(results):
+        excel_files = [r["excel_file"] for r in results if r["excel_file"]]
+        failed = [p for r in results for p in r["failed_pages"]]
         return {
-            "location_name": location_name,
-            "excel_file": None,
-            "ads_scraped": 0,
-            "pages_scraped": 0
+            "location_name": location.name,
+            "excel_file": excel_files[-1] if excel_files else None,
+            "ads_scraped": sum(r["ads_scraped"] for r in results),
+            "pages_scraped": sum(r["pages_scraped"] for r in results),
+            "failed_pages": failed
         }
 
-    data_page1 = resp1.json()
-    total_pages = get_pagination_info(data_page1)
-    if total_pages == 0:
-        total_pages = 1  # fallback if pagination data is missing
+    owns_session = session is None
+    if owns_session:
+        session = create_session(max_workers)
 
-    # 2) For each page, parse ads
-    # We'll store all records for each page in a temporary list, then append them
-    # to Excel at once. Alternatively, you can append per page or at the end only.
-    excel_file = None
+    def fetch(page, band):
+        url = construct_api_url(location.id, location.slug, page=page, filters=filters, price_band=band)
+        return fetch_page(session, url, cache_mode=cache_mode, cancel_event=cancel_event)
 
-    for page_num in range(1, total_pages + 1):
-        url = construct_api_url(location_id, location_slug, page=page_num)
-        resp = requests.get(url)
-        if resp.status_code != 200:
-            # If a page fails, you can break or skip it
-            break
+    def scrape_band(band, data_first, window):
+        """Page through one band; returns its partial summary plus "completed"."""
+        key = band_key(location.slug, band)
+        label = "" if band is None else f" (Rs {band[0]:,} - {band[1]:,})"
+        ads_scraped = 0
+        pages_scraped = 0
+        failed_pages = []
+        excel_file = None
+        known_pages_in_row = 0
+        start_page = 1
+        total_pages = 0
+        retry_pages = []
 
-        data = resp.json()
-        ads = data.get("ads", [])
-        records_this_page = []
-        for ad in ads:
-            title = ad.get("title", "")
-            # Skip if title has any forbidden keyword
-            # Compare in lowercase for case-insensitive match
-            t_lower = title.lower()
-            if any(k.lower() in t_lower for k in skip_keywords):
-                continue
-
-            # Build a row matching your Excel columns
-            description = ad.get("description", "")
-            details = ad.get("details", "")
-            price_str = ad.get("price", "")
-            price_val = clean_price(price_str)
-            shop_name = ad.get("shopName", "")
-            slug = ad.get("slug", "")
-            url_ = "https://ikman.lk/en/ad/" + slug
-            location_ = ad.get("location", "")
-
-            # "Date" column is today's date so you can identify the scrape day
-            today_str = datetime.now().strftime("%Y-%m-%d")
-
-            row = [
-                location_slug,  # "Area Slug"
-                location_,  # "Location"
-                title,  # "Title"
-                description,  # "Description"
-                details,  # "Details"
-                price_val,  # "Price (numeric)"
-                shop_name,  # "Shop Name"
-                slug,  # "Slug"
-                url_,  # "URL"
-                today_str  # "Date"
-            ]
-            records_this_page.append(row)
-
-        # Append if we have any
-        if records_this_page:
-            excel_file = append_to_excel(records_this_page)
-            ads_scraped += len(records_this_page)
-            log_area.text(f"Scraped : {ads_scraped} ads. Page : {page_num} of {total_pages} pages for {location_name}")
-
-    pages_scraped = page_num  # track the last successful page
+        def store_page(page, records, failed=False):
+            """Append one page's records; with a run_id, idempotently together with the checkpoint."""
+            with metrics.timer("storage_write_seconds"):
+                if run_id is None:
+                    return append_raw_records(records)
+                return commit_raw_page(run_id, key, page, records, total_pages, failed=failed)
+
+        def report(page_num):
+            if progress_callback is None:
+                return
+            with lock:
+                progress[key] = [page_num, total_pages, ads_scraped]
+                pages, totals, ads = (sum(p[i] for p in progress.values()) for i in range(3))
+            progress_callback(pages, totals, ads)
+
+        def result(completed):
+            if band is not None:
+                failed = [f"{band[0]}-{band[1]}:{p}" for p in failed_pages]
+            else:
+                failed = failed_pages
+            return {
+                "excel_file": excel_file, "ads_scraped": ads_scraped, "pages_scraped": pages_scraped,
+                "failed_pages": failed, "completed": completed
+            }
+
+        if run_id is not None:
+            checkpoint = open_checkpoint(run_id, key)
+            start_page = checkpoint["last_page"] + 1
+            total_pages = checkpoint["total_pages"]
+            ads_scraped = checkpoint["ads_committed"]
+            pages_scraped = checkpoint["pages_committed"]
+            failed_pages = checkpoint["failed_pages"]
+            excel_file = checkpoint["excel_file"]
+            # Pages that failed in the interrupted run are fetched again first
+            retry_pages = list(failed_pages)
+            if checkpoint["status"] == "done" or (total_pages and start_page > total_pages and not retry_pages):
+                return result(True)
+            if start_page > 1:
+                # The planner's page 1 is of no use when resuming further down
+                data_first = None
+                if log is not None:
+                    retrying = f", retrying pages {retry_pages}" if retry_pages else ""
+                    log(f"Resuming {location.name}{label} at page {start_page} of {total_pages}{retrying}")
+
+        # 1) Fetch the first page (page=1 unless resuming) to get pagination info;
+        # a resumed band already knows its page count
+        if data_first is None and not total_pages:
+            data_first = fetch(start_page, band)
+            if data_first is None:
+                # If failed to fetch first page, we can return partial or zero;
+                # a checkpointed run can be resumed from the same page later
+                failed_pages = failed_pages + [start_page]
+                return result(False)
+
+        if data_first is not None:
+            total_pages = get_pagination_info(data_first)
+            if total_pages == 0:
+                total_pages = 1  # fallback if pagination data is missing
+
+        # 2) Run the pipeline fetch -> decode -> filter -> dedup -> store. The
+        # fetch stage keeps up to `window` pages in flight and yields them
+        # strictly in page order, so rows reach the store in the same order
+        # as before and we can stop early without downloading the whole
+        # result set; every later stage holds one page at a time.
+        fetched = fetch_pages(
+            lambda page: fetch(page, band), retry_pages + list(range(start_page, total_pages + 1)), window,
+            {start_page: data_first} if data_first is not None else None
+        )
+        cancelled = False
+        try:
+            for page_num, batch in run_stages(fetched, stages):
+                if batch is None and cancel_event is not None and cancel_event.is_set():
+                    # Cancelled while retrying; leave the page for a resume
+                    cancelled = True
+                    break
+                if batch is None:
+                    # Retries are used up; note the page and go on with the
+                    # rest instead of losing everything after it
+                    if run_id is not None:
+                        store_page(page_num, [], failed=True)
+                    if page_num not in failed_pages:
+                        failed_pages.append(page_num)
+                    if log is not None:
+                        log(f"Page {page_num} of {total_pages} failed for {location.name}{label}")
+                else:
+                    pages_scraped += 1
+                    if page_num in failed_pages:
+                        # A retried page; it sits above the resume point, so it
+                        # says nothing about the pages still to come
+                        failed_pages.remove(page_num)
+                    elif batch.known:
+                        known_pages_in_row += 1
+                    elif batch.known is not None:
+                        known_pages_in_row = 0
+
+                    records_this_page = batch.rows()
+                    # Append if we have any; checkpointed runs commit every page
+                    # so the checkpoint moves on even when nothing is new
+                    if records_this_page or run_id is not None:
+                        excel_file = store_page(page_num, records_this_page) or excel_file
+                    if records_this_page:
+                        metrics.inc("scrape_ads_stored_total", len(records_this_page))
+                        ads_scraped += len(records_this_page)
+                        if log is not None:
+                            log(
+                                f"Scraped : {ads_scraped} ads. "
+                                f"Page : {page_num} of {total_pages} pages for {location.name}{label}"
+                            )
+                report(page_num)
+
+                if stop_after_known_pages and known_pages_in_row >= stop_after_known_pages:
+                    # Everything further down is older than what we already have
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    break
+        finally:
+            # Drop pages still queued after stopping instead of downloading them
+            fetched.close()
+
+        # A band with failed pages stays unfinished, so a resume fetches them again
+        completed = not cancelled and not failed_pages
+        if run_id is not None:
+            set_checkpoint_status(run_id, key, "done" if completed else "cancelled" if cancelled else "failed")
+        return result(completed)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            bands = None
+            if run_id is not None:
+                parent = open_checkpoint(run_id, location.slug)
+                band_rows = [
+                    c for c in load_checkpoints(run_id) if c["location_slug"].startswith(location.slug + "#")
+                ]
+                if band_rows:
+                    # Resume with the bands planned by the interrupted run
+                    bands = [(parse_band_key(c["location_slug"]), None) for c in band_rows]
+                    bands.sort(key=lambda leaf: leaf[0][0])
+                elif parent["last_page"] > 0 or parent["status"] == "done":
+                    bands = [(None, None)]
+
+            if bands is None:
+                bands = plan_price_bands(lambda b: fetch(1, b), filters, executor=pool)
+                if len(bands) > 1:
+                    if log is not None:
+                        log(f"{location.name}: split into {len(bands)} price bands")
+                    if run_id is not None:
+                        # Keep the plan, so a resume pages the same bands
+                        for band, _ in bands:
+                            open_checkpoint(run_id, band_key(location.slug, band))
+
+            # The bands share the location's `max_workers` pages in flight
+            window = max(1, max_workers // min(len(bands), max(1, max_workers)))
+            if len(bands) == 1:
+                results = [scrape_band(bands[0][0], bands[0][1], max(1, max_workers))]
+            else:
+                results = list(pool.map(lambda leaf: scrape_band(leaf[0], leaf[1], window), bands))
+    finally:
+        if owns_session:
+            session.close()
+
+    if run_id is not None and len(bands) > 1:
+        if all(r["completed"] for r in results):
+            set_checkpoint_status(run_id, location.slug, "done")
+        elif cancel_event is not None and cancel_event.is_set():
+            set_checkpoint_status(run_id, location.slug, "cancelled")
 
     # Return a summary
-    return {
-        "location_name": location_name,
-        "excel_file": excel_file,
-        "ads_scraped": ads_scraped,
-        "pages_scraped": pages_scraped
-    }
+    return summary(results)
 
 
 def record_scrape_summary(summary_data):
     """
     After scraping multiple locations, combine the summary data,
-    build a record, store in scrape_history.json via `add_history_record`.
+    build a record, store in the scrape history via `add_history_record`.
+    Every distinct output file of the run is listed in "excel_files";
+    "excel_file" keeps the last one for older readers.
     """
     total_ads = sum(item["ads_scraped"] for item in summary_data)
     total_pages = sum(item["pages_scraped"] for item in summary_data)
-    last_file = summary_data[-1]["excel_file"] if summary_data else None
+    failed_pages = sum(len(item.get("failed_pages", ())) for item in summary_data)
+    excel_files = list(dict.fromkeys(s["excel_file"] for s in summary_data if s["excel_file"]))
+    last_file = excel_files[-1] if excel_files else None
 
     record = {
         "timestamp": str(datetime.now()),
@@ -176,6 +643,8 @@ def record_scrape_summary(summary_data):
         "locations_scraped": [s["location_name"] for s in summary_data],
         "total_pages_scraped": total_pages,
         "total_ads_scraped": total_ads,
-        "excel_file": last_file
+        "total_failed_pages": failed_pages,
+        "excel_file": last_file,
+        "excel_files": excel_files
     }
     add_history_record(record)
@@ -0,0 +1,20 @@
+import pytest
+
+from ikman_scraper.data.repository import ScrapeRepository
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A fresh store in a scratch directory."""
+    repository = ScrapeRepository(str(tmp_path / "ikman.sqlite3"))
+    yield repository
+    repository.close()
+
+
+@pytest.fixture
+def store(repo, monkeypatch):
+    """`repo` installed as the process-wide repository that data_access uses."""
+    from ikman_scraper.data import repository
+
+    monkeypatch.setattr(repository, "_repository", repo)
+    return repo
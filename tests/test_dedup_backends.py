@@ -0,0 +1,44 @@
+"""Every scoring backend must keep exactly the rows of the original pairwise loop."""
+import pytest
+
+from benchmarks.bench_dedup import legacy_dedup
+from benchmarks.datagen import make_titles
+from ikman_scraper.services import dedup_service
+from ikman_scraper.services.dedup_service import SCORING_BACKENDS
+
+BACKENDS = sorted(SCORING_BACKENDS)
+
+CASES = {
+    "no titles": [],
+    "one title": ["two storey house for sale"],
+    "empty titles": ["", "house", "", "a", "", "house"],
+    "identical titles": ["house for sale"] * 5 + ["land for sale"] * 3 + ["house for sale"],
+    "near ties": ["house for sale kottawa", "house for sale kotawa", "house for sal kottawa", "house for sale"],
+    "sinhala": [
+        "නිවාස විකිණීමට", "නිවාසය විකිණීමට",
+        "නිවාස විකිණීමට", "land"
+    ],
+    "synthetic": make_titles(300, seed=7)
+}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("threshold", [0, 1, 50, 90, 95, 99, 100])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_backend_matches_legacy_loop(backend, threshold, case):
+    titles = CASES[case]
+    keep, blockers = SCORING_BACKENDS[backend](titles, threshold)
+    assert keep == legacy_dedup(titles, threshold)[0]
+    assert len(blockers) == len(titles)
+    # A dropped title points at an earlier kept one, a kept title at nothing
+    for pos, (k, blocker) in enumerate(zip(keep, blockers)):
+        assert (blocker == -1) if k else (0 <= blocker < pos and keep[blocker])
+
+
+@pytest.mark.parametrize("threshold", [90, 95])
+def test_matrix_backend_across_chunks(monkeypatch, threshold):
+    # Small chunks and tiles, so kept titles of earlier chunks block later ones
+    monkeypatch.setattr(dedup_service, "MATRIX_CHUNK_SIZE", 16)
+    monkeypatch.setattr(dedup_service, "MATRIX_TILE_SIZE", 8)
+    titles = make_titles(200, seed=3)
+    assert dedup_service.matrix_dedup(titles, threshold)[0] == legacy_dedup(titles, threshold)[0]
@@ -0,0 +1,109 @@
+"""
+The incremental and graph dedup paths must keep exactly the rows a full
+greedy run keeps. Inputs are seeded random titles with small edits, few
+distinct dates (so many rows tie) and repeated listing URLs.
+"""
+import random
+
+import pytest
+
+from ikman_scraper.services.dedup_service import (
+    build_index, count_grams, extend_newer, extend_older, first_occurrences, graph_dedup, greedy_dedup,
+    similarity_graph
+)
+
+WORDS = [
+    "house", "sale", "kottawa", "storey", "two", "new", "luxury", "land", "perches",
+    "නිවාස", "විකිණීමට"
+]
+THRESHOLDS = [85, 90, 95]
+
+
+def make_rows(n, seed):
+    """(date, title, key) rows sorted newest first; the sort is stable, so tied dates keep their order."""
+    rnd = random.Random(seed)
+    pool = [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 8))) for _ in range(max(1, n // 3))]
+    rows = []
+    for i in range(n):
+        chars = list(rnd.choice(pool))
+        for _ in range(rnd.randint(0, 2)):
+            if chars and rnd.random() < 0.5:
+                del chars[rnd.randrange(len(chars))]
+            else:
+                chars.insert(rnd.randrange(len(chars) + 1), rnd.choice("abc නි"))
+        key = None if rnd.random() < 0.2 else f"ad-{rnd.randrange(max(1, n // 2))}"
+        rows.append((f"2025-01-{rnd.randint(1, 4):02d}", "".join(chars), key))
+    rows.sort(key=lambda r: r[0], reverse=True)
+    return rows
+
+
+def split_by_date(rows, boundary):
+    """(newer, older): rows dated after `boundary` and the rest, each keeping its order."""
+    return [r for r in rows if r[0] > boundary], [r for r in rows if r[0] <= boundary]
+
+
+def titles_of(rows):
+    return [r[1] for r in rows]
+
+
+def keys_of(rows):
+    return [r[2] for r in rows]
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("boundary", ["2025-01-00", "2025-01-02", "2025-01-04"])
+def test_extend_newer_matches_full_run(seed, threshold, boundary):
+    rows = make_rows(120, seed)
+    new, old = split_by_date(rows, boundary)
+    old_titles = titles_of(old)
+    old_keep, old_blockers = greedy_dedup(old_titles, threshold, keys=keys_of(old))
+
+    combined = new + old
+    keep, _, index, kept_positions = extend_newer(
+        threshold, count_grams(old_titles), titles_of(new), old_titles, old_keep, old_blockers,
+        exact_first=first_occurrences(keys_of(combined))
+    )
+
+    expected, _ = greedy_dedup(titles_of(combined), threshold, keys=keys_of(combined))
+    assert keep == expected
+    assert kept_positions == [pos for pos, k in enumerate(expected) if k]
+    assert len(index.titles) == sum(expected)
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("boundary", ["2025-01-00", "2025-01-02", "2025-01-04"])
+def test_extend_older_matches_full_run(seed, threshold, boundary):
+    rows = make_rows(120, seed)
+    # The saved rows are the newer ones here, the new rows all sort after them
+    old, new = split_by_date(rows, boundary)
+    old_titles = titles_of(old)
+    old_keep, old_blockers = greedy_dedup(old_titles, threshold, keys=keys_of(old))
+    index, kept_positions = build_index(threshold, count_grams(old_titles), old_titles, old_keep)
+
+    combined = old + new
+    new_keep, _ = extend_older(
+        index, kept_positions, len(old), titles_of(new), first_occurrences(keys_of(combined))[len(old):]
+    )
+
+    expected, _ = greedy_dedup(titles_of(combined), threshold, keys=keys_of(combined))
+    assert old_keep + new_keep == expected
+    assert kept_positions == [pos for pos, k in enumerate(expected) if k]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_graph_dedup_matches_full_run(seed):
+    rows = make_rows(150, seed)
+    titles, keys = titles_of(rows), keys_of(rows)
+    graph = similarity_graph(titles, min(THRESHOLDS), keys=keys)
+    for threshold in THRESHOLDS + [100]:
+        expected, _ = greedy_dedup(titles, threshold, keys=keys)
+        assert graph_dedup(graph, threshold)[0] == expected
+
+
+def test_graph_dedup_rejects_threshold_below_floor():
+    rows = make_rows(20, 0)
+    graph = similarity_graph(titles_of(rows), 90, keys=keys_of(rows))
+    with pytest.raises(ValueError):
+        graph_dedup(graph, 80)
@@ -0,0 +1,80 @@
+"""
+Every cleaned file format reads back as the frame that was written:
+same headers, rows in order, text (including Sinhala) intact, missing
+prices and dates kept empty.
+"""
+import gzip
+import json
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from ikman_scraper.data import output_writers
+from ikman_scraper.data.data_access import write_cleaned_file
+from ikman_scraper.data.output_writers import OUTPUT_FORMATS, write_rows
+
+HEADERS = ["Location", "Date", "Title", "Price", "Link"]
+AD_URL = "https://ikman.lk/en/ad/"
+SINHALA_TITLE = "දෙමහල් නිවසක් විකිණීමට"
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame([
+        ["Kottawa", pd.Timestamp("2025-01-03"), "Two storey house for sale", 18_500_000.0, f"{AD_URL}a-1"],
+        ["Negombo", pd.Timestamp("2025-01-02"), SINHALA_TITLE, float("nan"), f"{AD_URL}a-2"],
+        ["Ragama", pd.NaT, "Land with house, 10 perches", 9_750_000.0, f"{AD_URL}a-3"]
+    ], columns=HEADERS)
+
+
+def read_back(path, fmt):
+    """The written file as a DataFrame with the writer's types (Date as Timestamp, Price as float)."""
+    if fmt == "xlsx":
+        df = pd.read_excel(path)
+    elif fmt == "csv":
+        df = pd.read_csv(path)
+    elif fmt == "parquet":
+        df = pd.read_parquet(path)
+    else:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            df = pd.DataFrame([json.loads(line) for line in f])
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["Price"] = df["Price"].astype(float)
+    return df
+
+
+@pytest.mark.parametrize("fmt", list(OUTPUT_FORMATS))
+def test_round_trip(frame, tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"cleaned{OUTPUT_FORMATS[fmt]}")
+
+    report = write_cleaned_file(frame.itertuples(index=False, name=None), HEADERS, path, fmt)
+
+    assert report["format"] == fmt
+    assert report["rows"] == len(frame)
+    assert report["bytes"] > 0
+    pd.testing.assert_frame_equal(read_back(path, fmt), frame, check_dtype=False)
+    assert list(tmp_path.iterdir()) == [tmp_path / f"cleaned{OUTPUT_FORMATS[fmt]}"]
+
+
+def test_empty_frame_writes_headers(tmp_path):
+    path = str(tmp_path / "cleaned.csv")
+    assert write_rows(iter(()), HEADERS, path, "csv") == 0
+    with open(path, encoding="utf-8") as f:
+        assert f.read().strip() == ",".join(HEADERS)
+
+
+def test_parquet_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(output_writers, "_HAS_PYARROW", False)
+    path = tmp_path / "cleaned.parquet"
+    with pytest.raises(ValueError, match="pyarrow"):
+        write_rows([("Kottawa", datetime(2025, 1, 3), "House", 1.0, "link")], HEADERS, str(path), "parquet")
+    # Neither the file nor its temp file is left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="Unknown output format"):
+        write_rows([], HEADERS, str(tmp_path / "cleaned.txt"), "txt")
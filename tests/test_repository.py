@@ -0,0 +1,139 @@
+"""Listings, price history and scrape history kept by the SQLite store."""
+import json
+
+
+def raw_row(slug, price, date, title="Two storey house"):
+    """One row ordered like RAW_COLUMNS."""
+    return ("kottawa", "Kottawa", title, "", "", price, "", slug, f"https://ikman.lk/en/ad/{slug}", date)
+
+
+def history(repo, slug):
+    return [(h["seen_on"], h["price"]) for h in repo.price_history(slug)]
+
+
+def listing(repo, slug):
+    rows, _ = repo.query_listings()
+    return next(r for r in rows if r["slug"] == slug)
+
+
+def test_repeated_slug_in_one_batch_records_each_change_once(repo):
+    repo.append_raw_rows([
+        raw_row("a", 100, "2025-01-01"),
+        raw_row("a", 100, "2025-01-02"),
+        raw_row("a", 90, "2025-01-03")
+    ], "2025-01-03 10:00:00")
+
+    assert history(repo, "a") == [("2025-01-01", 100), ("2025-01-03", 90)]
+    drops = repo.price_drops()
+    assert [(d["slug"], d["previous_price"], d["dropped_on"]) for d in drops] == [("a", 100, "2025-01-03")]
+
+
+def test_batch_rows_are_folded_in_date_order(repo):
+    repo.append_raw_rows([
+        raw_row("a", 90, "2025-01-03", title="New title"),
+        raw_row("a", 100, "2025-01-01", title="Old title")
+    ], "2025-01-03 10:00:00")
+
+    assert history(repo, "a") == [("2025-01-01", 100), ("2025-01-03", 90)]
+    current = listing(repo, "a")
+    assert (current["price"], current["title"], current["first_seen"], current["last_seen"]) == (
+        90, "New title", "2025-01-01", "2025-01-03"
+    )
+
+
+def test_older_day_imported_later_does_not_move_the_listing_back(repo):
+    repo.append_raw_rows([raw_row("a", 90, "2025-01-05", title="New title")], "2025-01-05 10:00:00")
+    repo.append_raw_rows([raw_row("a", 100, "2025-01-02", title="Old title")], "2025-01-05 11:00:00")
+
+    current = listing(repo, "a")
+    assert (current["price"], current["title"], current["first_seen"], current["last_seen"]) == (
+        90, "New title", "2025-01-02", "2025-01-05"
+    )
+    assert history(repo, "a") == [("2025-01-02", 100), ("2025-01-05", 90)]
+    drops = repo.price_drops()
+    assert [(d["previous_price"], d["dropped_on"]) for d in drops] == [(100, "2025-01-05")]
+
+
+def test_older_day_at_the_same_price_moves_the_change_back(repo):
+    repo.append_raw_rows([raw_row("a", 100, "2025-01-01")], "2025-01-01 10:00:00")
+    repo.append_raw_rows([raw_row("a", 90, "2025-01-05")], "2025-01-05 10:00:00")
+    repo.append_raw_rows([raw_row("a", 90, "2025-01-03")], "2025-01-05 11:00:00")
+
+    assert history(repo, "a") == [("2025-01-01", 100), ("2025-01-03", 90)]
+    assert [(d["previous_price"], d["dropped_on"]) for d in repo.price_drops()] == [(100, "2025-01-03")]
+
+
+def test_imported_day_file_does_not_duplicate_history(repo):
+    repo.append_raw_rows([raw_row("a", 100, "2025-01-05")], "2025-01-05 10:00:00")
+    imported = repo.import_raw_day_rows(
+        "2025-01-04", [raw_row("a", 100, "2025-01-04"), raw_row("a", 100, "2025-01-04")], "2025-01-05 11:00:00"
+    )
+
+    assert imported == 2
+    assert history(repo, "a") == [("2025-01-04", 100)]
+    assert listing(repo, "a")["last_seen"] == "2025-01-05"
+
+
+def write_history_json(path):
+    records = [
+        {"date": "2025-01-01", "excel_files": ["raw_scrape/ikman_scrape_2025-01-01.xlsx"]},
+        {"date": "2025-01-02", "excel_file": "raw_scrape/ikman_scrape_2025-01-02.xlsx"},
+        {"date": "2025-01-03", "excel_files": ["raw_scrape/a.xlsx", "raw_scrape/b.xlsx"], "locations": 2}
+    ]
+    path.write_text(json.dumps(records), encoding="utf-8")
+    return records
+
+
+def test_history_json_is_imported_once(repo, tmp_path):
+    json_path = tmp_path / "scrape_history.json"
+    records = write_history_json(json_path)
+
+    repo.migrate_history_json(str(json_path))
+    assert repo.load_history() == records
+    assert not json_path.exists()
+    assert (tmp_path / "scrape_history.json.migrated").exists()
+
+    # A restored file is not imported again
+    write_history_json(json_path)
+    repo.migrate_history_json(str(json_path))
+    assert repo.load_history() == records
+    assert repo.history_files_between("2025-01-01", "2025-01-03") == [
+        "raw_scrape/ikman_scrape_2025-01-01.xlsx", "raw_scrape/ikman_scrape_2025-01-02.xlsx",
+        "raw_scrape/a.xlsx", "raw_scrape/b.xlsx"
+    ]
+
+
+def test_history_json_import_keeps_later_records(store, tmp_path, monkeypatch):
+    from ikman_scraper.data import data_access
+
+    json_path = tmp_path / "scrape_history.json"
+    records = write_history_json(json_path)
+    monkeypatch.setattr(data_access, "HISTORY_FILE", str(json_path))
+    monkeypatch.setattr(data_access, "_history_migrated", False)
+
+    added = {"date": "2025-01-04", "excel_files": ["raw_scrape/ikman_scrape_2025-01-04.xlsx"]}
+    data_access.add_history_record(added)
+    assert data_access.load_history() == records + [added]
+
+    # Another process starting up runs the import again; nothing is duplicated
+    monkeypatch.setattr(data_access, "_history_migrated", False)
+    write_history_json(json_path)
+    assert data_access.find_history_files("2025-01-04", "2025-01-04") == ["raw_scrape/ikman_scrape_2025-01-04.xlsx"]
+    assert data_access.load_history() == records + [added]
+
+
+def test_history_cache_survives_other_writes(store, tmp_path, monkeypatch):
+    from ikman_scraper.data import data_access
+
+    monkeypatch.setattr(data_access, "HISTORY_FILE", str(tmp_path / "scrape_history.json"))
+    monkeypatch.setattr(data_access, "_history_migrated", False)
+    monkeypatch.setattr(data_access, "_loader_cache", {})
+
+    first = data_access.load_history()
+    assert first == []
+    store.append_raw_rows([raw_row("a", 100, "2025-01-01")], "2025-01-01 10:00:00")
+    assert data_access.load_history() is first
+
+    record = {"date": "2025-01-01", "excel_files": ["raw_scrape/ikman_scrape_2025-01-01.xlsx"]}
+    data_access.add_history_record(record)
+    assert data_access.load_history() == [record]
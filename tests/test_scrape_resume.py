@@ -0,0 +1,133 @@
+"""Checkpointed scrapes: idempotent page commits, resuming failed pages and crashed locations."""
+import contextlib
+
+import pytest
+
+from ikman_scraper.services import orchestrator_service, scrape_service
+
+PAGE_SIZE = 25
+PAGES = 6
+LOCATION = {"id": 1, "name": "Kottawa", "slug": "kottawa"}
+# No price bound, so the search is never split into price bands
+FILTERS = {"price_min": None, "price_max": None, "bedrooms": [], "bathrooms": []}
+
+
+def row(slug, date="2025-01-01"):
+    return ("kottawa", "Kottawa", "House", "", "", 100, "", slug, f"https://ikman.lk/en/ad/{slug}", date)
+
+
+@pytest.fixture
+def serp(monkeypatch):
+    """A fake serp API: PAGES pages of distinct ads; pages listed in `failing` fail."""
+    state = {"failing": set(), "fetched": []}
+
+    def fetch_page(session, url, cache_mode=None, cancel_event=None):
+        page = int(url.split("&page=")[1].split("&")[0])
+        state["fetched"].append(page)
+        if page in state["failing"]:
+            return None
+        return {
+            "paginationData": {"total": PAGES * PAGE_SIZE, "pageSize": PAGE_SIZE},
+            "ads": [{"title": "House", "slug": f"ad-{page}-{i}", "price": "Rs 1,000"} for i in range(PAGE_SIZE)]
+        }
+
+    monkeypatch.setattr(scrape_service, "fetch_page", fetch_page)
+    monkeypatch.setattr(orchestrator_service, "export_pending_raw_excel", lambda: [])
+    monkeypatch.setattr(orchestrator_service, "export_metrics", lambda: None)
+    return state
+
+
+def stored_slugs(repo):
+    return [r[0] for r in repo._conn.execute("SELECT slug FROM raw_ads ORDER BY id")]
+
+
+def test_commit_page_is_idempotent(repo):
+    repo.start_run("r1", [LOCATION], "2025-01-01 10:00:00", 1)
+    repo.open_checkpoint("r1", "kottawa", "2025-01-01 10:00:00")
+
+    assert repo.commit_page("r1", "kottawa", 1, [row("a")], "2025-01-01 10:00:01", 3)
+    assert not repo.commit_page("r1", "kottawa", 1, [row("a")], "2025-01-01 10:00:02", 3)
+    assert stored_slugs(repo) == ["a"]
+
+    checkpoint = repo.open_checkpoint("r1", "kottawa", "2025-01-01 10:00:03")
+    assert (checkpoint["last_page"], checkpoint["pages_committed"], checkpoint["ads_committed"]) == (1, 1, 1)
+
+
+def test_failed_page_is_committed_once_retried(repo):
+    repo.start_run("r1", [LOCATION], "2025-01-01 10:00:00", 1)
+    repo.open_checkpoint("r1", "kottawa", "2025-01-01 10:00:00")
+    repo.commit_page("r1", "kottawa", 1, [row("a")], "t", 3)
+    repo.commit_page("r1", "kottawa", 2, [], "t", 3, failed=True)
+    repo.commit_page("r1", "kottawa", 3, [row("c")], "t", 3)
+
+    # Failing again keeps the page listed once
+    assert not repo.commit_page("r1", "kottawa", 2, [], "t", 3, failed=True)
+    assert repo.open_checkpoint("r1", "kottawa", "t")["failed_pages"] == [2]
+
+    assert repo.commit_page("r1", "kottawa", 2, [row("b")], "t", 3)
+    assert not repo.commit_page("r1", "kottawa", 2, [row("b")], "t", 3)
+    checkpoint = repo.open_checkpoint("r1", "kottawa", "t")
+    assert (checkpoint["last_page"], checkpoint["failed_pages"], checkpoint["pages_committed"]) == (3, [], 3)
+    assert stored_slugs(repo) == ["a", "c", "b"]
+
+
+def test_resume_refetches_only_failed_pages(store, serp):
+    serp["failing"] = {3, 5}
+    summaries = orchestrator_service.scrape_locations(
+        [LOCATION], filters=FILTERS, max_workers=2, run_id="r1"
+    )
+    assert summaries[0]["failed_pages"] == [3, 5]
+    assert store.get_run("r1")["status"] == "failed"
+    assert store.open_checkpoint("r1", "kottawa", "t")["status"] == "failed"
+
+    serp["failing"] = set()
+    serp["fetched"] = []
+    summaries = orchestrator_service.scrape_locations(
+        [LOCATION], filters=FILTERS, max_workers=2, run_id="r1"
+    )
+
+    assert sorted(serp["fetched"]) == [3, 5]
+    assert summaries[0]["failed_pages"] == []
+    assert summaries[0]["ads_scraped"] == PAGES * PAGE_SIZE
+    assert store.get_run("r1")["status"] == "done"
+    slugs = stored_slugs(store)
+    assert len(slugs) == len(set(slugs)) == PAGES * PAGE_SIZE
+
+
+def test_resume_of_a_finished_run_fetches_nothing(store, serp):
+    orchestrator_service.scrape_locations([LOCATION], filters=FILTERS, max_workers=2, run_id="r1")
+    assert store.get_run("r1")["status"] == "done"
+
+    serp["fetched"] = []
+    orchestrator_service.scrape_locations([LOCATION], filters=FILTERS, max_workers=2, run_id="r1")
+    assert serp["fetched"] == []
+    assert len(stored_slugs(store)) == PAGES * PAGE_SIZE
+
+
+def test_crashed_location_reports_its_error(store, serp, tmp_path, monkeypatch):
+    from ikman_scraper.services import scheduler_service
+
+    other = {"id": 2, "name": "Negombo", "slug": "negombo"}
+    real_scrape_location = orchestrator_service.scrape_location
+
+    def scrape_location(loc, **kwargs):
+        if loc["slug"] == "negombo":
+            raise RuntimeError("serp layout changed")
+        return real_scrape_location(loc, **kwargs)
+
+    monkeypatch.setattr(orchestrator_service, "scrape_location", scrape_location)
+    monkeypatch.setattr(scheduler_service, "scrape_lock", contextlib.nullcontext)
+    monkeypatch.setattr(scheduler_service, "record_scrape_summary", lambda summaries: None)
+    logged = []
+
+    run_summary = scheduler_service.run_scrape_batch(
+        [LOCATION, other], log=logged.append, summary_file=str(tmp_path / "runs.jsonl"),
+        run_id="r1", filters=FILTERS, max_workers=2
+    )
+
+    kottawa, negombo = run_summary["locations"]
+    assert "error" not in kottawa and kottawa["ads_scraped"] == PAGES * PAGE_SIZE
+    assert (negombo["error"], negombo["ads_scraped"]) == ("serp layout changed", 0)
+    assert run_summary["failed_locations"] == {"Negombo": "serp layout changed"}
+    assert "Negombo: failed: serp layout changed" in logged
+    assert store.get_run("r1")["status"] == "failed"
@@ -0,0 +1,69 @@
+"""
+The streaming cleanup (read_sorted_raw_file and the k-way merge) must keep
+the same rows, in the same order, as the in-memory cleanup. The day files
+overlap: each holds rows of its own day and the day before, the same
+listings show up in several files and every file has rows without a Date.
+"""
+import csv
+import random
+
+import pytest
+
+from benchmarks.datagen import make_raw_rows, write_raw_file
+from ikman_scraper.services.cleanup_service import (
+    FINAL_COLUMNS, add_normalized_titles, fuzzy_drop_duplicates, load_combined_frame, merge_raw_files,
+    scan_raw_files, stream_drop_duplicates
+)
+
+DAYS = ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04"]
+
+
+@pytest.fixture
+def day_files(tmp_path):
+    """One raw file per day; the slugs repeat across files and dates repeat within them."""
+    paths = []
+    for i, day in enumerate(DAYS):
+        rnd = random.Random(i)
+        rows = make_raw_rows(60, day, seed=i % 2)
+        for row in rows:
+            # Date is the last raw column
+            roll = rnd.random()
+            if roll < 0.3 and i:
+                row[-1] = DAYS[i - 1]
+            elif roll < 0.35:
+                row[-1] = None
+        path = tmp_path / f"ikman_scrape_{day}.xlsx"
+        write_raw_file(str(path), rows)
+        paths.append(str(path))
+    return paths
+
+
+def in_memory_rows(paths, threshold):
+    df = load_combined_frame(paths)
+    add_normalized_titles(df)
+    kept = fuzzy_drop_duplicates(df, threshold=threshold, backend="index", workers=1)
+    return list(zip(kept["Title"], kept["URL"]))
+
+
+def test_merge_matches_stable_sort(day_files):
+    files, _, rows, error = scan_raw_files(day_files)
+    assert error is None
+    merged = list(merge_raw_files(files))
+    combined = load_combined_frame(day_files)
+    assert rows == len(merged) == len(combined)
+    assert [(r[2], r[4]) for r in merged] == list(zip(combined["Title"], combined["URL"]))
+
+
+@pytest.mark.parametrize("threshold", [0, 90, 95, 100])
+def test_stream_keeps_in_memory_rows(day_files, tmp_path, threshold):
+    out_path = str(tmp_path / "cleaned.csv")
+    kept, report, error = stream_drop_duplicates(day_files, threshold, out_path, output_format="csv", workers=1)
+    assert error is None
+    expected = in_memory_rows(day_files, threshold)
+    assert [(row[2], row[4]) for row in kept] == expected
+    assert report["rows"] == len(expected)
+
+    with open(out_path, newline="", encoding="utf-8") as f:
+        written = list(csv.DictReader(f))
+    assert list(written[0]) == FINAL_COLUMNS
+    assert [(row["Title"], row["Link"]) for row in written] == expected